@@ -0,0 +1,267 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+import numpy as np
+import pandas as pd
+
+##############################
+# HA_Entity_Analyzer_Testdaten #
+##############################
+
+# Erzeugt realistische Beispieldateien im Format der Exporte:
+#   - hass_entities.csv: Semikolon-getrennt, Kopfzeile wie im Button-Card-Export der README,
+#     mit typischer Verteilung der Domains, Areas, Integrationen und Hersteller
+#   - energy.csv: breites Format (eine Zeile pro Sensor, eine Spalte pro Zeitstempel)
+#     mit Tagesgang, Wochenend-Effekt und gelegentlichen Lücken
+#   - home-assistant_v2.db: Ausschnitt des Recorder-Schemas (mit den Indizes von Home Assistant)
+#     mit stündlichen und 5-Minuten-Statistiken der Energie-Sensoren, einigen Temperatur-Mittelwerten
+#     und einer kurzen State-Historie der Entitäten
+#
+#   python benchmarks/generate_data.py entities --rows 50000 -o hass_entities.csv
+#   python benchmarks/generate_data.py energy --sensors 100 --timestamps 8760 -o energy.csv
+#   python benchmarks/generate_data.py recorder --sensors 100 --timestamps 8760 -o home-assistant_v2.db
+
+ENTITY_HEADER = ["ENTITY ID", "ENTITY NAME", "DEVICE NAME", "DEVICE ID", "AREA", "PLATFORM", "STATE", "FORMATTED STATE",
+                 "MANUFACTURER", "MODEL", "MODEL ID", "SW VERSION", "HW VERSION"]
+
+DOMAINS = ['sensor', 'binary_sensor', 'switch', 'light', 'automation', 'button', 'number', 'select', 'update',
+           'climate', 'cover', 'media_player', 'device_tracker', 'person', 'script', 'scene', 'input_boolean',
+           'input_number', 'fan', 'lock', 'camera', 'weather', 'sun', 'zone', 'event', 'text', 'siren', 'vacuum']
+AREAS = ['Küche', 'Wohnzimmer', 'Schlafzimmer', 'Bad', 'Flur', 'Büro', 'Kinderzimmer', 'Keller', 'Garage', 'Garten',
+         'Dachboden', 'Gästezimmer', 'Terrasse', 'Hauswirtschaftsraum', 'Esszimmer', 'Ankleide']
+PLATFORMS = {
+    'zha': ['IKEA of Sweden', 'Philips', 'Aqara', 'Sonoff', 'Tuya'],
+    'hue': ['Signify Netherlands B.V.'],
+    'mqtt': ['Shelly', 'Tasmota', 'Zigbee2MQTT'],
+    'esphome': ['Espressif'],
+    'shelly': ['Shelly'],
+    'tplink': ['TP-Link'],
+    'sonos': ['Sonos'],
+    'homematicip_cloud': ['eQ-3'],
+    'fritz': ['AVM'],
+    'tasmota': ['Tasmota'],
+    'template': [''],
+    'automation': [''],
+    'hassio': ['Home Assistant'],
+    'mobile_app': ['Apple', 'Google', 'Samsung'],
+}
+NAME_PARTS = ['Licht', 'Decke', 'Steckdose', 'Temperatur', 'Luftfeuchtigkeit', 'Bewegung', 'Fenster', 'Tür', 'Rollladen',
+              'Heizung', 'Verbrauch', 'Leistung', 'Batterie', 'Signal', 'Helligkeit', 'Update', 'Lautsprecher']
+
+
+def zipf_choice(rng, values, size, a=1.3):
+    """Zieht Werte mit abfallender Häufigkeit (wenige häufige, viele seltene Werte)."""
+    weights = 1.0 / np.arange(1, len(values) + 1) ** a
+    return rng.choice(np.asarray(values, dtype=object), size=size, p=weights / weights.sum())
+
+
+def generate_entities(rows, domains=len(DOMAINS), areas=len(AREAS), seed=0):
+    """DataFrame im Format von hass_entities.csv mit 'rows' Zeilen."""
+    rng = np.random.default_rng(seed)
+    domain_values = DOMAINS[:domains] + [f'custom_{i}' for i in range(max(0, domains - len(DOMAINS)))]
+    area_values = AREAS[:areas] + [f'Raum {i}' for i in range(max(0, areas - len(AREAS)))]
+
+    domain = zipf_choice(rng, domain_values, rows)
+    # Etwa jede fünfte Entität hat keine Area
+    area = np.where(rng.random(rows) < 0.2, '', rng.choice(np.asarray(area_values, dtype=object), rows))
+    # Integration, Hersteller, Modell und Versionen gehören zum Gerät (wie in der Geräte-Registry)
+    devices = max(1, rows // 4)
+    device_id = rng.integers(0, devices, rows)
+    platforms = list(PLATFORMS)
+    device_platform = zipf_choice(rng, platforms, devices, a=1.0)
+    device_manufacturer = np.array([rng.choice(PLATFORMS[p]) for p in device_platform], dtype=object)
+    device_model_number = rng.integers(1, 60, devices)
+    device_sw = np.array([f"1.{v}.0" for v in rng.integers(0, 20, devices)], dtype=object)
+    device_hw = np.where(rng.random(devices) < 0.7, '', '1.0')
+    platform = device_platform[device_id]
+    manufacturer = device_manufacturer[device_id]
+    model_number = device_model_number[device_id]
+    model = np.where(manufacturer == '', '', manufacturer + ' M' + model_number.astype(str))
+    name = np.array([f"{area[i] or 'Haus'} {NAME_PARTS[i % len(NAME_PARTS)]} {i}" for i in range(rows)], dtype=object)
+
+    state = np.empty(rows, dtype=object)
+    numeric = rng.normal(21, 4, rows).round(1).astype(str)
+    on_off = np.where(rng.random(rows) < 0.5, 'on', 'off')
+    state[:] = np.where(np.isin(domain, ['sensor', 'number']), numeric, on_off)
+    special = rng.random(rows)
+    state[special < 0.04] = 'unavailable'
+    state[(special >= 0.04) & (special < 0.06)] = 'unknown'
+
+    entity_id = np.array([f"{d}.{n.lower().replace(' ', '_')}" for d, n in zip(domain, name)], dtype=object)
+    return pd.DataFrame({
+        "ENTITY ID": entity_id,
+        "ENTITY NAME": name,
+        "DEVICE NAME": np.array([f"Gerät {d}" for d in device_id], dtype=object),
+        "DEVICE ID": np.array([f"{d:032x}" for d in device_id], dtype=object),
+        "AREA": area,
+        "PLATFORM": platform,
+        "STATE": state,
+        "FORMATTED STATE": state,
+        "MANUFACTURER": manufacturer,
+        "MODEL": model,
+        "MODEL ID": np.where(model == '', '', 'ID-' + model_number.astype(str)),
+        "SW VERSION": device_sw[device_id],
+        "HW VERSION": device_hw[device_id],
+    }, columns=ENTITY_HEADER)
+
+
+def generate_energy(sensors, timestamps, freq='h', start='2024-01-01', seed=0, missing=0.002):
+    """DataFrame im breiten Format der energy.csv: entity_id, type, unit und eine Spalte je Zeitstempel."""
+    rng = np.random.default_rng(seed)
+    # Feste Zeitzonenverschiebung wie in den Exporten (+01:00)
+    index = pd.date_range(start, periods=timestamps, freq=freq, tz='Etc/GMT-1')
+    hours = index.hour.to_numpy() + index.minute.to_numpy() / 60
+    # Tagesgang mit Morgen- und Abendspitze, am Wochenende etwas höher
+    profile = 0.6 + 0.5 * np.exp(-((hours - 7.5) ** 2) / 3) + 0.9 * np.exp(-((hours - 19) ** 2) / 5)
+    profile = profile * np.where(index.dayofweek.to_numpy() >= 5, 1.2, 1.0)
+    scale = rng.lognormal(mean=-1.5, sigma=0.8, size=(sensors, 1))
+    values = (profile[None, :] * scale * rng.gamma(4.0, 0.25, size=(sensors, timestamps))).round(3)
+    values = values.astype(object)
+    values[rng.random((sensors, timestamps)) < missing] = ''
+
+    columns = [ts.isoformat() for ts in index]
+    df = pd.DataFrame(values, columns=columns)
+    df.insert(0, 'entity_id', [f"sensor.verbrauch_{i}" for i in range(sensors)])
+    df.insert(1, 'type', 'sum')
+    df.insert(2, 'unit', 'kWh')
+    return df
+
+
+# Tabellen und Indizes des Recorders, soweit der Reader sie nutzt (Schema ab Home Assistant 2023.4)
+RECORDER_SCHEMA = """
+CREATE TABLE schema_changes (change_id INTEGER PRIMARY KEY, schema_version INTEGER, changed DATETIME);
+CREATE TABLE states_meta (metadata_id INTEGER PRIMARY KEY, entity_id VARCHAR(255));
+CREATE UNIQUE INDEX ix_states_meta_entity_id ON states_meta (entity_id);
+CREATE TABLE state_attributes (attributes_id INTEGER PRIMARY KEY, hash BIGINT, shared_attrs TEXT);
+CREATE TABLE states (state_id INTEGER PRIMARY KEY, state VARCHAR(255), last_changed_ts FLOAT, last_updated_ts FLOAT,
+                     attributes_id INTEGER, metadata_id INTEGER);
+CREATE INDEX ix_states_metadata_id_last_updated_ts ON states (metadata_id, last_updated_ts);
+CREATE INDEX ix_states_last_updated_ts ON states (last_updated_ts);
+CREATE TABLE statistics_meta (id INTEGER PRIMARY KEY, statistic_id VARCHAR(255), source VARCHAR(32),
+                              unit_of_measurement VARCHAR(255), has_mean BOOLEAN, has_sum BOOLEAN, name VARCHAR(255));
+CREATE UNIQUE INDEX ix_statistics_meta_statistic_id ON statistics_meta (statistic_id);
+CREATE TABLE statistics (id INTEGER PRIMARY KEY, created_ts FLOAT, metadata_id INTEGER, start_ts FLOAT, mean FLOAT,
+                         min FLOAT, max FLOAT, last_reset_ts FLOAT, state FLOAT, sum FLOAT);
+CREATE UNIQUE INDEX ix_statistics_statistic_id_start_ts ON statistics (metadata_id, start_ts);
+CREATE INDEX ix_statistics_start_ts ON statistics (start_ts);
+CREATE TABLE statistics_short_term (id INTEGER PRIMARY KEY, created_ts FLOAT, metadata_id INTEGER, start_ts FLOAT,
+                                    mean FLOAT, min FLOAT, max FLOAT, last_reset_ts FLOAT, state FLOAT, sum FLOAT);
+CREATE UNIQUE INDEX ix_statistics_short_term_statistic_id_start_ts ON statistics_short_term (metadata_id, start_ts);
+CREATE INDEX ix_statistics_short_term_start_ts ON statistics_short_term (start_ts);
+"""
+RECORDER_SCHEMA_VERSION = 43
+
+
+def write_recorder(path, sensors, timestamps, entities=1000, means=5, short_term_hours=48, seed=0):
+    """SQLite-Datei im Recorder-Format: 'sensors' Zähler (sum) und 'means' Temperaturen (mean) über
+    'timestamps' Stunden, 5-Minuten-Statistiken für die letzten 'short_term_hours' und je Entität
+    einige States. Die Verbräuche entsprechen generate_energy() mit gleichem 'seed'."""
+    if os.path.exists(path):
+        os.remove(path)
+    rng = np.random.default_rng(seed)
+    energy = generate_energy(sensors, timestamps, seed=seed, missing=0)
+    consumption = energy.iloc[:, 3:].to_numpy(dtype=float)
+    start_ts = pd.Timestamp(energy.columns[3]).timestamp()
+    hours = start_ts + 3600.0 * np.arange(timestamps)
+
+    with sqlite3.connect(path) as db:
+        db.executescript(RECORDER_SCHEMA)
+        db.execute('INSERT INTO schema_changes (schema_version, changed) VALUES (?, ?)', (RECORDER_SCHEMA_VERSION, '2024-01-01'))
+
+        meta = [(f"sensor.verbrauch_{i}", 'recorder', 'kWh', 0, 1) for i in range(sensors)]
+        meta += [(f"sensor.temperatur_{i}", 'recorder', '°C', 1, 0) for i in range(means)]
+        db.executemany('INSERT INTO statistics_meta (statistic_id, source, unit_of_measurement, has_mean, has_sum) '
+                       'VALUES (?, ?, ?, ?, ?)', meta)
+        for sensor in range(sensors):
+            sums = np.cumsum(consumption[sensor])
+            db.executemany('INSERT INTO statistics (created_ts, metadata_id, start_ts, state, sum) VALUES (?, ?, ?, ?, ?)',
+                           zip((hours + 3600).tolist(), [sensor + 1] * timestamps, hours.tolist(), sums.tolist(), sums.tolist()))
+            # Kurzzeit-Statistiken: jede Stunde gleichmäßig auf 12 Intervalle verteilt
+            last = max(timestamps - short_term_hours, 0)
+            fine = np.repeat(consumption[sensor, last:] / 12, 12)
+            fine_sums = (sums[last - 1] if last else 0.0) + np.cumsum(fine)
+            fine_starts = hours[last] + 300.0 * np.arange(len(fine))
+            db.executemany('INSERT INTO statistics_short_term (created_ts, metadata_id, start_ts, state, sum) '
+                           'VALUES (?, ?, ?, ?, ?)',
+                           zip((fine_starts + 300).tolist(), [sensor + 1] * len(fine), fine_starts.tolist(),
+                               fine_sums.tolist(), fine_sums.tolist()))
+        daily = np.sin(2 * np.pi * (hours / 86400.0))
+        for i in range(means):
+            mean = (20 + 3 * daily + rng.normal(0, 0.3, timestamps)).round(2)
+            db.executemany('INSERT INTO statistics (created_ts, metadata_id, start_ts, mean, min, max) VALUES (?, ?, ?, ?, ?, ?)',
+                           zip((hours + 3600).tolist(), [sensors + i + 1] * timestamps, hours.tolist(), mean.tolist(),
+                               (mean - 0.5).tolist(), (mean + 0.5).tolist()))
+
+        frame = generate_entities(entities, seed=seed)
+        db.executemany('INSERT INTO states_meta (entity_id) VALUES (?)', ((e,) for e in frame['ENTITY ID']))
+        db.executemany('INSERT INTO state_attributes (shared_attrs) VALUES (?)',
+                       ((json.dumps({'friendly_name': name}),) for name in frame['ENTITY NAME']))
+        # Vier ältere States und der aktuelle aus der Entitäten-Tabelle
+        states = []
+        for row, state in enumerate(frame['STATE']):
+            for k in range(5):
+                updated = hours[-1] - 3600.0 * (4 - k) * rng.integers(1, 24)
+                states.append((state if k == 4 else 'unknown', updated, updated, row + 1, row + 1))
+        db.executemany('INSERT INTO states (state, last_changed_ts, last_updated_ts, attributes_id, metadata_id) '
+                       'VALUES (?, ?, ?, ?, ?)', states)
+    return path
+
+
+def write_entities(path, rows, domains=len(DOMAINS), areas=len(AREAS), seed=0):
+    generate_entities(rows, domains, areas, seed).to_csv(path, sep=';', index=False, encoding='utf-8')
+    return path
+
+
+def write_energy(path, sensors, timestamps, freq='h', seed=0):
+    generate_energy(sensors, timestamps, freq, seed=seed).to_csv(path, sep=',', index=False, encoding='utf-8')
+    return path
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='generate_data', description='Beispieldaten für HA Entity Analyzer erzeugen.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('entities', help='Entitäten-CSV (hass_entities.csv) erzeugen')
+    p.add_argument('--rows', type=int, default=10000)
+    p.add_argument('--domains', type=int, default=len(DOMAINS), help='Anzahl unterschiedlicher Domains')
+    p.add_argument('--areas', type=int, default=len(AREAS), help='Anzahl unterschiedlicher Areas')
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('-o', '--output', default='hass_entities.csv')
+
+    p = sub.add_parser('energy', help='Energie-CSV (breites Format) erzeugen')
+    p.add_argument('--sensors', type=int, default=50)
+    p.add_argument('--timestamps', type=int, default=8760)
+    p.add_argument('--freq', default='h', help='pandas-Frequenz der Zeitstempel (Standard: stündlich)')
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('-o', '--output', default='energy.csv')
+
+    p = sub.add_parser('recorder', help='Recorder-Datenbank (home-assistant_v2.db) mit Statistiken und States erzeugen')
+    p.add_argument('--sensors', type=int, default=50, help='Anzahl der Zähler (Statistiken mit sum)')
+    p.add_argument('--timestamps', type=int, default=8760, help='Anzahl der Stunden')
+    p.add_argument('--entities', type=int, default=1000, help='Anzahl der Entitäten in states_meta')
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('-o', '--output', default='home-assistant_v2.db')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == 'entities':
+        write_entities(args.output, args.rows, args.domains, args.areas, args.seed)
+        print(f"{args.rows} Entitäten nach '{args.output}' geschrieben ({os.path.getsize(args.output) / 1e6:.1f} MB).")
+    elif args.command == 'recorder':
+        write_recorder(args.output, args.sensors, args.timestamps, args.entities, seed=args.seed)
+        print(f"Recorder-Datenbank mit {args.sensors} Zählern x {args.timestamps} Stunden und {args.entities} Entitäten "
+              f"nach '{args.output}' geschrieben ({os.path.getsize(args.output) / 1e6:.1f} MB).")
+    else:
+        write_energy(args.output, args.sensors, args.timestamps, args.freq, args.seed)
+        print(f"{args.sensors} Sensoren x {args.timestamps} Zeitstempel nach '{args.output}' geschrieben "
+              f"({os.path.getsize(args.output) / 1e6:.1f} MB).")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
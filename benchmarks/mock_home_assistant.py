@@ -0,0 +1,262 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.generate_data import generate_energy, generate_entities
+from entity_analyzer_homeassistant import WebSocket
+
+##############################
+# HA_Entity_Analyzer_MockHA  #
+##############################
+
+# Lokaler Ersatz für eine Home-Assistant-Instanz: beantwortet auf /api/websocket die Befehle,
+# die der Analyzer nutzt (Anmeldung, get_states, Entity-/Geräte-/Area-Registry, get_config,
+# recorder/list_statistic_ids und recorder/statistics_during_period). Die Daten stammen aus
+# generate_data.py mit gleichem 'seed': die Entitäten ergeben genau die hass_entities.csv von
+# write_entities(), die Verbräuche die energy.csv von generate_energy() mit gleichem 'start'
+# (ohne 'start' enden sie mit der aktuellen Stunde, damit der Standard-Zeitraum des Clients sie findet).
+# Anfragen werden parallel bearbeitet (mit optionaler künstlicher Latenz) und, wenn der Client es
+# erlaubt, gebündelt beantwortet.
+#
+#   python benchmarks/mock_home_assistant.py --rows 10000 --sensors 50 --port 8123 --token test
+#   python entity_analyzer_engine.py --token test --recorder-source states load http://127.0.0.1:8123
+#   python entity_analyzer_engine.py --token test totals http://127.0.0.1:8123
+
+
+# Zeitzone der Instanz (get_config); entspricht der festen Verschiebung +01:00 aus generate_energy()
+TIME_ZONE = 'Etc/GMT-1'
+
+
+def slug(text):
+    return re.sub(r'[^a-z0-9]+', '_', text.lower()).strip('_')
+
+
+class MockHomeAssistant:
+    """Registries, States und Statistiken aus den Testdaten plus ein asyncio-WebSocket-Server."""
+
+    def __init__(self, rows=1000, sensors=10, timestamps=720, means=3, token='test-token', latency=0.0, seed=0,
+                 start=None):
+        self.token = token
+        self.latency = latency
+        if start is None:
+            # Wandzeit in der Zeitzone der Testdaten (+01:00), die letzte Stunde ist die aktuelle
+            start = (pd.Timestamp.now(tz=TIME_ZONE).floor('h') - pd.Timedelta(hours=timestamps - 1)).tz_localize(None)
+        self._build_entities(generate_entities(rows, seed=seed))
+        self._build_statistics(generate_energy(sensors, timestamps, start=str(start), seed=seed), means, seed)
+        self.loop = None
+        self.server = None
+        self.thread = None
+
+    def _build_entities(self, frame):
+        self.areas = [{'area_id': slug(name), 'name': name} for name in sorted(set(frame['AREA']) - {''})]
+        self.entity_registry = [{'entity_id': row['ENTITY ID'], 'device_id': row['DEVICE ID'],
+                                 'area_id': slug(row['AREA']) if row['AREA'] else None, 'platform': row['PLATFORM'],
+                                 'name': None, 'original_name': row['ENTITY NAME']}
+                                for row in frame.to_dict('records')]
+        self.device_registry = [{'id': row['DEVICE ID'], 'name': row['DEVICE NAME'], 'area_id': None,
+                                 'manufacturer': row['MANUFACTURER'] or None, 'model': row['MODEL'] or None,
+                                 'model_id': row['MODEL ID'] or None, 'sw_version': row['SW VERSION'] or None,
+                                 'hw_version': row['HW VERSION'] or None}
+                                for row in frame.drop_duplicates('DEVICE ID').to_dict('records')]
+        self.states = [{'entity_id': row['ENTITY ID'], 'state': row['STATE'],
+                        'attributes': {'friendly_name': row['ENTITY NAME']}}
+                       for row in frame.to_dict('records')]
+
+    def _build_statistics(self, energy, means, seed):
+        # statistic_id -> (Beginn in Sekunden, Werte mit NaN für fehlende Stunden, Art)
+        starts = np.array([pd.Timestamp(column).timestamp() for column in energy.columns[3:]])
+        values = energy.iloc[:, 3:].replace('', np.nan).to_numpy(dtype=float)
+        self.statistics = {statistic_id: (starts, values[i], 'sum') for i, statistic_id in enumerate(energy['entity_id'])}
+        rng = np.random.default_rng(seed)
+        daily = np.sin(2 * np.pi * (starts / 86400.0))
+        for i in range(means):
+            self.statistics[f"sensor.temperatur_{i}"] = (starts, (20 + 3 * daily + rng.normal(0, 0.3, len(starts))).round(2), 'mean')
+        self.units = {statistic_id: 'kWh' if kind == 'sum' else '°C' for statistic_id, (_, _, kind) in self.statistics.items()}
+
+    # --- Befehle ---
+    def list_statistic_ids(self, statistic_type=None, **_):
+        return [{'statistic_id': statistic_id, 'source': 'recorder', 'name': None, 'has_sum': kind == 'sum',
+                 'has_mean': kind == 'mean', 'mean_type': 1 if kind == 'mean' else 0,
+                 'statistics_unit_of_measurement': self.units[statistic_id],
+                 'display_unit_of_measurement': self.units[statistic_id],
+                 'unit_class': 'energy' if kind == 'sum' else 'temperature'}
+                for statistic_id, (_, _, kind) in self.statistics.items() if statistic_type in (None, kind)]
+
+    def statistics_during_period(self, start_time, statistic_ids=None, end_time=None, period='hour', types=None, **_):
+        if period not in ('hour', '5minute'):
+            raise ValueError(f"Periode '{period}' wird vom Mock nicht unterstützt.")
+        step = 3600 if period == 'hour' else 300
+        start_ts = pd.Timestamp(start_time).timestamp()
+        end_ts = pd.Timestamp(end_time).timestamp() if end_time else float('inf')
+        types = set(types or ('change', 'mean', 'sum'))
+        result = {}
+        for statistic_id in statistic_ids or list(self.statistics):
+            if statistic_id not in self.statistics:
+                continue
+            starts, values, kind = self.statistics[statistic_id]
+            if step == 300:
+                # Stundenwerte gleichmäßig auf 12 Intervalle verteilt (wie im Recorder-Generator)
+                starts = (starts[:, None] + 300.0 * np.arange(12)).ravel()
+                values = np.repeat(values / 12 if kind == 'sum' else values, 12)
+            inside = (starts >= start_ts) & (starts < end_ts) & ~np.isnan(values)
+            rows = []
+            for start, value in zip(starts[inside].tolist(), values[inside].tolist()):
+                row = {'start': start * 1000, 'end': (start + step) * 1000}
+                if kind == 'sum' and 'change' in types:
+                    row['change'] = value
+                if kind == 'mean' and 'mean' in types:
+                    row['mean'] = value
+                rows.append(row)
+            if rows:
+                result[statistic_id] = rows
+        return result
+
+    def handle(self, message):
+        command = message.get('type')
+        payload = {key: value for key, value in message.items() if key not in ('id', 'type')}
+        if command == 'get_states':
+            return self.states
+        if command == 'config/entity_registry/list':
+            return self.entity_registry
+        if command == 'config/device_registry/list':
+            return self.device_registry
+        if command == 'config/area_registry/list':
+            return self.areas
+        if command == 'get_config':
+            return {'time_zone': TIME_ZONE, 'version': 'mock', 'unit_system': {'energy': 'kWh'}}
+        if command == 'recorder/list_statistic_ids':
+            return self.list_statistic_ids(**payload)
+        if command == 'recorder/statistics_during_period':
+            return self.statistics_during_period(**payload)
+        raise KeyError(command)
+
+    # --- Server ---
+    async def _session(self, reader, writer):
+        websocket = await WebSocket.accept(reader, writer)
+        if websocket is None:
+            return
+        await websocket.send(json.dumps({'type': 'auth_required', 'ha_version': 'mock'}))
+        auth = json.loads(await websocket.receive() or '{}')
+        if auth.get('access_token') != self.token:
+            await websocket.send(json.dumps({'type': 'auth_invalid', 'message': 'Invalid access token or password'}))
+            await websocket.close()
+            return
+        await websocket.send(json.dumps({'type': 'auth_ok', 'ha_version': 'mock'}))
+
+        outgoing = asyncio.Queue()
+        coalesce = [False]
+
+        async def answer(message):
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            try:
+                if message.get('type') == 'supported_features':
+                    coalesce[0] = bool(message.get('features', {}).get('coalesce_messages'))
+                    result = None
+                else:
+                    result = self.handle(message)
+                reply = {'id': message.get('id'), 'type': 'result', 'success': True, 'result': result}
+            except KeyError as e:
+                reply = {'id': message.get('id'), 'type': 'result', 'success': False,
+                         'error': {'code': 'unknown_command', 'message': f"Unknown command: {e}"}}
+            except (TypeError, ValueError) as e:
+                reply = {'id': message.get('id'), 'type': 'result', 'success': False,
+                         'error': {'code': 'invalid_format', 'message': str(e)}}
+            await outgoing.put(reply)
+
+        async def send_replies():
+            while True:
+                replies = [await outgoing.get()]
+                while not outgoing.empty():
+                    replies.append(outgoing.get_nowait())
+                if coalesce[0] and len(replies) > 1:
+                    websocket.write(json.dumps(replies))
+                else:
+                    for reply in replies:
+                        websocket.write(json.dumps(reply))
+                await websocket.drain()
+
+        sender = asyncio.create_task(send_replies())
+        tasks = set()
+        try:
+            while True:
+                text = await websocket.receive()
+                if text is None:
+                    break
+                task = asyncio.create_task(answer(json.loads(text)))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            for task in tasks | {sender}:
+                task.cancel()
+            writer.close()
+
+    def start(self, host='127.0.0.1', port=0):
+        """Startet den Server in einem Hintergrund-Thread und gibt seine URL zurück."""
+        ready = threading.Event()
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            self.server = self.loop.run_until_complete(asyncio.start_server(self._session, host, port))
+            ready.set()
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=run, name='mock-home-assistant', daemon=True)
+        self.thread.start()
+        ready.wait()
+        return f"http://{host}:{self.server.sockets[0].getsockname()[1]}"
+
+    def stop(self):
+        if self.loop is None:
+            return
+
+        async def shutdown():
+            self.server.close()
+            await self.server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop = None
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='mock_home_assistant', description='Lokaler Home-Assistant-WebSocket mit Testdaten.')
+    parser.add_argument('--rows', type=int, default=10000, help='Anzahl der Entitäten')
+    parser.add_argument('--sensors', type=int, default=50, help='Anzahl der Zähler (Statistiken mit sum)')
+    parser.add_argument('--timestamps', type=int, default=24 * 30, help='Anzahl der Stunden')
+    parser.add_argument('--start', help='Erste Stunde der Statistiken, z.B. 2024-01-01 (Standard: bis zur aktuellen Stunde)')
+    parser.add_argument('--means', type=int, default=3, help='Anzahl der Temperatur-Mittelwerte')
+    parser.add_argument('--latency', type=float, default=0.0, help='Künstliche Verzögerung je Anfrage in Sekunden')
+    parser.add_argument('--token', default='test-token')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8123)
+    parser.add_argument('--seed', type=int, default=0)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    mock = MockHomeAssistant(args.rows, args.sensors, args.timestamps, args.means, args.token, args.latency, args.seed,
+                             args.start)
+    url = mock.start(args.host, args.port)
+    print(f"Mock-Home-Assistant unter {url} (Token: {args.token}), Beenden mit Strg+C.")
+    try:
+        mock.thread.join()
+    except KeyboardInterrupt:
+        mock.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
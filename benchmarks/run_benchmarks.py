@@ -0,0 +1,285 @@
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.generate_data import write_energy, write_entities, write_recorder
+from benchmarks.mock_home_assistant import MockHomeAssistant
+from entity_analyzer_cache import ParseCache
+from entity_analyzer_charts import plain_datetimes, render_chart_png
+from entity_analyzer_engine import COL_AREA, COL_DOMAIN, COL_PLATFORM, AnalysisEngine
+from entity_analyzer_tool import EntityAnalyzerApp
+
+##############################
+# HA_Entity_Analyzer_Bench   #
+##############################
+
+# Misst die zeitkritischen Pfade der Engine und der Diagramme ohne Display:
+# Laden (mit und ohne Cache), Suche, Filter, Sortierung, Statistik, sichtbare
+# Tabellenzeilen, Export, Vergleich, Umformen/Aggregieren der Energie-Daten, Lesen
+# der Recorder-Datenbank, Abruf über die WebSocket-API (gegen den Mock-Server mit
+# MOCK_LATENCY je Anfrage) und das Rendern der Diagramme (Agg). Jeder Fall läuft mehrfach, gespeichert werden
+# Median und Minimum. Das Ergebnis ist JSON und lässt sich mit --compare gegen
+# den Lauf eines anderen Commits vergleichen:
+#
+#   python benchmarks/run_benchmarks.py --sizes small,medium -o bench_neu.json
+#   python benchmarks/run_benchmarks.py --sizes small,medium --compare bench_alt.json
+
+# Größenstufen: Entitäten-Zeilen und Energie-Sensoren x Zeitstempel (stündlich)
+SIZES = {
+    'small': {'rows': 1000, 'sensors': 10, 'timestamps': 24 * 30},
+    'medium': {'rows': 10000, 'sensors': 50, 'timestamps': 24 * 182},
+    'large': {'rows': 50000, 'sensors': 200, 'timestamps': 24 * 365},
+}
+
+# Künstliche Verzögerung des Mock-Servers je Anfrage (Sekunden), etwa wie im lokalen Netz
+MOCK_LATENCY = 0.005
+
+# Sichtbare Tabellenzeilen und Diagrammgröße wie in der Oberfläche
+VISIBLE_ROWS = 40
+CHART_SIZE_PX = (1200, 450)
+
+
+def measure(func, repeat):
+    """Führt 'func' 'repeat'-mal aus und gibt die Laufzeiten in Sekunden zurück."""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def entity_cases(path, cache_dir):
+    """(Name, Funktion) der Entitäten-Fälle; die Engine wird einmal geladen und wiederverwendet."""
+    engine = AnalysisEngine()
+    engine.load(path)
+    cached = AnalysisEngine(cache=ParseCache(cache_dir))
+    cached.load(path)  # füllt den Cache
+    reference = os.path.join(cache_dir, 'reference.csv')
+    engine.df_original.sample(frac=0.98, random_state=1).to_csv(reference, sep=';', index=False)
+    areas = [value for value in engine.unique_values(COL_AREA) if value][:2]
+    platform_value = engine.unique_values(COL_PLATFORM)[0]
+
+    def incremental_search():
+        for term in ('l', 'li', 'lic', 'lich', 'licht'):
+            engine.search(term)
+        engine.reset()
+
+    def filter_facets():
+        engine.set_facet(COL_AREA, areas)
+        engine.set_facet(COL_DOMAIN, ['sensor', 'light'])
+        engine.facet_counts()
+        engine.reset()
+
+    def sort_cold():
+        engine.sort_index = None
+        engine.sort('entity name', ascending=True)
+        engine.reset()
+
+    def sort_warm():
+        engine.sort('entity name', ascending=False)
+        engine.reset()
+
+    def visible_rows():
+        view = engine.view
+        for first in range(0, min(len(view), 50 * VISIBLE_ROWS), VISIBLE_ROWS):
+            view.rows_as_lists(first, first + VISIBLE_ROWS)
+
+    def cross_tabs():
+        engine.set_facet(COL_PLATFORM, [platform_value])
+        for key in engine.stats.tables:
+            engine.cross_tab(key)
+        engine.reset()
+
+    return [
+        ('entity.load', lambda: AnalysisEngine().load(path)),
+        ('entity.load_cached', lambda: AnalysisEngine(cache=ParseCache(cache_dir)).load(path)),
+        ('entity.search', lambda: (engine.search('licht'), engine.reset())),
+        ('entity.search_incremental', incremental_search),
+        ('entity.filter', lambda: (engine.filter(COL_AREA, areas[0]), engine.reset())),
+        ('entity.facets', filter_facets),
+        ('entity.sort_cold', sort_cold),
+        ('entity.sort_warm', sort_warm),
+        ('entity.stats_domain', engine.domain_stats),
+        ('entity.stats_crosstab', cross_tabs),
+        ('entity.visible_rows', visible_rows),
+        ('entity.export', lambda: engine.export(io.StringIO())),
+        ('entity.diff', lambda: engine.read_comparison(reference)),
+    ]
+
+
+def recorder_cases(path):
+    def load(source):
+        engine = AnalysisEngine()
+        engine.recorder_options = {'source': source}
+        return lambda: engine.load(path)
+
+    return [
+        ('recorder.statistics', load('statistics')),
+        ('recorder.short_term', load('short_term')),
+        ('recorder.states', load('states')),
+    ]
+
+
+def home_assistant_cases(url, timestamps):
+    def load(source):
+        engine = AnalysisEngine()
+        # Zeitraum der Testdaten (ab 2024-01-01, +01:00), damit die Fälle nicht vom heutigen Datum abhängen
+        engine.recorder_options = {'source': source, 'token': 'test-token', 'start': '2024-01-01T00:00:00+01:00',
+                                   'end': (pd.Timestamp('2024-01-01T00:00:00+01:00') + pd.Timedelta(hours=timestamps)).isoformat()}
+        return lambda: engine.load(url)
+
+    return [
+        ('homeassistant.states', load('states')),
+        ('homeassistant.statistics', load('statistics')),
+    ]
+
+
+def energy_cases(path, cache_dir, colors):
+    engine = AnalysisEngine()
+    engine.load(path)
+    sensors = list(engine.sensor_ids())
+    selection = sensors[:10]
+    first, last = engine.energy_time_range()
+    middle = first + (last - first) / 2
+
+    def chart_args(kind):
+        series = engine.energy_series(sensors[0], 'original' if kind == 'line' else 'D')
+        if kind == 'line':
+            return dict(series_list=[(sensors[0], plain_datetimes(series.index), series.to_numpy(), '#1f77b4')],
+                        title=sensors[0], xlabel="Zeitstempel", ylabel="kWh", value_labels=False)
+        return dict(categories=list(series.index.strftime('%Y-%m-%d')), series_list=[(sensors[0], series.to_numpy(), '#1f77b4')],
+                    title=sensors[0], xlabel="Zeitstempel", ylabel="kWh", value_labels=None)
+
+    return [
+        ('energy.load', lambda: AnalysisEngine().load(path)),
+        ('energy.load_cached', lambda: AnalysisEngine(cache=ParseCache(cache_dir)).load(path)),
+        ('energy.reshape', lambda: engine.energy_frame(selection)),
+        ('energy.resample_day', lambda: [engine.energy_series(s, 'D') for s in sensors]),
+        ('energy.resample_month', lambda: engine.energy_frame(sensors, 'M')),
+        ('energy.window', lambda: engine.energy_window(sensors[0], first, middle, CHART_SIZE_PX[0] * 2)),
+        ('energy.totals', lambda: engine.energy_totals(sensors, first, middle)),
+        ('energy.export', lambda: engine.export(io.StringIO())),
+        ('chart.line', lambda: render_chart_png(colors, CHART_SIZE_PX, 'line', chart_args('line'))),
+        ('chart.bar_day', lambda: render_chart_png(colors, CHART_SIZE_PX, 'bar', chart_args('bar'))),
+    ]
+
+
+def run(sizes, repeat, work_dir, only=None):
+    colors = EntityAnalyzerApp.THEME_COLORS['light']
+    results = []
+    for size in sizes:
+        config = SIZES[size]
+        size_dir = os.path.join(work_dir, size)
+        os.makedirs(size_dir, exist_ok=True)
+        entities = write_entities(os.path.join(size_dir, 'hass_entities.csv'), config['rows'])
+        energy = write_energy(os.path.join(size_dir, 'energy.csv'), config['sensors'], config['timestamps'])
+        recorder = write_recorder(os.path.join(size_dir, 'home-assistant_v2.db'), config['sensors'], config['timestamps'],
+                                  config['rows'])
+        # Der Mock läuft im selben Prozess (eigener Thread) und teilt sich daher den GIL mit dem Client
+        mock = MockHomeAssistant(config['rows'], config['sensors'], config['timestamps'], latency=MOCK_LATENCY,
+                                 start='2024-01-01')
+        cases = entity_cases(entities, os.path.join(size_dir, 'cache_entities')) + \
+            energy_cases(energy, os.path.join(size_dir, 'cache_energy'), colors) + recorder_cases(recorder) + \
+            home_assistant_cases(mock.start(), config['timestamps'])
+        for name, func in cases:
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            timings = measure(func, repeat)
+            result = {
+                'size': size, 'case': name, 'rows': config['rows'], 'sensors': config['sensors'],
+                'timestamps': config['timestamps'], 'repeat': repeat,
+                'median_s': statistics.median(timings), 'min_s': min(timings),
+            }
+            results.append(result)
+            print(f"{size:<7} {name:<28} {result['median_s'] * 1000:10.2f} ms  (min {result['min_s'] * 1000:.2f} ms)")
+        mock.stop()
+    return results
+
+
+def compare(results, baseline_path):
+    """Gibt je Fall das Verhältnis zur Baseline aus (> 1 = langsamer)."""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    old = {(r['size'], r['case']): r['median_s'] for r in baseline['results']}
+    print(f"\nVergleich mit {os.path.basename(baseline_path)} ({baseline['meta'].get('commit') or '?'}):")
+    for r in results:
+        before = old.get((r['size'], r['case']))
+        if before is None:
+            continue
+        ratio = r['median_s'] / before if before else float('inf')
+        marker = '  langsamer' if ratio > 1.10 else ('  schneller' if ratio < 0.90 else '')
+        print(f"{r['size']:<7} {r['case']:<28} {before * 1000:10.2f} -> {r['median_s'] * 1000:10.2f} ms  x{ratio:.2f}{marker}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='run_benchmarks', description='Laufzeiten der zeitkritischen Pfade messen.')
+    parser.add_argument('--sizes', default='small,medium', help=f"Kommagetrennt aus {', '.join(SIZES)}")
+    parser.add_argument('--repeat', type=int, default=5, help='Wiederholungen je Fall')
+    parser.add_argument('--only', action='append', help='Nur Fälle mit diesem Präfix, z.B. entity.sort (mehrfach möglich)')
+    parser.add_argument('-o', '--output', default='benchmark_results.json', help='JSON-Ergebnisdatei')
+    parser.add_argument('--compare', metavar='BASELINE', help='Früheres Ergebnis (JSON) zum Vergleich')
+    parser.add_argument('--keep-data', metavar='DIR', help='Erzeugte Daten in DIR behalten statt in einem Temp-Verzeichnis')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        raise SystemExit(f"Unbekannte Größe(n): {', '.join(unknown)}")
+
+    work_dir = args.keep_data or tempfile.mkdtemp(prefix='ha_entity_bench_')
+    try:
+        results = run(sizes, args.repeat, work_dir, args.only)
+    finally:
+        if not args.keep_data:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nErgebnisse nach '{args.output}' geschrieben.")
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,246 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+#############################
+# HA_Entity_Analyzer_Cache  #
+#############################
+
+# Binärer Spalten-Cache für bereits eingelesene CSV-Dateien.
+# Der bereinigte DataFrame wird als NumPy-.npz abgelegt und beim erneuten Öffnen
+# ohne CSV-Parsing geladen. Schmale Entitäten-CSVs werden spaltenweise gespeichert
+# (jede Spalte mit eigener Stringbreite), breite Tabellen als ein 2D-Block.
+# Alternativ kann ein Dict aus Arrays abgelegt werden (z.B. der EnergyStore);
+# Arrays mit dem Präfix '__mmap__' werden als eigene .npy-Datei gespeichert und
+# beim Laden memory-mapped geöffnet, statt sie in den Speicher zu lesen.
+#
+# Schlüssel: Pfad + Größe + Änderungszeit zeigen auf den Inhalts-Hash der Datei,
+# die Cache-Datei selbst ist nach dem Inhalts-Hash benannt. Verschobene oder nur
+# "berührte" Dateien mit gleichem Inhalt treffen so weiterhin den Cache.
+# Index und Dateien werden unter einer Sperre geändert, da der Lade-Thread und die
+# Oberfläche (Cache leeren) gleichzeitig darauf zugreifen können.
+
+
+def default_cache_dir():
+    """Plattformabhängiges Cache-Verzeichnis des Tools."""
+    base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'ha_entity_analyzer')
+
+
+def file_content_hash(filepath, chunk_size=1024 * 1024):
+    """BLAKE2b-Hash über den gesamten Dateiinhalt."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """LRU-Cache für bereinigte DataFrames mit Größenbegrenzung."""
+    INDEX_NAME = 'index.json'
+    MMAP_PREFIX = '__mmap__'
+    DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GB
+    BLOCK_COLUMN_THRESHOLD = 64  # ab dieser Spaltenzahl als ein 2D-Block speichern
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self._index = None
+        self._lock = threading.RLock()
+
+    # --- Index ---
+    @property
+    def index_path(self):
+        return os.path.join(self.cache_dir, self.INDEX_NAME)
+
+    def _load_index(self):
+        if self._index is None:
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {'paths': {}, 'entries': {}}
+        return self._index
+
+    def _save_index(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.json')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def _path_key(filepath):
+        stat = os.stat(filepath)
+        return os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns
+
+    def _entry_path(self, content_hash):
+        return os.path.join(self.cache_dir, f"{content_hash}.npz")
+
+    def _mmap_path(self, content_hash, name):
+        return os.path.join(self.cache_dir, f"{content_hash}.{name}.npy")
+
+    def _content_hash_for(self, filepath):
+        """Inhalts-Hash; bei unverändertem Pfad/Größe/mtime ohne erneutes Lesen der Datei."""
+        index = self._load_index()
+        path, size, mtime = self._path_key(filepath)
+        known = index['paths'].get(path)
+        if known and known['size'] == size and known['mtime'] == mtime:
+            return known['hash']
+        content_hash = file_content_hash(filepath)
+        index['paths'][path] = {'size': size, 'mtime': mtime, 'hash': content_hash}
+        return content_hash
+
+    # --- Öffentliche API ---
+    def get(self, filepath):
+        """Gibt (DataFrame bzw. Array-Dict, Metadaten) aus dem Cache zurück oder None."""
+        with self._lock:
+            return self._get(filepath)
+
+    def _get(self, filepath):
+        index = self._load_index()
+        content_hash = self._content_hash_for(filepath)
+        entry = index['entries'].get(content_hash)
+        entry_path = self._entry_path(content_hash)
+        if entry is None or not os.path.exists(entry_path):
+            self._remove(content_hash)
+            self._save_index()
+            return None
+
+        try:
+            with np.load(entry_path, allow_pickle=False) as data:
+                if entry.get('kind') == 'arrays':
+                    payload = {name: data[name] for name in data.files}
+                    for name in entry.get('mmap', []):
+                        payload[self.MMAP_PREFIX + name] = np.load(self._mmap_path(content_hash, name), mmap_mode='r')
+                else:
+                    columns = data['__columns__'].tolist()
+                    if '__block__' in data.files:
+                        payload = pd.DataFrame(data['__block__'].astype(object), columns=columns)
+                    else:
+                        payload = pd.DataFrame({col: data[f'c{i}'].astype(object) for i, col in enumerate(columns)},
+                                               columns=columns)
+        except (OSError, ValueError, KeyError):
+            self._remove(content_hash)
+            self._save_index()
+            return None
+
+        entry['last_access'] = time.time()
+        self._save_index()
+        return payload, entry.get('meta', {})
+
+    def put(self, filepath, payload, meta=None):
+        """Speichert einen bereinigten DataFrame (oder ein Array-Dict) und räumt nach LRU auf."""
+        with self._lock:
+            self._put(filepath, payload, meta)
+
+    def _put(self, filepath, payload, meta):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        index = self._load_index()
+        content_hash = self._content_hash_for(filepath)
+
+        mmap_names = []
+        if isinstance(payload, pd.DataFrame):
+            kind = 'frame'
+            arrays = {'__columns__': np.array(list(payload.columns), dtype=str)}
+            if len(payload.columns) >= self.BLOCK_COLUMN_THRESHOLD:
+                arrays['__block__'] = payload.to_numpy(dtype=str)
+            else:
+                for i, col in enumerate(payload.columns):
+                    arrays[f'c{i}'] = payload[col].to_numpy(dtype=str)
+        else:
+            kind = 'arrays'
+            arrays = {}
+            for name, array in payload.items():
+                if name.startswith(self.MMAP_PREFIX):
+                    name = name[len(self.MMAP_PREFIX):]
+                    fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.npy')
+                    with os.fdopen(fd, 'wb') as f:
+                        np.save(f, np.asarray(array))
+                    os.replace(tmp_path, self._mmap_path(content_hash, name))
+                    mmap_names.append(name)
+                else:
+                    arrays[name] = array
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.npz')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        entry_path = self._entry_path(content_hash)
+        os.replace(tmp_path, entry_path)
+
+        index['entries'][content_hash] = {
+            'bytes': os.path.getsize(entry_path) + sum(os.path.getsize(self._mmap_path(content_hash, name)) for name in mmap_names),
+            'last_access': time.time(),
+            'kind': kind,
+            'mmap': mmap_names,
+            'meta': meta or {},
+        }
+        self._evict()
+        self._save_index()
+
+    def clear(self):
+        """Löscht alle Cache-Dateien; gibt (entfernte Einträge, freigegebene Bytes) zurück.
+
+        Noch geöffnete Dateien (siehe _remove()) bleiben im Index und zählen nicht als entfernt.
+        """
+        with self._lock:
+            index = self._load_index()
+            count = len(index['entries'])
+            freed = sum(self._remove(content_hash) for content_hash in list(index['entries']))
+            index['paths'].clear()
+            self._save_index()
+            return count - len(index['entries']), freed
+
+    def total_bytes(self):
+        with self._lock:
+            return sum(entry['bytes'] for entry in self._load_index()['entries'].values())
+
+    # --- Intern ---
+    def _remove(self, content_hash):
+        """Löscht die Dateien eines Eintrags und gibt die freigegebenen Bytes zurück.
+
+        Lässt sich eine Datei nicht löschen (unter Windows z.B. die per Memory-Map geöffneten .npy
+        des geladenen EnergyStore), bleibt der Eintrag mit der Größe der übrigen Dateien im Index
+        und wird beim nächsten Leeren bzw. Aufräumen erneut versucht.
+        """
+        entries = self._load_index()['entries']
+        entry = entries.get(content_hash) or {}
+        paths = [self._entry_path(content_hash)] + [self._mmap_path(content_hash, name) for name in entry.get('mmap', [])]
+        freed = remaining = 0
+        for path in paths:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            try:
+                os.remove(path)
+                freed += size
+            except OSError:
+                remaining += size
+        if remaining and content_hash in entries:
+            entry['bytes'] = remaining
+        else:
+            entries.pop(content_hash, None)
+        return freed
+
+    def _evict(self):
+        """Entfernt die am längsten nicht genutzten Einträge, bis die Größengrenze eingehalten wird."""
+        entries = self._load_index()['entries']
+        by_age = sorted(entries.items(), key=lambda item: item[1]['last_access'])
+        total = self.total_bytes()
+        for content_hash, entry in by_age:
+            if total <= self.max_bytes:
+                break
+            total -= self._remove(content_hash)
+
+        # Pfadzuordnungen auf entfernte Einträge verwerfen
+        paths = self._load_index()['paths']
+        for path in [p for p, known in paths.items() if known['hash'] not in entries]:
+            del paths[path]
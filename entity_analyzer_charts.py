@@ -0,0 +1,456 @@
+import io
+import tkinter as tk
+from contextlib import contextmanager
+from tkinter.font import Font
+
+import matplotlib.dates as mdates
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+from matplotlib.figure import Figure
+
+from entity_analyzer_perf import PERF
+
+##############################
+# HA_Entity_Analyzer_Charts  #
+##############################
+
+# Persistente Diagrammansichten für die Energie-Charts.
+# Jede ChartView besitzt genau eine Figure, ein Tk-Canvas und eine Toolbar.
+# Periode, Diagrammtyp oder Theme ändern nur die vorhandenen Artists
+# (set_data, Balkenhöhen, Farben), statt Figure und Widgets neu zu erzeugen.
+#
+# Linien, Balken und Wertebeschriftungen sind 'animated': ein vollständiges Zeichnen rendert nur
+# Achsen, Beschriftungen usw. in den Hintergrund, die Daten werden danach
+# darübergelegt. Bleiben die Achsengrenzen bei einer Datenänderung gleich,
+# wird nur der gespeicherte Hintergrund wiederhergestellt und die Daten
+# werden neu geblittet.
+#
+# Lange Linien werden vor dem Zeichnen per Min/Max-Bucketing auf etwa zwei Punkte
+# pro Pixel Achsenbreite reduziert (Spitzen bleiben erhalten). Die vollen Daten
+# bleiben in der ChartView; Summen im Titel werden vom Aufrufer berechnet.
+#
+# Bei Zoom/Pan über die Toolbar wird das sichtbare Zeitfenster über eine
+# 'zoom_source' neu geholt (Binärsuche + passende Aggregationsstufe), sodass
+# beim Hineinzoomen Details erscheinen und die Punktzahl etwa gleich bleibt.
+#
+# RasterChart verwendet dieselbe Zeichenlogik ohne Tk (reines Agg) und liefert
+# ein PNG; render_chart_png ist dafür als Einstiegspunkt für Worker-Prozesse
+# eines ProcessPoolExecutor gedacht.
+
+
+class CustomNavigationToolbar(NavigationToolbar2Tk):
+    def __init__(self, canvas, window):
+        super().__init__(canvas, window)
+        self.label_font = Font(family="Helvetica", size=12, weight="bold")
+        for child in self.winfo_children():
+            if isinstance(child, tk.Label):
+                child.config(font=self.label_font, foreground='dark red')
+
+    def set_message(self, msg):
+        if msg:
+            super().set_message(msg)
+            for child in self.winfo_children():
+                if isinstance(child, tk.Label):
+                    child.config(font=self.label_font, foreground='dark red')
+
+    def save_figure(self, *args):
+        # Animierte Artists werden von savefig nicht gerendert, beim Speichern daher statisch zeichnen
+        view = getattr(self.canvas, 'chart_view', None)
+        if view is None:
+            return super().save_figure(*args)
+        with view.static_artists():
+            return super().save_figure(*args)
+
+
+def plain_datetimes(index):
+    """x-Werte für Matplotlib; zeitzonenbehaftete Zeitstempel werden als lokale Wandzeit dargestellt."""
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_localize(None)
+    return index.to_numpy()
+
+
+def minmax_downsample(x, y, n_buckets):
+    """Reduziert (x, y) auf Minimum und Maximum je Bucket gleicher Punktzahl, in Originalreihenfolge.
+
+    Erster und letzter Punkt bleiben immer erhalten; bei höchstens 2 * n_buckets Punkten
+    werden die Daten unverändert zurückgegeben.
+    """
+    y = np.asarray(y)
+    n = len(y)
+    if n_buckets < 1 or n <= 2 * n_buckets:
+        return x, y
+    size = -(-n // n_buckets)  # Punkte pro Bucket, aufgerundet
+    n_full = -(-n // size)
+    values = np.asarray(y, dtype=np.float64)
+    low = np.full(n_full * size, np.inf)
+    high = np.full(n_full * size, -np.inf)
+    low[:n] = np.where(np.isnan(values), np.inf, values)
+    high[:n] = np.where(np.isnan(values), -np.inf, values)
+    offsets = np.arange(n_full) * size
+    picks = np.concatenate((
+        [0, n - 1],
+        offsets + low.reshape(n_full, size).argmin(axis=1),
+        offsets + high.reshape(n_full, size).argmax(axis=1),
+    ))
+    picks = np.unique(np.clip(picks, 0, n - 1))
+    return np.asarray(x)[picks], y[picks]
+
+
+class TimedFigureCanvas(FigureCanvasTkAgg):
+    """Tk-Canvas, dessen vollständiges Zeichnen als Span 'chart.draw' gemessen wird."""
+
+    def draw(self):
+        with PERF.span('chart.draw'):
+            super().draw()
+
+
+class ChartView:
+    """Ein Diagramm mit dauerhafter Figure, Canvas und Toolbar, dessen Daten an Ort und Stelle aktualisiert werden."""
+
+    def __init__(self, master, colors, figsize=(10, 4)):
+        self.master = master
+        self._init_figure(colors, figsize)
+        self.canvas = TimedFigureCanvas(self.figure, master=master)
+        self._init_canvas()
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.toolbar = CustomNavigationToolbar(self.canvas, master)
+        self.toolbar.update()
+        self.canvas.get_tk_widget().pack(fill=tk.X)
+
+    def _init_figure(self, colors, figsize, dpi=None):
+        self.colors = colors
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        self.ax = self.figure.add_subplot(111)
+        self.kind = None
+        self.lines = {}        # Label -> Line2D
+        self.full_series = {}  # Label -> (x, y) ungekürzt, Grundlage für das Downsampling
+        self.bar_groups = []   # BarContainer je Serie
+        self.bar_keys = None   # (Kategorien, Labels) der aktuellen Balken
+        self.annotations = []
+        self.show_legend = False
+        self._background = None
+        self.zoom_source = None
+        self._zoom_job = None
+        self._home_xlim = None
+        self._updating = False
+        self._style_static(colors)
+        self._connect_axes()
+
+    def _connect_axes(self):
+        self.ax.callbacks.connect('xlim_changed', self._on_xlim_changed)
+
+    def _init_canvas(self):
+        self.canvas.chart_view = self
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    # --- Daten ---
+    def plot_lines(self, series_list, title, xlabel=None, ylabel=None, value_labels=False, legend=False):
+        """Zeigt Linien; 'series_list' enthält (label, x, y, farbe). Vorhandene Linien werden per set_data aktualisiert."""
+        structure_changed = self.kind != 'line'
+        if structure_changed:
+            self._reset_axes('line')
+
+        wanted = [label for label, _, _, _ in series_list]
+        for label in list(self.lines):
+            if label not in wanted:
+                self.lines.pop(label).remove()
+                self.full_series.pop(label, None)
+                structure_changed = True
+
+        n_buckets = self.pixel_width()
+        for label, x, y, color in series_list:
+            self.full_series[label] = (x, y)
+            x, y = minmax_downsample(x, y, n_buckets)
+            line = self.lines.get(label)
+            if line is None:
+                (line,) = self.ax.plot(x, y, marker='.', linestyle='-', label=label, color=color, animated=True)
+                self.lines[label] = line
+                structure_changed = True
+            else:
+                line.set_data(x, y)
+                if color is not None:
+                    line.set_color(color)
+
+        annotations = []
+        if value_labels:
+            for _, x, y, _ in series_list:
+                annotations.extend((xi, yi, f' {yi:.2f}') for xi, yi in zip(x, y))
+        self._finish_update(title, xlabel, ylabel, legend, annotations, structure_changed, fontsize=8)
+
+    def plot_bars(self, categories, series_list, title, xlabel=None, ylabel=None, value_labels='each', legend=False):
+        """Zeigt (gruppierte) Balken; 'series_list' enthält (label, höhen, farbe).
+
+        Bei gleichen Kategorien und Serien werden nur die Balkenhöhen gesetzt. 'value_labels'
+        ist 'each' (Wert über jedem Balken), 'sum' (Summe je Kategorie) oder None.
+        """
+        categories = list(categories)
+        keys = (categories, [label for label, _, _ in series_list])
+        structure_changed = self.kind != 'bar' or self.bar_keys != keys
+        if structure_changed:
+            if self.kind == 'bar':
+                self._clear_bars()
+            else:
+                self._reset_axes('bar')
+            self.bar_keys = keys
+            positions = np.arange(len(categories))
+            width = 0.8 / max(len(series_list), 1)
+            for i, (label, heights, color) in enumerate(series_list):
+                offset = (i - (len(series_list) - 1) / 2) * width
+                container = self.ax.bar(positions + offset, heights, width=width, label=label, color=color, animated=True)
+                self.bar_groups.append(container)
+            self.ax.set_xticks(positions)
+            self.ax.set_xticklabels(categories)
+        else:
+            for container, (_, heights, color) in zip(self.bar_groups, series_list):
+                for rect, height in zip(container.patches, heights):
+                    rect.set_height(height)
+                    if color is not None:
+                        rect.set_facecolor(color)
+
+        annotations = []
+        if value_labels == 'each':
+            for container in self.bar_groups:
+                for rect in container.patches:
+                    annotations.append((rect.get_x() + rect.get_width() / 2.0, rect.get_height(), f'{rect.get_height():.2f}'))
+        elif value_labels == 'sum' and series_list:
+            matrix = np.array([heights for _, heights, _ in series_list], dtype=float)
+            for i, (p_sum, y_pos) in enumerate(zip(np.nansum(matrix, axis=0), np.nanmax(matrix, axis=0))):
+                if p_sum != 0:
+                    annotations.append((i, y_pos, f'{p_sum:.2f}'))
+        self._finish_update(title, xlabel, ylabel, legend, annotations, structure_changed,
+                            fontsize=9 if value_labels == 'sum' else 8, bold=value_labels == 'sum')
+
+    def pixel_width(self):
+        """Breite der Achsen in Pixeln (Anzahl der Min/Max-Buckets beim Downsampling)."""
+        return max(int(self.ax.get_window_extent().width), 1)
+
+    def _finish_update(self, title, xlabel, ylabel, legend, annotations, structure_changed, fontsize=8, bold=False):
+        self._updating = True
+        try:
+            # Auch das verzögerte Autoscaling beim Lesen der Grenzen soll keinen Zoom auslösen
+            old_limits = (self.ax.get_xlim(), self.ax.get_ylim())
+            self.ax.set_autoscale_on(True)
+            self.ax.relim()
+            self.ax.autoscale_view()
+        finally:
+            self._updating = False
+        self._home_xlim = self.ax.get_xlim()
+
+        text_changed = (title != self.ax.get_title() or (xlabel or '') != self.ax.get_xlabel()
+                        or (ylabel or '') != self.ax.get_ylabel())
+        self.ax.set_title(title)
+        self.ax.set_xlabel(xlabel or '')
+        self.ax.set_ylabel(ylabel or '')
+
+        for text in self.annotations:
+            text.remove()
+        self.annotations = [
+            self.ax.text(x, y, label, color=self.colors['fg'], va='bottom', ha='center', fontsize=fontsize,
+                         weight='bold' if bold else 'normal', animated=True)
+            for x, y, label in annotations
+        ]
+
+        self.show_legend = legend
+        self._update_legend()
+
+        limits_changed = (self.ax.get_xlim(), self.ax.get_ylim()) != old_limits
+        if structure_changed or limits_changed or text_changed:
+            self.figure.tight_layout()
+            self.canvas.draw_idle()
+        else:
+            self.blit()
+
+    # --- Zoom ---
+    def set_zoom_source(self, source):
+        """Registriert source(label, start, end, max_points) -> (x, y) für Zoom/Pan in Liniendiagrammen.
+
+        start/end sind numpy.datetime64 (Wandzeit). Ohne Quelle werden beim Zoomen nur die
+        vorhandenen Daten neu ausgedünnt.
+        """
+        self.zoom_source = source
+
+    def _on_xlim_changed(self, ax):
+        if self._updating or self.kind != 'line' or self.master is None:
+            return
+        # Pan erzeugt viele Änderungen kurz hintereinander; erst nach einer kurzen Pause neu laden
+        widget = self.canvas.get_tk_widget()
+        if self._zoom_job is not None:
+            widget.after_cancel(self._zoom_job)
+        self._zoom_job = widget.after(120, self._apply_zoom)
+
+    def _apply_zoom(self):
+        self._zoom_job = None
+        if self.kind != 'line' or not self.exists():
+            return
+        xlim = self.ax.get_xlim()
+        n_buckets = self.pixel_width()
+        at_home = self._home_xlim is not None and np.allclose(xlim, self._home_xlim)
+        start, end = (np.datetime64(mdates.num2date(v).replace(tzinfo=None), 'ms') for v in xlim)
+
+        visible = []
+        for label, line in self.lines.items():
+            x, y = self.full_series[label]
+            if not at_home and self.zoom_source is not None:
+                x, y = self.zoom_source(label, start, end, 2 * n_buckets)
+            else:
+                # Ohne Quelle bzw. in der Ausgangsansicht: Ausschnitt der vorhandenen Daten
+                x = np.asarray(x)
+                i0, i1 = np.searchsorted(x, start), np.searchsorted(x, end, side='right')
+                x, y = x[max(i0 - 1, 0):i1 + 1], np.asarray(y)[max(i0 - 1, 0):i1 + 1]
+            x, y = minmax_downsample(x, y, n_buckets)
+            line.set_data(x, y)
+            visible.append(np.asarray(y, dtype=float))
+
+        # Werte-Beschriftungen passen nach einem Auflösungswechsel nicht mehr zu den Punkten
+        for text in self.annotations:
+            text.remove()
+        self.annotations = []
+
+        values = np.concatenate(visible) if visible else np.array([])
+        values = values[np.isfinite(values)]
+        if len(values) and not at_home:
+            low, high = values.min(), values.max()
+            margin = (high - low) * 0.05 or abs(high) * 0.05 or 1.0
+            self._updating = True
+            try:
+                self.ax.set_ylim(low - margin, high + margin)
+            finally:
+                self._updating = False
+        self.canvas.draw_idle()
+
+    # --- Darstellung ---
+    def apply_colors(self, colors):
+        """Färbt Figure, Achsen, Beschriftungen und Legende um, ohne neu aufzubauen."""
+        self._style_static(colors)
+        for text in self.annotations:
+            text.set_color(colors['fg'])
+        self._update_legend()
+        self.canvas.draw_idle()
+
+    def _style_static(self, colors):
+        self.colors = colors
+        self.figure.patch.set_facecolor(colors['bg'])
+        self.ax.set_facecolor(colors['tree_odd'])
+        self.ax.tick_params(axis='x', colors=colors['fg'], labelrotation=45)
+        self.ax.tick_params(axis='y', colors=colors['fg'])
+        for spine in self.ax.spines.values():
+            spine.set_color(colors['fg'])
+        self.ax.title.set_color(colors['fg'])
+        self.ax.xaxis.label.set_color(colors['fg'])
+        self.ax.yaxis.label.set_color(colors['fg'])
+
+    def _update_legend(self):
+        legend = self.ax.get_legend()
+        if legend is not None:
+            legend.remove()
+        if self.show_legend:
+            self.ax.legend(facecolor=self.colors['bg'], labelcolor=self.colors['fg'])
+
+    def _reset_axes(self, kind):
+        # Wechsel zwischen Linien und Balken: Achse leeren, damit Locator/Formatter (Datum vs. Kategorien) neu greifen
+        self.ax.cla()
+        self.lines = {}
+        self.full_series = {}
+        self.bar_groups = []
+        self.bar_keys = None
+        self.annotations = []
+        self.kind = kind
+        self._style_static(self.colors)
+        self._connect_axes()
+
+    def _clear_bars(self):
+        for container in self.bar_groups:
+            container.remove()
+        self.bar_groups = []
+        self.bar_keys = None
+
+    # --- Blitting ---
+    def data_artists(self):
+        artists = list(self.lines.values())
+        for container in self.bar_groups:
+            artists.extend(container.patches)
+        return artists + self.annotations
+
+    def _on_draw(self, event):
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_data()
+
+    def _draw_data(self):
+        for artist in self.data_artists():
+            self.figure.draw_artist(artist)
+
+    def blit(self):
+        """Zeichnet nur die Datenartists über den gespeicherten Hintergrund."""
+        if self._background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self._background)
+        self._draw_data()
+        self.canvas.blit(self.figure.bbox)
+
+    @contextmanager
+    def static_artists(self):
+        """Schaltet die Animation der Datenartists vorübergehend ab (z.B. für savefig)."""
+        artists = self.data_artists()
+        for artist in artists:
+            artist.set_animated(False)
+        try:
+            yield
+        finally:
+            for artist in artists:
+                artist.set_animated(True)
+
+    def destroy(self):
+        """Entfernt Canvas und Toolbar und gibt die Figure frei (z.B. wenn das Diagramm aus dem Sichtbereich scrollt)."""
+        if self._zoom_job is not None:
+            self.canvas.get_tk_widget().after_cancel(self._zoom_job)
+            self._zoom_job = None
+        self.toolbar.destroy()
+        self.canvas.get_tk_widget().destroy()
+        self.figure.clear()
+        self._background = None
+
+    def exists(self):
+        return bool(self.canvas.get_tk_widget().winfo_exists())
+
+
+class RasterChart(ChartView):
+    """ChartView ohne Tk-Widgets; zeichnet mit Agg und liefert das Ergebnis als PNG."""
+
+    def __init__(self, colors, figsize=(10, 4), dpi=100):
+        self.master = None
+        self.toolbar = None
+        self._init_figure(colors, figsize, dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self._init_canvas()
+
+    def blit(self):
+        # Ohne Bildschirm gibt es nichts zu blitten; to_png zeichnet ohnehin vollständig
+        pass
+
+    def to_png(self):
+        buffer = io.BytesIO()
+        with self.static_artists():
+            self.figure.savefig(buffer, format='png', dpi=self.figure.dpi)
+        return buffer.getvalue()
+
+    def destroy(self):
+        self.figure.clear()
+
+
+def render_chart_png(colors, size_px, kind, plot_args, dpi=100):
+    """Rendert ein Diagramm als PNG (Einstiegspunkt für Worker-Prozesse).
+
+    'kind' ist 'line' oder 'bar', 'plot_args' die Schlüsselwortargumente für
+    ChartView.plot_lines bzw. ChartView.plot_bars; 'size_px' ist (Breite, Höhe).
+    """
+    width, height = size_px
+    chart = RasterChart(colors, figsize=(width / dpi, height / dpi), dpi=dpi)
+    if kind == 'bar':
+        chart.plot_bars(**plot_args)
+    else:
+        chart.plot_lines(**plot_args)
+    png = chart.to_png()
+    chart.destroy()
+    return png
@@ -0,0 +1,405 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+##############################
+# HA_Entity_Analyzer_Energy  #
+##############################
+
+# Kompakter Speicher für die Energie-Daten einer exportierten energy.csv.
+# Die CSV ist "breit": eine Zeile pro Sensor, eine Spalte pro Zeitstempel.
+# Statt bei jeder Diagrammaktion zu 'melt'en und Zeitstempel/Werte neu zu parsen,
+# wird beim Laden einmalig umgeformt:
+#   - die Zeitstempel-Kopfzeile wird genau einmal in einen DatetimeIndex geparst
+#   - die Werte landen blockweise in einer zusammenhängenden float32-Matrix (Sensor x Zeit),
+#     4 Bytes pro Wert statt eines Python-Strings
+#   - entity_id, type und unit liegen als kleine Metadaten-Arrays daneben
+# Übersteigt die Matrix SPILL_BYTES, wird sie als np.memmap in eine temporäre Datei
+# ausgelagert. Fehlende Werte bleiben NaN und werden erst beim Auslesen als 0 gewertet.
+#
+# Zusätzlich werden beim Laden kumulierte Summen je Sensor gebildet (PrefixSums).
+# Die Summe eines beliebigen Zeitraums ist damit eine Binärsuche plus eine
+# Differenz, auch für viele Zeitfenster auf einmal (z.B. Tarifzonen je Tag).
+
+# Spalten einer Energie-CSV, die keine Zeitstempel sind
+ENERGY_ID_COLUMNS = ['entity_id', 'type', 'unit']
+
+
+def parse_time_header(time_columns):
+    """Parst die Zeitstempel-Spalten einmalig; gibt (Reihenfolge, DatetimeIndex) der gültigen Spalten zurück."""
+    parsed = pd.to_datetime(pd.Index(time_columns), errors='coerce')
+    valid = np.flatnonzero(~parsed.isna())
+    order = valid[np.argsort(parsed[valid].asi8, kind='stable')]
+    return order, pd.DatetimeIndex(parsed[order], name='timestamp')
+
+
+def wall_clock(index):
+    """Zeitstempel ohne Zeitzone (lokale Wandzeit), wie sie in den Diagrammen dargestellt werden."""
+    return index.tz_localize(None) if index.tz is not None else index
+
+
+def window_bounds(wall_times, start, end, pad=1):
+    """Indexbereich [i0, i1) der sortierten Zeitstempel im Fenster [start, end] per Binärsuche.
+
+    'pad' nimmt links und rechts je einen weiteren Punkt mit, damit Linien bis an den Rand reichen.
+    """
+    i0 = int(wall_times.searchsorted(start, side='left'))
+    i1 = int(wall_times.searchsorted(end, side='right'))
+    return max(i0 - pad, 0), min(i1 + pad, len(wall_times))
+
+
+def range_bounds(wall_times, start=None, end=None):
+    """Indexbereich [i0, i1) der Zeitstempel im halboffenen Zeitraum [start, end); None = offen."""
+    i0 = 0 if start is None else int(wall_times.searchsorted(start, side='left'))
+    i1 = len(wall_times) if end is None else int(wall_times.searchsorted(end, side='left'))
+    return i0, max(i0, i1)
+
+
+def parse_tariff(tariff):
+    """Normalisiert eine Tariftabelle [(von, bis, preis), ...] mit Uhrzeiten 'HH:MM' (bis '24:00').
+
+    Gibt (Start-Offsets, End-Offsets, Tarifzeile) je Zeitfenster in Minuten seit Mitternacht sowie
+    die Preise je Tarifzeile zurück; Zonen über Mitternacht (z.B. 22:00-06:00) werden in zwei
+    Fenster zerlegt.
+    """
+    def minutes(text):
+        hours, _, mins = str(text).strip().partition(':')
+        value = int(hours) * 60 + int(mins or 0)
+        if not 0 <= value <= 24 * 60:
+            raise ValueError(f"Ungültige Uhrzeit: {text}")
+        return value
+
+    starts, ends, zones, prices = [], [], [], []
+    for zone, (begin, finish, price) in enumerate(tariff):
+        begin, finish = minutes(begin), minutes(finish)
+        prices.append(float(price))
+        parts = [(begin, finish)] if begin < finish else [(begin, 24 * 60), (0, finish)]
+        for part_begin, part_end in parts:
+            if part_begin < part_end:
+                starts.append(part_begin)
+                ends.append(part_end)
+                zones.append(zone)
+    return (np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64), np.array(zones, dtype=int),
+            np.array(prices, dtype=np.float64))
+
+
+def block_to_float32(block):
+    """Wandelt einen 2D-Block aus Strings in einem vektorisierten Schritt in float32 (ungültig -> NaN)."""
+    flat = pd.to_numeric(pd.Series(block.ravel(), dtype=object).str.strip(), errors='coerce')
+    return flat.to_numpy(dtype=np.float32, na_value=np.nan).reshape(block.shape)
+
+
+class AggregationPyramid:
+    """Vorberechnete Periodensummen (Tag/Woche/Monat/Jahr) für alle Sensoren.
+
+    Alle Stufen entstehen in einem vektorisierten Durchlauf über die Wertematrix; ein
+    Wechsel der Periode ist danach nur noch ein Nachschlagen. Die Bucket-Grenzen werden
+    über pandas.resample bestimmt, damit Beschriftungen exakt denen von resample().sum()
+    entsprechen.
+    """
+    BLOCK_ROWS = 1024  # Sensoren pro Block, begrenzt den float64-Zwischenspeicher
+
+    def __init__(self, store, rules):
+        self.levels = {}
+        n_times = len(store.timestamps)
+        positions = pd.Series(np.zeros(n_times), index=store.timestamps)
+        for period, rule in rules.items():
+            counts = positions.resample(rule).count()
+            labels = pd.DatetimeIndex(counts.index, name='timestamp')
+            counts = counts.to_numpy()
+            sums = np.zeros((len(store), len(labels)), dtype=np.float64)
+            filled = np.flatnonzero(counts)
+            if n_times and len(filled):
+                starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+                for start in range(0, len(store), self.BLOCK_ROWS):
+                    block = np.nan_to_num(store.values[start:start + self.BLOCK_ROWS].astype(np.float64), nan=0.0)
+                    sums[start:start + len(block), filled] = np.add.reduceat(block, starts, axis=1)
+            self.levels[period] = (labels, sums)
+        self.wall_labels = {period: wall_clock(labels) for period, (labels, _) in self.levels.items()}
+
+    def bucket_count(self, period):
+        return len(self.levels[period][0])
+
+    def count_between(self, period, start, end):
+        i0, i1 = window_bounds(self.wall_labels[period], start, end, pad=0)
+        return i1 - i0
+
+    def window(self, store, entity_id, period, start, end):
+        """Periodensummen eines Sensors im Zeitfenster [start, end] (Wandzeit)."""
+        labels, sums = self.levels[period]
+        i0, i1 = window_bounds(self.wall_labels[period], start, end)
+        return pd.Series(sums[store.row_of[entity_id], i0:i1], index=labels[i0:i1], name=entity_id)
+
+    def series(self, store, entity_id, period):
+        labels, sums = self.levels[period]
+        return pd.Series(sums[store.row_of[entity_id]], index=labels, name=entity_id)
+
+    def frame(self, store, entity_ids, period):
+        labels, sums = self.levels[period]
+        rows = [store.row_of[entity_id] for entity_id in entity_ids]
+        return pd.DataFrame(sums[rows].T, index=labels, columns=list(entity_ids))
+
+
+class PrefixSums:
+    """Kumulierte Summen je Sensor (float64, eine Spalte mehr als Zeitstempel).
+
+    cumsum[r, i] ist die Summe der ersten i Werte von Sensor r, die Summe über [i0, i1) damit
+    cumsum[r, i1] - cumsum[r, i0]. Große Matrizen werden wie die Werte als np.memmap ausgelagert.
+    """
+    BLOCK_ROWS = 1024
+
+    def __init__(self, store, spill_dir=None):
+        n_rows, n_times = len(store), len(store.timestamps)
+        self.cumsum, self.spill_path = EnergyStore.allocate(n_rows, n_times + 1, spill_dir, dtype=np.float64, fill=0.0)
+        for start in range(0, n_rows, self.BLOCK_ROWS):
+            block = np.nan_to_num(store.values[start:start + self.BLOCK_ROWS].astype(np.float64), nan=0.0)
+            np.cumsum(block, axis=1, out=self.cumsum[start:start + len(block), 1:])
+
+    def totals(self, rows, i0, i1):
+        """Summen der Zeilen 'rows' über [i0, i1); i0/i1 dürfen Arrays gleicher Form sein."""
+        rows = np.asarray(rows, dtype=int)
+        return self.cumsum[rows[:, None], np.asarray(i1)] - self.cumsum[rows[:, None], np.asarray(i0)] \
+            if np.ndim(i0) else self.cumsum[rows, i1] - self.cumsum[rows, i0]
+
+    def close(self):
+        cumsum, self.cumsum = self.cumsum, None
+        EnergyStore._release(cumsum, self.spill_path)
+        self.spill_path = None
+
+
+class EnergyStore:
+    """Sensor x Zeit-Matrix (float32) der Energiewerte mit Metadaten je Sensor."""
+    DTYPE = np.float32
+    SPILL_BYTES = 256 * 1024 * 1024  # größere Matrizen werden als np.memmap ausgelagert
+
+    def __init__(self, entity_ids, types, units, timestamps, values, time_labels=None, spill_path=None):
+        self.entity_ids = np.asarray(entity_ids, dtype=object)
+        self.types = np.asarray(types, dtype=object)
+        self.units = np.asarray(units, dtype=object)
+        self.timestamps = timestamps
+        self.values = values
+        # Originale Kopfzeilen-Texte, damit ein Export dieselben Spaltennamen schreibt
+        self.time_labels = list(time_labels) if time_labels is not None else [str(t) for t in timestamps]
+        self.spill_path = spill_path
+        self.row_of = {entity_id: row for row, entity_id in enumerate(self.entity_ids)}
+        self.pyramid = None
+        self.prefix = None
+        self._wall_times = None
+
+    def build_pyramid(self, rules):
+        """Berechnet die Periodensummen ({periode: pandas-Frequenz}) einmalig für alle Sensoren."""
+        self.pyramid = AggregationPyramid(self, rules)
+        return self.pyramid
+
+    def build_prefix_sums(self, spill_dir=None):
+        """Berechnet die kumulierten Summen je Sensor einmalig (Grundlage für range_totals)."""
+        self.prefix = PrefixSums(self, spill_dir)
+        return self.prefix
+
+    # --- Aufbau ---
+    @staticmethod
+    def allocate(n_rows, n_times, spill_dir=None, spill_bytes=None, dtype=None, fill=np.nan):
+        """Legt die Wertematrix an, bei Bedarf als np.memmap in einer temporären Datei."""
+        spill_bytes = EnergyStore.SPILL_BYTES if spill_bytes is None else spill_bytes
+        dtype = np.dtype(EnergyStore.DTYPE if dtype is None else dtype)
+        shape = (max(n_rows, 0), n_times)
+        if shape[0] * shape[1] * dtype.itemsize <= spill_bytes or 0 in shape:
+            return np.full(shape, fill, dtype=dtype), None
+        fd, path = tempfile.mkstemp(dir=spill_dir, prefix='energy_', suffix=f'.{dtype.kind}{dtype.itemsize * 8}')
+        os.close(fd)
+        values = np.memmap(path, dtype=dtype, mode='w+', shape=shape)
+        values[:] = fill
+        if os.name != 'nt':
+            # Unter POSIX bleibt die Datei bis zum Freigeben der Abbildung erhalten, auch ohne Verzeichniseintrag
+            os.remove(path)
+            path = None
+        return values, path
+
+    @classmethod
+    def from_chunks(cls, chunks, max_rows, spill_dir=None, spill_bytes=None):
+        """Baut den Speicher blockweise aus CSV-Chunks (String-DataFrames mit gleicher Kopfzeile).
+
+        'max_rows' ist eine obere Schranke für die Anzahl der Sensoren (z.B. die Zeilenzahl der
+        Datei); nicht benötigte Zeilen werden am Ende abgeschnitten. Es liegt immer nur ein
+        Chunk als Strings im Speicher.
+        """
+        values = spill_path = order = timestamps = time_columns = None
+        entity_ids, types, units = [], [], []
+        row = 0
+        try:
+            for chunk in chunks:
+                if values is None:
+                    all_time_columns = [col for col in chunk.columns if col not in ENERGY_ID_COLUMNS]
+                    order, timestamps = parse_time_header(all_time_columns)
+                    time_columns = [all_time_columns[i] for i in order]
+                    values, spill_path = cls.allocate(max_rows, len(time_columns), spill_dir, spill_bytes)
+
+                n = len(chunk)
+                if row + n > len(values):
+                    # Schranke war zu klein (z.B. Zeilenumbrüche in Werten): Matrix vergrößern
+                    grown, grown_path = cls.allocate(row + n, len(time_columns), spill_dir, spill_bytes)
+                    grown[:row] = values[:row]
+                    cls._release(values, spill_path)
+                    values, spill_path = grown, grown_path
+                values[row:row + n] = block_to_float32(chunk[time_columns].to_numpy(dtype=object))
+                for col, target in (('entity_id', entity_ids), ('type', types), ('unit', units)):
+                    target.extend(chunk[col].tolist() if col in chunk.columns else [''] * n)
+                row += n
+        except BaseException:
+            # Abbruch oder Fehler: angelegte Matrix samt Auslagerungsdatei wieder freigeben
+            if values is not None:
+                cls._release(values, spill_path)
+            raise
+
+        if values is None:
+            return cls([], [], [], pd.DatetimeIndex([], name='timestamp'), np.empty((0, 0), dtype=cls.DTYPE))
+        return cls(entity_ids, types, units, timestamps, values[:row], time_columns, spill_path)
+
+    @classmethod
+    def from_wide_frame(cls, df, spill_dir=None):
+        """Formt einen bereits geladenen String-DataFrame einer Energie-CSV um."""
+        return cls.from_chunks([df], len(df), spill_dir)
+
+    # --- Persistenz (Parse-Cache) ---
+    def to_arrays(self):
+        """Arrays für den Parse-Cache; die Wertematrix wird dort memory-mapped wieder geöffnet."""
+        return {
+            'entity_ids': self.entity_ids.astype(str),
+            'types': self.types.astype(str),
+            'units': self.units.astype(str),
+            'time_labels': np.array(self.time_labels, dtype=str),
+            '__mmap__values': np.asarray(self.values),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        # Die Kopfzeile ist bereits gefiltert und sortiert, erneutes Parsen betrifft nur eine Zeile
+        time_labels = arrays['time_labels'].tolist()
+        _, timestamps = parse_time_header(time_labels)
+        return cls(arrays['entity_ids'].astype(object), arrays['types'].astype(object), arrays['units'].astype(object),
+                   timestamps, arrays['__mmap__values'], time_labels)
+
+    # --- Freigabe ---
+    @staticmethod
+    def _release(values, spill_path):
+        if isinstance(values, np.memmap):
+            values.flush()
+        del values
+        if spill_path:
+            try:
+                os.remove(spill_path)
+            except OSError:
+                pass
+
+    def close(self):
+        """Gibt eine ausgelagerte Matrix frei und löscht die temporäre Datei."""
+        values, self.values = self.values, None
+        self._release(values, self.spill_path)
+        self.spill_path = None
+        if self.prefix is not None:
+            self.prefix.close()
+            self.prefix = None
+
+    # --- Zugriff ---
+    def __len__(self):
+        return len(self.entity_ids)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+    def unit_of(self, entity_id):
+        return self.units[self.row_of[entity_id]]
+
+    def row_values(self, entity_id):
+        """Werte eines Sensors als float64 (fehlende Werte = 0), direkt aus der Matrix gelesen."""
+        return np.nan_to_num(self.values[self.row_of[entity_id]].astype(np.float64), nan=0.0)
+
+    @property
+    def wall_times(self):
+        """Zeitstempel als Wandzeit, einmalig berechnet (Grundlage der Binärsuche für Zeitfenster)."""
+        if self._wall_times is None:
+            self._wall_times = wall_clock(self.timestamps)
+        return self._wall_times
+
+    def count_between(self, start, end):
+        i0, i1 = window_bounds(self.wall_times, start, end, pad=0)
+        return i1 - i0
+
+    def rows_of(self, entity_ids):
+        return np.array([self.row_of[entity_id] for entity_id in entity_ids], dtype=int)
+
+    def range_totals(self, entity_ids, start=None, end=None):
+        """Summen je Sensor im Zeitraum [start, end) (Wandzeit, None = offen) in O(1) je Sensor."""
+        i0, i1 = range_bounds(self.wall_times, start, end)
+        rows = self.rows_of(entity_ids)
+        if self.prefix is None:
+            block = self.values[rows, i0:i1].astype(np.float64)
+            return np.nansum(block, axis=1)
+        return self.prefix.totals(rows, i0, i1)
+
+    def tariff_costs(self, entity_ids, tariff, start=None, end=None):
+        """Verbrauch und Kosten je Sensor und Tarifzone im Zeitraum [start, end).
+
+        'tariff' ist eine Liste (von, bis, preis) mit Uhrzeiten 'HH:MM'. Für jeden Tag und jede
+        Zone wird die Summe über die kumulierten Summen bestimmt (eine Binärsuche für alle
+        Fenster gemeinsam). Gibt (Verbrauch[Sensor, Zone], Kosten[Sensor, Zone]) zurück.
+        """
+        zone_starts, zone_ends, zones, prices = parse_tariff(tariff)
+        rows = self.rows_of(entity_ids)
+        if self.prefix is None:
+            self.build_prefix_sums()
+        wall = self.wall_times
+        if not len(wall) or not len(zone_starts):
+            empty = np.zeros((len(rows), len(prices)))
+            return empty, empty
+        start = wall[0] if start is None else pd.Timestamp(start)
+        end = wall[-1] + pd.Timedelta(microseconds=1) if end is None else pd.Timestamp(end)
+
+        days = np.arange(start.floor('D').to_datetime64().astype('datetime64[D]'),
+                         end.ceil('D').to_datetime64().astype('datetime64[D]') + 1).astype('datetime64[ns]')
+        lows = days[:, None] + zone_starts[None, :].astype('timedelta64[m]')
+        highs = days[:, None] + zone_ends[None, :].astype('timedelta64[m]')
+        lows = np.clip(lows, start.to_datetime64(), end.to_datetime64())
+        highs = np.clip(highs, start.to_datetime64(), end.to_datetime64())
+        wall_ns = wall.to_numpy(dtype='datetime64[ns]')
+        i0 = np.searchsorted(wall_ns, lows.ravel(), side='left')
+        i1 = np.maximum(np.searchsorted(wall_ns, highs.ravel(), side='left'), i0)
+
+        totals = self.prefix.totals(rows, i0, i1).reshape(len(rows), len(days), len(zone_starts))
+        # Teilfenster (Zonen über Mitternacht) wieder ihrer Tarifzeile zuordnen
+        consumption = totals.sum(axis=1) @ np.eye(len(prices))[zones]
+        return consumption, consumption * prices[None, :]
+
+    def window(self, entity_id, start, end):
+        """Rohwerte eines Sensors im Zeitfenster [start, end] (Wandzeit), ohne die ganze Zeile umzuwandeln."""
+        i0, i1 = window_bounds(self.wall_times, start, end)
+        values = np.nan_to_num(self.values[self.row_of[entity_id], i0:i1].astype(np.float64), nan=0.0)
+        return pd.Series(values, index=self.timestamps[i0:i1], name=entity_id)
+
+    def series(self, entity_id):
+        """Zeitreihe eines Sensors (reiner Zeilenzugriff)."""
+        return pd.Series(self.row_values(entity_id), index=self.timestamps, name=entity_id)
+
+    def frame(self, entity_ids):
+        """Breite Tabelle (Zeitstempel x Sensor) für eine Auswahl von Sensoren."""
+        rows = [self.row_of[entity_id] for entity_id in entity_ids]
+        block = np.nan_to_num(self.values[rows].astype(np.float64), nan=0.0)
+        return pd.DataFrame(block.T, index=self.timestamps, columns=list(entity_ids))
+
+    def metadata_frame(self):
+        """Kleine Tabelle mit entity_id, type und unit je Sensor."""
+        return pd.DataFrame({'entity_id': self.entity_ids, 'type': self.types, 'unit': self.units})
+
+    def iter_wide_frames(self, rows=None, chunksize=500):
+        """Breites Format wie in der CSV, blockweise für den Export."""
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, dtype=int)
+        for start in range(0, len(rows), chunksize):
+            part = rows[start:start + chunksize]
+            block = pd.DataFrame(self.values[part], columns=self.time_labels)
+            block.insert(0, 'entity_id', self.entity_ids[part])
+            block.insert(1, 'type', self.types[part])
+            block.insert(2, 'unit', self.units[part])
+            yield block
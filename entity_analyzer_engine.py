@@ -0,0 +1,1294 @@
+import argparse
+import os
+import sys
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from entity_analyzer_cache import ParseCache
+from entity_analyzer_energy import EnergyStore, wall_clock
+from entity_analyzer_perf import PERF
+from entity_analyzer_homeassistant import fetch_entities, fetch_statistics, is_home_assistant_url
+from entity_analyzer_recorder import RecorderDatabase, is_recorder_database
+
+##############################
+# HA_Entity_Analyzer_Engine  #
+##############################
+
+# Analyse-Engine des Entity Analyzer Tools, unabhängig von Tkinter.
+# Wird von der GUI (entity_analyzer_tool.py) genutzt und kann als
+# Kommandozeilenwerkzeug ohne Display verwendet werden:
+#
+#   python entity_analyzer_engine.py load hass_entities.csv
+#   python entity_analyzer_engine.py search hass_entities.csv licht -o treffer.csv
+#   python entity_analyzer_engine.py filter hass_entities.csv area Küche
+#   python entity_analyzer_engine.py stats hass_entities.csv
+#   python entity_analyzer_engine.py diff hass_entities.csv hass_entities_gestern.csv
+#   python entity_analyzer_engine.py resample energy.csv --period M
+#   python entity_analyzer_engine.py export hass_entities.csv out.csv --search licht --where platform=hue
+
+COL_ENTITY_ID = 'entity id'
+COL_AREA = 'area'
+COL_PLATFORM = 'platform'
+COL_MANUFACTURER = 'manufacturer'
+COL_STATE = 'state'
+COL_MODEL = 'model'
+# Abgeleitete Spalten, nicht Teil der Tabelle: Domain der Entity-ID (Teil vor dem Punkt)
+# und Verfügbarkeit aus dem State (unavailable/unknown/kein Wert/verfügbar)
+COL_DOMAIN = 'domain'
+COL_AVAILABILITY = 'availability'
+UNAVAILABLE_STATES = ('unavailable', 'unknown')
+
+# Vergleich zweier Entitäten-Exporte: zusätzliche Spalten der Vergleichstabelle und Kategorien
+COL_CHANGE = 'änderung'
+COL_CHANGE_DETAILS = 'details'
+CHANGE_ADDED = 'hinzugefügt'
+CHANGE_REMOVED = 'entfernt'
+CHANGE_UNCHANGED = 'unverändert'
+CHANGE_OTHER = 'geändert'
+# Spalten mit eigener Änderungskategorie, alle übrigen zählen als 'geändert'
+COL_ENTITY_NAME = 'entity name'
+CHANGE_COLUMNS = {COL_ENTITY_NAME: 'umbenannt', COL_AREA: 'Area geändert', COL_STATE: 'State geändert'}
+
+# Spalten mit höchstens so vielen eindeutigen Werten (Anteil an den Zeilen) werden als
+# Kategorien gespeichert: je Zeile nur ein Integer-Code, jeder Text nur einmal im Speicher
+CATEGORY_MAX_RATIO = 0.5
+
+# Spalten des Facettenfilters (sofern in der CSV vorhanden)
+FACET_COLUMNS = (COL_CHANGE, COL_AREA, COL_PLATFORM, COL_MANUFACTURER, COL_DOMAIN, COL_STATE)
+
+# Kreuztabellen der Statistik (Kürzel -> (Titel, Zeilen-Spalte, Spalten-Spalte)), beim Laden vorberechnet
+CROSS_TABS = {
+    'area-domain': ("Area × Domain", COL_AREA, COL_DOMAIN),
+    'platform-domain': ("Plattform × Domain", COL_PLATFORM, COL_DOMAIN),
+    'manufacturer-model': ("Hersteller × Modell", COL_MANUFACTURER, COL_MODEL),
+    'availability-domain': ("Verfügbarkeit × Domain", COL_AVAILABILITY, COL_DOMAIN),
+    'availability-platform': ("Verfügbarkeit × Plattform", COL_AVAILABILITY, COL_PLATFORM),
+}
+
+# Aggregationsperioden der Diagramme (Anzeigename -> pandas-Frequenz)
+PERIODS = {"Original": "original", "Tag": "D", "Woche": "W", "Monat": "M", "Jahr": "Y"}
+
+# pandas >= 2.2 verwendet 'ME'/'YE' für Monats- und Jahresende
+RESAMPLE_ALIASES = {'M': 'ME', 'Y': 'YE'}
+
+# Perioden, deren Summen beim Laden vorberechnet werden (Periode -> pandas-Frequenz)
+AGGREGATION_RULES = {period: RESAMPLE_ALIASES.get(period, period) for period in PERIODS.values() if period != 'original'}
+
+
+def detect_csv_type(filepath):
+    """Analysiert die Kopfzeile, um den CSV-Typ und das Trennzeichen zu bestimmen."""
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            header = f.readline().strip()
+            # Heuristik für Energy-CSV: Zeitstempel-Format im Header
+            if ',' in header and any(c.isdigit() for c in header):
+                if header.count(',') > header.count(';'):
+                    return 'energy', ','
+            # Standard-Annahme: Entity-CSV mit Semikolon
+            return 'entity', ';'
+    except Exception:
+        # Fallback
+        return 'entity', ';'
+
+
+def clean_frame(df):
+    """Normalisiert Spaltennamen, entfernt leere 'unnamed'-Spalten und ersetzt fehlende Werte."""
+    df.columns = df.columns.str.lower().str.strip()
+    cols_to_drop = [col for col in df.columns if col.startswith('unnamed:')]
+    df.drop(columns=cols_to_drop, inplace=True, errors='ignore')
+    return df.fillna('')
+
+
+def encode_low_cardinality(df, max_ratio=CATEGORY_MAX_RATIO):
+    """Wandelt Spalten mit wenigen eindeutigen Werten (area, platform, state, ...) in Kategorien um."""
+    limit = max(1, int(len(df) * max_ratio))
+    for col in df.columns:
+        if not isinstance(df[col].dtype, pd.CategoricalDtype) and df[col].nunique() <= limit:
+            df[col] = df[col].astype('category')
+    return df
+
+
+def entity_domains(df):
+    """Domain jeder Entity-ID als kategorische Series (oder None ohne Entity-ID-Spalte)."""
+    if COL_ENTITY_ID not in df.columns:
+        return None
+    return df[COL_ENTITY_ID].astype(str).str.split('.', n=1).str[0].astype('category')
+
+
+def entity_availability(df):
+    """Verfügbarkeit je Zeile aus der State-Spalte als kategorische Series (oder None ohne State-Spalte)."""
+    if COL_STATE not in df.columns:
+        return None
+    codes, categories = encode_column(df[COL_STATE])
+    labels = np.array([value if value in UNAVAILABLE_STATES else ('kein Wert' if value == '' else 'verfügbar')
+                       for value in categories], dtype=object)
+    return pd.Series(labels[codes] if len(labels) else np.array([], dtype=object), dtype='category')
+
+
+def encode_column(series):
+    """(Codes je Zeile, Kategorien als Strings); nicht kategorische Spalten werden dafür kodiert."""
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(str).astype('category')
+    return series.cat.codes.to_numpy(), series.cat.categories.astype(str)
+
+
+def row_hashes(df, columns):
+    """64-Bit-Hash je Zeile über die Werte der Spalten, unabhängig davon, ob sie kategorisch gespeichert sind."""
+    hashes = np.zeros(len(df), dtype=np.uint64)
+    for column in columns:
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Jede Kategorie nur einmal hashen
+            value_hashes = pd.util.hash_array(series.cat.categories.astype(str).to_numpy(dtype=object))[series.cat.codes.to_numpy()]
+        else:
+            value_hashes = pd.util.hash_array(series.astype(str).to_numpy(dtype=object))
+        hashes = (hashes * np.uint64(1000003)) ^ value_hashes
+    return hashes
+
+
+def diff_entities(current, reference, key=COL_ENTITY_ID):
+    """Vergleicht zwei Entitäten-Exporte über die Entity-ID (Hash-Join).
+
+    Für jede Zeile wird ein Hash über alle gemeinsamen Spalten gebildet; nur Zeilen mit
+    abweichendem Hash werden spaltenweise verglichen. Gibt eine Tabelle mit den Spalten
+    'änderung' und 'details' vor den Spalten von 'current' zurück; entfernte Entitäten
+    stehen mit den Werten aus 'reference' am Ende.
+    """
+    if key not in current.columns or key not in reference.columns:
+        raise KeyError(f"Spalte '{key}' fehlt.")
+    current = current.drop_duplicates(key).reset_index(drop=True)
+    reference = reference.drop_duplicates(key).reset_index(drop=True)
+    columns = [col for col in current.columns if col in reference.columns and col != key]
+
+    # pd.Index.get_indexer baut eine Hashtabelle über die Referenz-IDs
+    ref_rows = pd.Index(reference[key].astype(str)).get_indexer(current[key].astype(str))
+    matched = ref_rows >= 0
+    changed = np.zeros(len(current), dtype=bool)
+    changed[matched] = row_hashes(current, columns)[matched] != row_hashes(reference, columns)[ref_rows[matched]]
+
+    labels = np.full(len(current), CHANGE_UNCHANGED, dtype=object)
+    labels[~matched] = CHANGE_ADDED
+    details = np.full(len(current), '', dtype=object)
+    changed_rows = np.flatnonzero(changed)
+    row_labels = [[] for _ in changed_rows]
+    row_details = [[] for _ in changed_rows]
+    for col in columns:
+        new = current[col].iloc[changed_rows].astype(str).to_numpy(dtype=object)
+        old = reference[col].iloc[ref_rows[changed_rows]].astype(str).to_numpy(dtype=object)
+        label = CHANGE_COLUMNS.get(col, CHANGE_OTHER)
+        for i in np.flatnonzero(new != old):
+            if label not in row_labels[i]:
+                row_labels[i].append(label)
+            row_details[i].append(f"{col}: {old[i]} → {new[i]}")
+    for i, row in enumerate(changed_rows):
+        labels[row] = ', '.join(row_labels[i])
+        details[row] = '; '.join(row_details[i])
+
+    removed = np.ones(len(reference), dtype=bool)
+    removed[ref_rows[matched]] = False
+    current_part = current.astype(str)
+    current_part.insert(0, COL_CHANGE_DETAILS, details)
+    current_part.insert(0, COL_CHANGE, labels)
+    removed_part = reference[removed].astype(str).reindex(columns=current.columns, fill_value='')
+    removed_part.insert(0, COL_CHANGE_DETAILS, '')
+    removed_part.insert(0, COL_CHANGE, CHANGE_REMOVED)
+    return pd.concat([current_part, removed_part], ignore_index=True)
+
+
+def lower_strings(series):
+    """Kleingeschriebene Werte einer Spalte als Object-Array; Kategorien werden nur einmal umgewandelt."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories.astype(str).str.lower().to_numpy(dtype=object)
+        return categories[series.cat.codes.to_numpy()]
+    return series.astype(str).str.lower().to_numpy(dtype=object)
+
+
+class LoadCancelled(Exception):
+    """Das Laden einer Datei wurde abgebrochen."""
+
+
+class _ProgressFile:
+    """Dateiobjekt, das gelesene Bytes meldet und beim Abbruch das Parsen beendet."""
+
+    def __init__(self, f, total, progress=None, cancel_event=None):
+        self._f = f
+        self.total = total
+        self.bytes_read = 0
+        self.progress = progress
+        self.cancel_event = cancel_event
+
+    def read(self, size=-1):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise LoadCancelled()
+        data = self._f.read(size)
+        self.bytes_read += len(data)
+        if self.progress is not None:
+            self.progress(self.bytes_read, self.total, 'parse')
+        return data
+
+    def __iter__(self):
+        return iter(self._f)
+
+
+def iter_csv_chunks(filepath, separator, progress=None, cancel_event=None, chunksize=20000):
+    """Liest eine exportierte CSV-Datei blockweise als bereinigte String-DataFrames.
+
+    'progress(gelesen, gesamt, phase)' wird mit den gelesenen Bytes aufgerufen; ist
+    'cancel_event' gesetzt, bricht das Lesen mit LoadCancelled ab.
+    """
+    total = os.path.getsize(filepath)
+    with open(filepath, 'rb') as f:
+        reader = _ProgressFile(f, total, progress, cancel_event)
+        for chunk in pd.read_csv(reader, sep=separator, dtype=str, skipinitialspace=True,
+                                 encoding='utf-8', chunksize=chunksize):
+            if cancel_event is not None and cancel_event.is_set():
+                raise LoadCancelled()
+            yield clean_frame(chunk)
+
+
+def read_csv(filepath, separator, progress=None, cancel_event=None, chunksize=20000):
+    """Liest eine exportierte CSV-Datei als bereinigten String-DataFrame ein."""
+    chunks = list(iter_csv_chunks(filepath, separator, progress, cancel_event, chunksize))
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+
+def count_lines(filepath, chunk_size=1024 * 1024):
+    """Zählt die Zeilenumbrüche einer Datei (schnelle obere Schranke für die Zeilenzahl)."""
+    lines = 0
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            lines += chunk.count(b'\n')
+    return lines + 1
+
+
+def read_energy_csv(filepath, separator=',', progress=None, cancel_event=None, spill_dir=None, chunksize=256):
+    """Liest eine Energie-CSV blockweise direkt in einen EnergyStore (float32, ggf. memory-mapped).
+
+    Es liegen nie mehr als 'chunksize' Sensorzeilen gleichzeitig als Strings im Speicher.
+    """
+    chunks = iter_csv_chunks(filepath, separator, progress, cancel_event, chunksize)
+    return EnergyStore.from_chunks(chunks, count_lines(filepath), spill_dir)
+
+
+# Ergebnis von AnalysisEngine.read(), wird mit AnalysisEngine.apply() übernommen
+# 'reference' ist bei einem Vergleich der Pfad des älteren Exports, sonst None
+LoadResult = namedtuple('LoadResult', ['filepath', 'csv_type', 'separator', 'df', 'from_cache', 'search_index', 'energy',
+                                       'domains', 'facets', 'stats', 'reference'], defaults=(None,))
+
+
+def resample_rule(period):
+    """Übersetzt die Periode der Aggregations-Buttons in eine pandas-Frequenz."""
+    return RESAMPLE_ALIASES.get(period, period)
+
+
+class SearchIndex:
+    """Volltext-Suchindex für die freie Suche.
+
+    Pro Zeile wird einmalig ein kleingeschriebener String aus allen Spalten gebildet.
+    Eine Suche ist danach ein einziger vektorisierter Teilstring-Vergleich über diese
+    Spalte. Wird der vorherige Suchbegriff nur erweitert, wird nur noch in dessen
+    Treffern gesucht.
+    """
+    SEPARATOR = '\x1f'  # Steuerzeichen, damit Treffer nicht über Spaltengrenzen hinweg entstehen
+
+    def __init__(self, df):
+        self.row_count = len(df)
+        if df.empty or len(df.columns) == 0:
+            self.rows = np.array([], dtype=object)
+        else:
+            columns = [lower_strings(df[col]) for col in df.columns]
+            blob = columns[0]
+            for col in columns[1:]:
+                blob = blob + self.SEPARATOR + col
+            self.rows = blob
+        self._last_term = None
+        self._last_ids = None
+
+    def search(self, term):
+        """Gibt die Zeilenpositionen (aufsteigend) zurück, die 'term' enthalten."""
+        term = term.lower()
+        if not term:
+            return np.arange(self.row_count)
+
+        if self._last_term is not None and self._last_term in term:
+            # Jeder Treffer für den erweiterten Begriff ist auch ein Treffer für den vorherigen
+            candidates = self._last_ids
+        else:
+            candidates = np.arange(self.row_count)
+
+        mask = pd.Series(self.rows[candidates], dtype=object).str.contains(term, regex=False).to_numpy(dtype=bool)
+        row_ids = candidates[mask]
+
+        self._last_term = term
+        self._last_ids = row_ids
+        return row_ids
+
+
+class SortIndex:
+    """Vorberechnete Sortierreihenfolgen über 'df_original'.
+
+    Je Spalte wird einmalig ein typisierter Schlüssel gebildet (numerisch, wenn alle nicht
+    leeren Werte Zahlen sind, sonst casefold) und als dichte Rangfolge abgelegt. Je Spalte und
+    Richtung wird die argsort-Permutation gecacht; eine Teilmenge der Zeilen wird danach in
+    O(n) sortiert, indem die Permutation auf die enthaltenen Zeilen gefiltert wird.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._ranks = {}
+        self._permutations = {}
+
+    def ranks(self, column):
+        """Dichte Rangfolge je Zeile; fehlende Zahlenwerte erhalten den größten Rang."""
+        if column not in self._ranks:
+            series = self.df[column]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                # Rangfolge nur für die Kategorien bilden und über die Codes auf die Zeilen verteilen
+                ranks, missing = self._dense_ranks(pd.Series(series.cat.categories.astype(str)))
+                codes = series.cat.codes.to_numpy()
+                self._ranks[column] = (ranks[codes], missing[codes])
+            else:
+                self._ranks[column] = self._dense_ranks(series.astype(str))
+        return self._ranks[column]
+
+    @staticmethod
+    def _dense_ranks(values):
+        numeric = pd.to_numeric(values.where(values.str.strip() != ''), errors='coerce')
+        non_empty = values.str.strip() != ''
+        if non_empty.any() and numeric[non_empty].notna().all():
+            key = numeric.to_numpy(dtype=np.float64)
+            missing = np.isnan(key)
+        else:
+            key = values.str.casefold().to_numpy(dtype=object)
+            missing = np.zeros(len(key), dtype=bool)
+        uniques, codes = np.unique(key[~missing], return_inverse=True)
+        ranks = np.full(len(key), len(uniques), dtype=np.int64)
+        ranks[~missing] = codes
+        return ranks, missing
+
+    def permutation(self, column, ascending=True):
+        """Stabile Sortierreihenfolge aller Zeilen; leere Zahlenwerte stehen in beiden Richtungen am Ende."""
+        key = (column, ascending)
+        if key not in self._permutations:
+            ranks, missing = self.ranks(column)
+            if not ascending:
+                ranks = np.where(missing, ranks, -ranks)
+            self._permutations[key] = np.argsort(ranks, kind='stable')
+        return self._permutations[key]
+
+    def order(self, rows, column, ascending=True):
+        """Sortiert Zeilenpositionen (Teilmenge von 'df') über die gecachte Permutation."""
+        permutation = self.permutation(column, ascending)
+        in_view = np.zeros(len(self.df), dtype=bool)
+        in_view[rows] = True
+        return permutation[in_view[permutation]]
+
+
+def filter_values(value):
+    """Normalisiert einen Filterwert (einzelner Wert oder Liste) zu einem Tupel von Werten."""
+    return (value,) if isinstance(value, str) else tuple(value)
+
+
+class FacetIndex:
+    """Zeilen-Index je (Spalte, Wert) für den Facettenfilter.
+
+    Je Spalte werden die Zeilenpositionen einmalig nach Wert-Code gruppiert (CSR-Format:
+    'order' enthält die Zeilen sortiert nach Code, 'offsets' die Grenzen je Code). Innerhalb
+    einer Spalte werden gewählte Werte vereinigt (ODER), zwischen Spalten geschnitten (UND);
+    beides sind reine Maskenoperationen ohne Stringvergleich.
+    """
+
+    def __init__(self, columns):
+        """'columns' ist ein Dict {Spalte: Series}; nicht kategorische Spalten werden kodiert."""
+        self.codes = {}
+        self.categories = {}
+        self.order = {}
+        self.offsets = {}
+        self.row_count = 0
+        for column, series in columns.items():
+            codes, categories = encode_column(series)
+            self.row_count = len(codes)
+            self.codes[column] = codes
+            self.categories[column] = categories
+            self.order[column] = np.argsort(codes, kind='stable')
+            self.offsets[column] = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=len(self.categories[column])))))
+
+    @classmethod
+    def from_frame(cls, df, domains=None, columns=FACET_COLUMNS):
+        available = {}
+        for column in columns:
+            if column in df.columns:
+                available[column] = df[column]
+            elif column == COL_DOMAIN and domains is not None:
+                available[column] = domains
+        return cls(available)
+
+    @property
+    def columns(self):
+        return list(self.codes)
+
+    def __contains__(self, column):
+        return column in self.codes
+
+    def rows(self, column, value):
+        """Zeilenpositionen (aufsteigend) mit 'column' == 'value'."""
+        code = self.categories[column].get_indexer([value])[0]
+        if code < 0:
+            return np.array([], dtype=np.int64)
+        return self.order[column][self.offsets[column][code]:self.offsets[column][code + 1]]
+
+    def mask(self, selections):
+        """Maske für {Spalte: Werte}: ODER innerhalb einer Spalte, UND zwischen den Spalten."""
+        mask = np.ones(self.row_count, dtype=bool)
+        for column, values in selections.items():
+            column_mask = np.zeros(self.row_count, dtype=bool)
+            for value in filter_values(values):
+                column_mask[self.rows(column, value)] = True
+            mask &= column_mask
+        return mask
+
+    def counts(self, column, mask):
+        """Anzahl der Zeilen in 'mask' je Wert der Spalte (Series über alle Werte, auch 0)."""
+        categories = self.categories[column]
+        return pd.Series(np.bincount(self.codes[column][mask], minlength=len(categories)), index=categories)
+
+
+class CrossTabStats:
+    """Vorberechnete Kreuztabellen (Anzahl je Wertepaar zweier Spalten).
+
+    Beim Laden wird je Tabelle jedes vorkommende Wertepaar auf einen fortlaufenden Schlüssel
+    abgebildet; die Schlüssel aller Tabellen liegen in disjunkten Bereichen. Ein einziges
+    np.bincount über alle Schlüssel zählt damit sämtliche Tabellen in einem Durchlauf, für den
+    Gesamtdatensatz wie für die Zeilen der aktuellen Ansicht.
+    """
+
+    def __init__(self, columns, tables=CROSS_TABS):
+        """'columns' ist ein Dict {Spalte: Series}; Tabellen mit fehlenden Spalten entfallen."""
+        encoded = {column: encode_column(series) for column, series in columns.items()}
+        self.tables = {}
+        keys = []
+        offset = 0
+        for key, (title, row_column, col_column) in tables.items():
+            if row_column not in encoded or col_column not in encoded:
+                continue
+            row_codes, row_categories = encoded[row_column]
+            col_codes, col_categories = encoded[col_column]
+            pairs, inverse = np.unique(row_codes.astype(np.int64) * len(col_categories) + col_codes, return_inverse=True)
+            keys.append(offset + inverse.reshape(-1))
+            self.tables[key] = (title, row_column, col_column, row_categories[pairs // len(col_categories)],
+                                col_categories[pairs % len(col_categories)], offset)
+            offset += len(pairs)
+        self.size = offset
+        self.keys = np.vstack(keys) if keys else np.empty((0, 0), dtype=np.int64)
+        self.totals = self.count()
+        self._cached_rows = None
+        self._cached_counts = None
+
+    def count(self, rows=None):
+        """Anzahl je Schlüssel aller Tabellen für 'rows' (Zeilenpositionen, None = alle)."""
+        keys = self.keys if rows is None else self.keys[:, rows]
+        return np.bincount(keys.ravel(), minlength=self.size)
+
+    def counts_for(self, rows=None):
+        """Wie count(), mit den Gesamtzahlen und dem zuletzt gezählten Zeilen-Array als Cache."""
+        if rows is None:
+            return self.totals
+        if rows is not self._cached_rows:
+            self._cached_rows, self._cached_counts = rows, self.count(rows)
+        return self._cached_counts
+
+    def titles(self):
+        """{Kürzel: Titel} der verfügbaren Tabellen."""
+        return {key: table[0] for key, table in self.tables.items()}
+
+    def table(self, key, rows=None):
+        """Lange Form einer Kreuztabelle: Zeilen-Wert, Spalten-Wert, Anzahl (absteigend, ohne Nullen)."""
+        _, row_column, col_column, row_values, col_values, offset = self.tables[key]
+        counts = self.counts_for(rows)[offset:offset + len(row_values)]
+        present = counts > 0
+        long = pd.DataFrame({row_column: np.asarray(row_values)[present], col_column: np.asarray(col_values)[present],
+                             'Anzahl': counts[present]})
+        return long.sort_values('Anzahl', ascending=False, kind='stable').reset_index(drop=True)
+
+    def pivot(self, key, rows=None):
+        """Kreuztabelle als Matrix (Zeilen-Werte x Spalten-Werte) mit Zeilen- und Spaltensummen."""
+        _, row_column, col_column, _, _, _ = self.tables[key]
+        long = self.table(key, rows)
+        pivot = long.pivot_table(index=row_column, columns=col_column, values='Anzahl', aggfunc='sum', fill_value=0)
+        pivot = pivot.astype(np.int64)
+        pivot['Summe'] = pivot.sum(axis=1)
+        pivot = pivot.sort_values('Summe', ascending=False, kind='stable')
+        pivot.loc['Summe'] = pivot.sum(axis=0)
+        pivot.columns.name = None
+        return pivot
+
+
+class RowView:
+    """Ansicht als Array von Zeilenpositionen über einen unveränderlichen DataFrame.
+
+    Suche, Filter und Sortierung erzeugen nur neue Positionsarrays; die Zeilen selbst werden
+    erst beim Anzeigen (ausschnittsweise) oder beim Export (blockweise) gelesen.
+    """
+    EXPORT_CHUNK_ROWS = 10000
+
+    def __init__(self, df, rows=None):
+        self.df = df
+        self.rows = np.arange(len(df)) if rows is None else np.asarray(rows, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def empty(self):
+        return len(self.rows) == 0
+
+    @property
+    def columns(self):
+        return self.df.columns
+
+    def rows_as_lists(self, start, stop):
+        """Werte der Ansichtszeilen [start, stop) als Listen, z.B. für die sichtbaren Tabellenzeilen."""
+        return self.df.iloc[self.rows[start:stop]].values.tolist()
+
+    def iter_frames(self, chunksize=EXPORT_CHUNK_ROWS):
+        """Materialisiert die Ansicht blockweise (mindestens ein, ggf. leerer Block für die Kopfzeile)."""
+        for start in range(0, max(len(self.rows), 1), chunksize):
+            yield self.df.iloc[self.rows[start:start + chunksize]]
+
+    def to_frame(self):
+        """Die Ansicht als eigener DataFrame (kopiert alle enthaltenen Zeilen)."""
+        return self.df.iloc[self.rows]
+
+
+class AnalysisEngine:
+    """Hält die geladenen Daten und stellt Suche, Filter, Statistik und Aggregation bereit.
+
+    'df_original' ist der unveränderte, bereinigte Datensatz; 'view' die aktuelle Ansicht
+    nach Suche, Filter und Sortierung als RowView (Zeilenpositionen in 'df_original').
+    Suchbegriff, Filter und Sortierung werden getrennt gehalten und bei jeder Änderung zu
+    einer neuen Ansicht kombiniert.
+    """
+
+    def __init__(self, cache=None, spill_dir=None):
+        self.cache = cache
+        self.spill_dir = spill_dir
+        self.loaded_from_cache = False
+        self.filepath = None
+        self.csv_type = None
+        self.separator = ';'
+        self.df_original = None
+        self.view = None
+        self.search_term = ''
+        self.filters = {}
+        self.sort_key = None  # (Spalte, aufsteigend)
+        self.search_index = None
+        self.sort_index = None
+        self.domains = None
+        self.facets = None
+        self.stats = None
+        self.reference = None
+        self.energy = None
+        # Optionen von read_recorder()/read_home_assistant(), wenn read() eine Recorder-Datenbank
+        # oder die URL einer Home-Assistant-Instanz statt einer CSV bekommt
+        self.recorder_options = {}
+
+    # --- Laden & Export ---
+    def load(self, filepath):
+        """Lädt eine Entitäten- oder Energie-CSV und gibt den erkannten Typ zurück."""
+        return self.apply(self.read(filepath))
+
+    def read(self, filepath, progress=None, cancel_event=None):
+        """Liest und bereitet eine Datei auf, ohne den Zustand der Engine zu ändern.
+
+        Kann in einem Worker-Thread laufen; das Ergebnis wird mit apply() übernommen.
+        Eine Recorder-Datenbank wird erkannt und mit read_recorder() gelesen, eine URL mit read_home_assistant().
+        """
+        if is_home_assistant_url(filepath):
+            return self.read_home_assistant(filepath, progress=progress, cancel_event=cancel_event, **self.recorder_options)
+        if is_recorder_database(filepath):
+            return self.read_recorder(filepath, progress=progress, cancel_event=cancel_event, **self.recorder_options)
+        with PERF.span('read.parse', datei=os.path.basename(filepath)) as details:
+            csv_type, separator, df, energy, from_cache = self._parse(filepath, progress, cancel_event)
+            details['cache'] = from_cache
+        return self._prepare(filepath, csv_type, separator, df, energy, from_cache, progress, cancel_event)
+
+    def read_recorder(self, filepath, source='statistics', start=None, end=None, means=False, tz=None, progress=None,
+                      cancel_event=None):
+        """Liest eine Kopie von home-assistant_v2.db direkt, ohne CSV; Ergebnis wie read().
+
+        'source' ist 'statistics' (stündlich), 'short_term' (5 Minuten) oder 'states' (Entitäten mit
+        letztem State). 'start'/'end' begrenzen den Zeitraum, 'means' nimmt Mittelwert-Sensoren dazu.
+        'tz' ist die Zeitzone der Zeitstempel und eines Zeitraums ohne Zeitzone (Standard: Rechner).
+        Die Datenbank ist keine Exportdatei und läuft daher nicht über den Parse-Cache.
+        """
+        def report(done, total, phase):
+            if cancel_event is not None and cancel_event.is_set():
+                raise LoadCancelled()
+            if progress is not None:
+                progress(done, total, phase)
+
+        df = energy = None
+        with PERF.span('read.recorder', datei=os.path.basename(filepath), quelle=source):
+            with RecorderDatabase(filepath) as db:
+                if source == 'states':
+                    df = db.read_entities(end, tz=tz, progress=report)
+                else:
+                    energy = db.read_statistics(start, end, means=means, short_term=source == 'short_term', tz=tz,
+                                                progress=report, spill_dir=self.spill_dir)
+        if energy is None:
+            return self._prepare(filepath, 'entity', ';', df, None, False, progress, cancel_event)
+        return self._prepare(filepath, 'energy', ',', None, energy, False, progress, cancel_event)
+
+    def read_home_assistant(self, url, token=None, source='statistics', start=None, end=None, means=False, tz=None,
+                            progress=None, cancel_event=None):
+        """Holt die Daten über die WebSocket-API einer laufenden Instanz; Ergebnis wie read().
+
+        'source', 'start', 'end' und 'means' wie bei read_recorder(); 'tz' überschreibt die in Home Assistant
+        eingestellte Zeitzone. Mit 'states' entsteht die Tabelle des Button-Card-Exports aus Entity-, Geräte-
+        und Area-Registry. Ohne 'token' wird HA_TOKEN aus der
+        Umgebung verwendet (Long-Lived Access Token aus dem Benutzerprofil).
+        """
+        token = token or os.environ.get('HA_TOKEN')
+        if not token:
+            raise ValueError("Für Home Assistant wird ein Long-Lived Access Token benötigt (--token oder HA_TOKEN).")
+
+        def report(done, total, phase):
+            if cancel_event is not None and cancel_event.is_set():
+                raise LoadCancelled()
+            if progress is not None:
+                progress(done, total, phase)
+
+        df = energy = None
+        with PERF.span('read.homeassistant', url=url, quelle=source):
+            if source == 'states':
+                df = fetch_entities(url, token, progress=report)
+            else:
+                energy = fetch_statistics(url, token, start, end, means=means, short_term=source == 'short_term', tz=tz,
+                                          progress=report, spill_dir=self.spill_dir)
+        if energy is None:
+            return self._prepare(url, 'entity', ';', df, None, False, progress, cancel_event)
+        return self._prepare(url, 'energy', ',', None, energy, False, progress, cancel_event)
+
+    def _prepare(self, filepath, csv_type, separator, df, energy, from_cache, progress=None, cancel_event=None):
+        """Periodensummen bzw. Indizes für gelesene Daten; gemeinsamer Teil von read(), read_recorder() und read_home_assistant()."""
+        if energy is not None:
+            if progress is not None:
+                progress(0, 1, 'aggregate')
+            with PERF.span('read.aggregate', sensoren=len(energy)):
+                energy.build_pyramid(AGGREGATION_RULES)
+                energy.build_prefix_sums(self.spill_dir)
+
+        search_index = None
+        domains = None
+        facets = None
+        stats = None
+        if csv_type == 'entity':
+            df, search_index, domains, facets, stats = self._prepare_entities(df, progress)
+        else:
+            # Für Energie-CSVs enthält die Tabelle nur die Metadaten je Sensor
+            df = energy.metadata_frame()
+
+        if cancel_event is not None and cancel_event.is_set():
+            if energy is not None:
+                energy.close()
+            raise LoadCancelled()
+        return LoadResult(filepath, csv_type, separator, df, from_cache, search_index, energy, domains, facets, stats)
+
+    def read_comparison(self, reference_path, progress=None, cancel_event=None):
+        """Vergleicht 'df_original' mit einem älteren Entitäten-Export; Ergebnis wie read() für apply().
+
+        Die Tabelle des Ergebnisses ist die Vergleichstabelle (siehe diff_entities); Suche,
+        Filter, Facetten und Statistik arbeiten darauf wie auf einem geladenen Export.
+        """
+        if self.csv_type != 'entity' or self.reference is not None:
+            raise ValueError("Vergleiche sind nur mit einer geladenen Entitäten-CSV möglich.")
+        if is_home_assistant_url(reference_path) or is_recorder_database(reference_path):
+            raise ValueError("Die Vergleichsdatei ist keine Entitäten-CSV.")
+        csv_type, _, reference, _, _ = self._parse(reference_path, progress, cancel_event)
+        if csv_type != 'entity':
+            raise ValueError("Die Vergleichsdatei ist keine Entitäten-CSV.")
+        diff = diff_entities(self.df_original, reference)
+        if cancel_event is not None and cancel_event.is_set():
+            raise LoadCancelled()
+        df, search_index, domains, facets, stats = self._prepare_entities(diff, progress)
+        return LoadResult(self.filepath, 'entity', self.separator, df, self.loaded_from_cache, search_index, None,
+                          domains, facets, stats, reference_path)
+
+    @PERF.timed('read.index')
+    def _prepare_entities(self, df, progress=None):
+        """Kategorien, Suchindex, Facetten und Kreuztabellen für eine Entitäten-Tabelle."""
+        if progress is not None:
+            progress(0, 1, 'index')
+        # Der Cache enthält reine Strings; die Kategorien werden bei jedem Laden neu gebildet
+        df = encode_low_cardinality(df)
+        domains = entity_domains(df)
+        search_index = SearchIndex(df)
+        facets = FacetIndex.from_frame(df, domains)
+        stats = CrossTabStats(self._stats_columns(df, domains))
+        return df, search_index, domains, facets, stats
+
+    def _parse(self, filepath, progress=None, cancel_event=None):
+        """Liest eine Datei (oder ihren Cache-Eintrag): (csv_type, separator, df, energy, aus_cache)."""
+        df = energy = None
+        cached = self._cache_get(filepath)
+        if cached is not None:
+            payload, meta = cached
+            csv_type, separator = meta['csv_type'], meta['separator']
+            if csv_type == 'energy':
+                energy = EnergyStore.from_arrays(payload)
+            else:
+                df = payload
+        else:
+            csv_type, separator = detect_csv_type(filepath)
+            meta = {'csv_type': csv_type, 'separator': separator}
+            if csv_type == 'energy':
+                # Energiewerte landen direkt als float32 im EnergyStore, ohne String-DataFrame
+                energy = read_energy_csv(filepath, separator, progress, cancel_event, self.spill_dir)
+                self._cache_put(filepath, energy.to_arrays(), meta)
+            else:
+                df = read_csv(filepath, separator, progress, cancel_event)
+                if cancel_event is not None and cancel_event.is_set():
+                    raise LoadCancelled()
+                self._cache_put(filepath, df, meta)
+        return csv_type, separator, df, energy, cached is not None
+
+    def apply(self, result):
+        """Übernimmt ein LoadResult als neuen Datensatz und gibt den CSV-Typ zurück."""
+        if self.energy is not None and self.energy is not result.energy:
+            self.energy.close()
+        self.loaded_from_cache = result.from_cache
+        self.filepath = result.filepath
+        self.csv_type = result.csv_type
+        self.separator = result.separator
+        self.df_original = result.df
+        self.search_index = result.search_index
+        self.sort_index = None
+        self.domains = result.domains
+        self.facets = result.facets
+        self.stats = result.stats
+        self.reference = result.reference
+        self.energy = result.energy
+        self.reset()
+        return self.csv_type
+
+    @staticmethod
+    def _stats_columns(df, domains):
+        columns = {column: df[column] for column in df.columns}
+        if domains is not None:
+            columns[COL_DOMAIN] = domains
+        availability = entity_availability(df)
+        if availability is not None:
+            columns[COL_AVAILABILITY] = availability
+        return columns
+
+    @property
+    def df_data(self):
+        """Die aktuelle Ansicht als DataFrame; kopiert die Zeilen, für Anzeige und Export 'view' verwenden."""
+        return None if self.view is None else self.view.to_frame()
+
+    def _cache_get(self, filepath):
+        if self.cache is None:
+            return None
+        try:
+            cached = self.cache.get(filepath)
+        except OSError:
+            return None
+        if cached is None or 'csv_type' not in cached[1]:
+            return None
+        return cached
+
+    def _cache_put(self, filepath, df, meta):
+        # Ein nicht beschreibbarer Cache darf das Laden nicht verhindern
+        if self.cache is None:
+            return
+        try:
+            self.cache.put(filepath, df, meta)
+        except OSError:
+            pass
+
+    def export(self, target, view=None):
+        """Schreibt die aktuelle Ansicht (oder 'view', RowView bzw. DataFrame) als CSV in eine Datei oder einen Stream.
+
+        Eine RowView wird blockweise materialisiert, der Speicherbedarf bleibt nahe dem Datensatz selbst.
+        """
+        if self.csv_type == 'energy' and view is None:
+            self._export_energy(target)
+            return
+        view = self.view if view is None else view
+        sep = ',' if self.csv_type == 'energy' else ';'
+        if isinstance(view, pd.DataFrame):
+            view.to_csv(target, sep=sep, index=False, encoding='utf-8')
+            return
+        own_file = isinstance(target, (str, os.PathLike))
+        f = open(target, 'w', encoding='utf-8', newline='') if own_file else target
+        try:
+            for i, block in enumerate(view.iter_frames()):
+                block.to_csv(f, sep=sep, index=False, header=(i == 0))
+        finally:
+            if own_file:
+                f.close()
+
+    def _export_energy(self, target):
+        """Schreibt die Energiewerte blockweise im breiten CSV-Format der Originaldatei."""
+        # Die Metadaten-Tabelle hat dieselbe Zeilenreihenfolge wie der EnergyStore
+        rows = self.view.rows
+        own_file = isinstance(target, (str, os.PathLike))
+        f = open(target, 'w', encoding='utf-8', newline='') if own_file else target
+        try:
+            for i, block in enumerate(self.energy.iter_wide_frames(rows)):
+                block.to_csv(f, sep=',', index=False, header=(i == 0))
+        finally:
+            if own_file:
+                f.close()
+
+    # --- Suche, Filter & Sortierung ---
+    def search_rows(self, term):
+        """Gibt die Zeilenpositionen in 'df_original' zurück, die den Suchbegriff enthalten."""
+        if self.search_index is None:
+            self.search_index = SearchIndex(self.df_original)
+        return self.search_index.search(term.strip())
+
+    def has_column(self, column):
+        """True für Tabellenspalten und die abgeleitete Spalte 'domain'."""
+        return column in self.df_original.columns or (column == COL_DOMAIN and self.domains is not None)
+
+    def column_values(self, column):
+        """Die Werte einer Tabellenspalte oder der abgeleiteten Domain-Spalte als Series."""
+        if column in self.df_original.columns:
+            return self.df_original[column]
+        if column == COL_DOMAIN and self.domains is not None:
+            return self.domains
+        raise KeyError(f"Spalte '{column}' nicht gefunden.")
+
+    def category_codes(self, column):
+        """(Codes je Zeile, Kategorien) einer kategorischen Spalte, sonst None."""
+        series = self.column_values(column)
+        if not isinstance(series.dtype, pd.CategoricalDtype):
+            return None
+        return series.cat.codes.to_numpy(), series.cat.categories
+
+    def filter_mask(self, column, value):
+        """Boolesche Maske über 'df_original' für einen einzelnen Gleichheitsfilter."""
+        encoded = self.category_codes(column)
+        if encoded is None:
+            return (self.column_values(column) == value).to_numpy()
+        # Vergleich auf Integer-Codes statt auf Strings
+        codes, categories = encoded
+        code = categories.get_indexer([value])[0]
+        if code < 0:
+            return np.zeros(len(codes), dtype=bool)
+        return codes == code
+
+    def search_mask(self, search=None):
+        """Boolesche Maske über 'df_original' für die Freitextsuche (alle Zeilen ohne Suchbegriff)."""
+        if not search:
+            return np.ones(len(self.df_original), dtype=bool)
+        mask = np.zeros(len(self.df_original), dtype=bool)
+        mask[self.search_rows(search)] = True
+        return mask
+
+    def selection_mask(self, filters, exclude=None):
+        """Maske für {spalte: wert oder werte}; Facettenspalten über den FacetIndex, sonst per Vergleich.
+
+        'exclude' lässt eine Spalte aus, z.B. für die Zählung ihrer eigenen Werte.
+        """
+        mask = np.ones(len(self.df_original), dtype=bool)
+        indexed = {}
+        for column, values in filters.items():
+            if column == exclude:
+                continue
+            if self.facets is not None and column in self.facets:
+                indexed[column] = values
+                continue
+            column_mask = np.zeros(len(self.df_original), dtype=bool)
+            for value in filter_values(values):
+                column_mask |= self.filter_mask(column, value)
+            mask &= column_mask
+        if indexed:
+            mask &= self.facets.mask(indexed)
+        return mask
+
+    def query_rows(self, search=None, filters=None, sort_key=None):
+        """Zeilenpositionen für Freitextsuche, Filter ({spalte: wert oder werte}) und Sortierung."""
+        rows = np.flatnonzero(self.search_mask(search) & self.selection_mask(filters or {}))
+        if sort_key is not None:
+            rows = self._sort_index().order(rows, *sort_key)
+        return rows
+
+    def query(self, search=None, filters=None):
+        """Kombiniert Freitextsuche und Gleichheitsfilter zu einer Ansicht (RowView), ohne den Zustand zu ändern."""
+        return RowView(self.df_original, self.query_rows(search, filters))
+
+    def _update_view(self):
+        self.view = RowView(self.df_original, self.query_rows(self.search_term, self.filters, self.sort_key))
+        return self.view
+
+    def search(self, term):
+        """Setzt den Suchbegriff; Filter und Sortierung bleiben erhalten."""
+        self.search_term = term.strip()
+        return self._update_view()
+
+    def filter(self, column, value):
+        """Setzt den Filter 'column' == 'value' (ersetzt einen vorherigen Filter derselben Spalte)."""
+        return self.set_facet(column, [value])
+
+    def set_facet(self, column, values):
+        """Setzt die gewählten Werte einer Spalte (ODER); eine leere Auswahl hebt den Filter auf."""
+        if not self.has_column(column):
+            raise KeyError(f"Spalte '{column}' nicht gefunden.")
+        values = filter_values(values)
+        if values:
+            self.filters[column] = values
+        else:
+            self.filters.pop(column, None)
+        return self._update_view()
+
+    def clear_filters(self, columns=None):
+        """Hebt die Filter der angegebenen Spalten (Standard: alle) auf; Suche und Sortierung bleiben."""
+        for column in list(self.filters) if columns is None else columns:
+            self.filters.pop(column, None)
+        return self._update_view()
+
+    def facet_counts(self):
+        """Trefferzahlen je Facettenspalte und Wert für Suche und Filter der übrigen Spalten.
+
+        Die eigene Auswahl einer Spalte bleibt dabei unberücksichtigt, damit weitere Werte
+        derselben Spalte mit ihrer Trefferzahl angezeigt werden. Gibt {Spalte: Series} zurück.
+        """
+        if self.facets is None:
+            return {}
+        base = self.search_mask(self.search_term)
+        return {column: self.facets.counts(column, base & self.selection_mask(self.filters, exclude=column))
+                for column in self.facets.columns}
+
+    def reset(self):
+        """Hebt Suche, Filter und Sortierung auf."""
+        self.search_term = ''
+        self.filters = {}
+        self.sort_key = None
+        self.view = RowView(self.df_original)
+        return self.view
+
+    def _sort_index(self):
+        if self.sort_index is None:
+            self.sort_index = SortIndex(self.df_original)
+        return self.sort_index
+
+    def sort(self, column, ascending=True):
+        """Sortiert die aktuelle Ansicht, numerisch wenn möglich, sonst ohne Groß-/Kleinschreibung."""
+        if column not in self.df_original.columns:
+            raise KeyError(f"Spalte '{column}' nicht gefunden.")
+        self.sort_key = (column, ascending)
+        self.view = RowView(self.df_original, self._sort_index().order(self.view.rows, column, ascending))
+        return self.view
+
+    def unique_values(self, column):
+        """Sortierte eindeutige Werte einer Spalte aus 'df_original'."""
+        encoded = self.category_codes(column)
+        values = encoded[1] if encoded is not None else self.column_values(column).unique()
+        return sorted(map(str, values), key=str.lower)
+
+    # --- Statistik ---
+    def value_counts(self, column):
+        """Anzahl der Zeilen je Wert, absteigend; für kategorische Spalten per bincount über die Codes."""
+        encoded = self.category_codes(column)
+        if encoded is None:
+            return self.column_values(column).value_counts()
+        codes, categories = encoded
+        counts = pd.Series(np.bincount(codes, minlength=len(categories)), index=categories.astype(str))
+        return counts[counts > 0].sort_values(ascending=False, kind='stable')
+
+    def cross_tab(self, key, view_only=True, pivot=True):
+        """Vorberechnete Kreuztabelle (Kürzel aus CROSS_TABS) für die aktuelle Ansicht oder alle Zeilen."""
+        if self.stats is None or key not in self.stats.tables:
+            raise KeyError(f"Kreuztabelle '{key}' ist für diese Datei nicht verfügbar.")
+        rows = self.view.rows if view_only else None
+        return self.stats.pivot(key, rows) if pivot else self.stats.table(key, rows)
+
+    def domain_stats(self):
+        """Anzahl der Entitäten pro Domain (Teil der Entity-ID vor dem Punkt)."""
+        if self.domains is None:
+            raise KeyError(f"Spalte '{COL_ENTITY_ID}' fehlt.")
+        domain_counts = self.value_counts(COL_DOMAIN)
+        stats_df = domain_counts.reset_index()
+        stats_df.columns = ['Entitätstyp (Domain)', 'Anzahl']
+        return stats_df
+
+    # --- Energie-Daten ---
+    def sensor_ids(self):
+        """Alle Entity-IDs einer Energie-CSV."""
+        return self.energy.entity_ids
+
+    @staticmethod
+    def aggregate(data, period):
+        """Summiert eine Zeitreihe bzw. breite Tabelle je Periode; 'original' bleibt unverändert."""
+        if period == 'original':
+            return data
+        return data.resample(resample_rule(period)).sum()
+
+    def _pyramid_for(self, period):
+        pyramid = self.energy.pyramid
+        if period != 'original' and pyramid is not None and period in pyramid.levels:
+            return pyramid
+        return None
+
+    def energy_series(self, entity_id, period='original'):
+        """Zeitreihe eines Sensors, je Periode aus den vorberechneten Summen."""
+        pyramid = self._pyramid_for(period)
+        if pyramid is not None:
+            return pyramid.series(self.energy, entity_id, period)
+        return self.aggregate(self.energy.series(entity_id), period)
+
+    def energy_frame(self, entity_ids, period='original'):
+        """Breite Tabelle (Zeitstempel x Sensor) für die Auswahl, je Periode aus den vorberechneten Summen."""
+        pyramid = self._pyramid_for(period)
+        if pyramid is not None:
+            return pyramid.frame(self.energy, entity_ids, period)
+        return self.aggregate(self.energy.frame(entity_ids), period)
+
+    def energy_time_range(self):
+        """Erster und letzter Zeitstempel der Energiedaten als Wandzeit (oder (None, None))."""
+        wall = self.energy.wall_times
+        if not len(wall):
+            return None, None
+        return wall[0], wall[-1]
+
+    def energy_totals(self, entity_ids, start=None, end=None):
+        """Summen je Sensor im Zeitraum [start, end) über die kumulierten Summen (O(1) je Sensor)."""
+        return pd.Series(self.energy.range_totals(entity_ids, start, end), index=list(entity_ids), dtype=float)
+
+    def energy_costs(self, entity_ids, tariff, start=None, end=None):
+        """Verbrauch und Kosten je Sensor und Tarifzeile; 'tariff' ist eine Liste (von, bis, preis).
+
+        Gibt einen DataFrame mit den Spalten entity_id, zone, consumption, price und cost zurück.
+        """
+        consumption, costs = self.energy.tariff_costs(entity_ids, tariff, start, end)
+        rows = []
+        for i, entity_id in enumerate(entity_ids):
+            for zone, (begin, finish, price) in enumerate(tariff):
+                rows.append((entity_id, f"{begin}-{finish}", consumption[i, zone], float(price), costs[i, zone]))
+        return pd.DataFrame(rows, columns=['entity_id', 'zone', 'consumption', 'price', 'cost'])
+
+    @staticmethod
+    def clip_range(data, start=None, end=None):
+        """Beschränkt eine Zeitreihe bzw. Tabelle auf den Zeitraum [start, end) (Wandzeit)."""
+        if start is None and end is None:
+            return data
+        wall = wall_clock(data.index)
+        mask = np.ones(len(wall), dtype=bool)
+        if start is not None:
+            mask &= wall >= start
+        if end is not None:
+            mask &= wall < end
+        return data[mask]
+
+    def energy_window(self, entity_id, start, end, max_points):
+        """Zeitfenster eines Sensors in der feinsten Auflösung mit höchstens 'max_points' Punkten.
+
+        Die Stufen (Original, Tag, Woche, Monat, Jahr) werden von fein nach grob geprüft; die Anzahl
+        der Punkte im Fenster ergibt sich per Binärsuche auf den sortierten Zeitstempeln. Passt keine
+        Stufe, wird die gröbste verwendet. Gibt (Periode, Series) zurück.
+        """
+        pyramid = self.energy.pyramid
+        periods = [period for period in PERIODS.values() if period == 'original' or self._pyramid_for(period) is not None]
+        for period in periods:
+            if period == 'original':
+                count = self.energy.count_between(start, end)
+            else:
+                count = pyramid.count_between(period, start, end)
+            if count <= max_points or period == periods[-1]:
+                break
+        if period == 'original':
+            return period, self.energy.window(entity_id, start, end)
+        return period, pyramid.window(self.energy, entity_id, period, start, end)
+
+    def bucket_count(self, period):
+        """Anzahl der Zeitpunkte bzw. Perioden-Buckets, z.B. für die Prüfung auf zu viele Balken."""
+        pyramid = self._pyramid_for(period)
+        if pyramid is not None:
+            return pyramid.bucket_count(period)
+        if period == 'original':
+            return len(self.energy.timestamps)
+        return len(self.aggregate(pd.Series(0, index=self.energy.timestamps), period))
+
+
+# --- Kommandozeile ---
+
+def _parse_where(items):
+    filters = {}
+    for item in items or []:
+        column, sep, value = item.partition('=')
+        if not sep:
+            raise SystemExit(f"Ungültiger Filter '{item}', erwartet SPALTE=WERT.")
+        # Mehrere Werte derselben Spalte werden ODER-verknüpft
+        filters.setdefault(column.strip().lower(), []).append(value)
+    return filters
+
+
+def _parse_tariff(items):
+    tariff = []
+    for item in items or []:
+        window, sep, price = item.partition('=')
+        begin, dash, finish = window.partition('-')
+        if not sep or not dash:
+            raise SystemExit(f"Ungültige Tarifzone '{item}', erwartet VON-BIS=PREIS (z.B. 06:00-22:00=0.32).")
+        tariff.append((begin.strip(), finish.strip(), float(price)))
+    return tariff
+
+
+def _write(engine, df, output):
+    if output:
+        engine.export(output, df)
+    else:
+        engine.export(sys.stdout, df)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='entity_analyzer_engine',
+                                     description='HA Entity Analyzer ohne GUI: exportierte CSV-Dateien analysieren.')
+    parser.add_argument('--no-cache', action='store_true', help='Binären Parse-Cache nicht verwenden')
+    parser.add_argument('--cache-dir', help='Verzeichnis des Parse-Caches')
+    # Nur für eine Recorder-Datenbank (home-assistant_v2.db) statt einer CSV
+    parser.add_argument('--recorder-source', choices=['statistics', 'short_term', 'states'], default='statistics',
+                        help='Recorder: Langzeit- oder Kurzzeit-Statistiken als Energiedaten, oder Entitäten (states)')
+    parser.add_argument('--since', help='Recorder: Beginn des Zeitraums (inklusive), z.B. 2024-01-01')
+    parser.add_argument('--until', help='Recorder: Ende des Zeitraums (exklusive), z.B. 2024-07-01')
+    parser.add_argument('--means', action='store_true', help='Recorder: auch Mittelwert-Sensoren (z.B. Temperaturen) laden')
+    parser.add_argument('--tz', help='Recorder: Zeitzone für Zeitstempel sowie --since/--until, z.B. Europe/Berlin '
+                                     '(Standard: Rechner bzw. Konfiguration von Home Assistant)')
+    # Statt einer Datei kann die URL einer Home-Assistant-Instanz angegeben werden (z.B. http://homeassistant.local:8123)
+    parser.add_argument('--token', help='Home Assistant: Long-Lived Access Token (Standard: Umgebungsvariable HA_TOKEN)')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('load', help='CSV laden und Übersicht ausgeben')
+    p.add_argument('file')
+
+    p = sub.add_parser('search', help='Freie Suche über alle Spalten')
+    p.add_argument('file')
+    p.add_argument('term')
+    p.add_argument('-o', '--output', help='Ausgabedatei (Standard: stdout)')
+
+    p = sub.add_parser('filter', help='Nach einem Spaltenwert filtern')
+    p.add_argument('file')
+    p.add_argument('column')
+    p.add_argument('value')
+    p.add_argument('-o', '--output', help='Ausgabedatei (Standard: stdout)')
+
+    p = sub.add_parser('stats', help='Entitäten pro Domain zählen oder Kreuztabelle ausgeben')
+    p.add_argument('file')
+    p.add_argument('--table', choices=list(CROSS_TABS), help='Kreuztabelle statt Domain-Zählung')
+    p.add_argument('--search', help='Nur Zeilen mit diesem Suchbegriff zählen')
+    p.add_argument('--where', action='append', metavar='SPALTE=WERT', help='Gleichheitsfilter (mehrfach möglich; gleiche Spalte = ODER)')
+    p.add_argument('-o', '--output', help='Ausgabedatei (Standard: stdout)')
+
+    p = sub.add_parser('diff', help='Zwei Entitäten-Exporte über die Entity-ID vergleichen')
+    p.add_argument('file', help='Aktueller Export')
+    p.add_argument('reference', help='Älterer Export')
+    p.add_argument('--all', action='store_true', help='Auch unveränderte Entitäten ausgeben')
+    p.add_argument('-o', '--output', help='Ausgabedatei (Standard: stdout)')
+
+    p = sub.add_parser('resample', help='Energie-CSV je Periode aufsummieren')
+    p.add_argument('file')
+    p.add_argument('--period', default='D', choices=list(PERIODS.values()))
+    p.add_argument('--sensor', action='append', help='Entity-ID (mehrfach möglich, Standard: alle)')
+    p.add_argument('-o', '--output', help='Ausgabedatei (Standard: stdout)')
+
+    p = sub.add_parser('totals', help='Energie-Summen (und Kosten) je Sensor für einen Zeitraum')
+    p.add_argument('file')
+    p.add_argument('--start', help='Beginn (inklusive), z.B. 2024-01-01')
+    p.add_argument('--end', help='Ende (exklusive), z.B. 2024-02-01')
+    p.add_argument('--sensor', action='append', help='Entity-ID (mehrfach möglich, Standard: alle)')
+    p.add_argument('--tariff', action='append', metavar='VON-BIS=PREIS',
+                   help='Tarifzone, z.B. 06:00-22:00=0.32 (mehrfach möglich); ergänzt Kosten je Zone')
+    p.add_argument('-o', '--output', help='Ausgabedatei (Standard: stdout)')
+
+    p = sub.add_parser('export', help='Suche und Filter kombiniert exportieren')
+    p.add_argument('file')
+    p.add_argument('output')
+    p.add_argument('--search', help='Suchbegriff')
+    p.add_argument('--where', action='append', metavar='SPALTE=WERT', help='Gleichheitsfilter (mehrfach möglich; gleiche Spalte = ODER)')
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    engine = AnalysisEngine(cache=None if args.no_cache else ParseCache(args.cache_dir))
+    engine.recorder_options = {'source': args.recorder_source, 'start': args.since, 'end': args.until, 'means': args.means,
+                               'tz': args.tz}
+    if is_home_assistant_url(args.file):
+        engine.recorder_options['token'] = args.token
+    csv_type = engine.load(args.file)
+
+    if args.command == 'load':
+        print(f"Datei:   {os.path.basename(args.file)}")
+        print(f"Typ:     {csv_type}")
+        print(f"Zeilen:  {len(engine.df_original)}")
+        if csv_type == 'energy':
+            print(f"Sensoren:     {len(engine.sensor_ids())}")
+            print(f"Zeitstempel:  {len(engine.energy.timestamps)}")
+        else:
+            print(f"Spalten: {', '.join(engine.df_original.columns)}")
+
+    elif args.command == 'search':
+        _write(engine, engine.search(args.term), args.output)
+
+    elif args.command == 'filter':
+        _write(engine, engine.filter(args.column.lower(), args.value), args.output)
+
+    elif args.command == 'stats':
+        if args.table:
+            engine.search(args.search or '')
+            for column, values in _parse_where(args.where).items():
+                engine.set_facet(column, values)
+            stats_df = engine.cross_tab(args.table).reset_index(names=CROSS_TABS[args.table][0])
+        else:
+            stats_df = engine.domain_stats()
+        if args.output:
+            stats_df.to_csv(args.output, sep=';', index=False, encoding='utf-8')
+        else:
+            stats_df.to_csv(sys.stdout, sep=';', index=False)
+
+    elif args.command == 'diff':
+        engine.apply(engine.read_comparison(args.reference))
+        if not args.all:
+            changes = [value for value in engine.unique_values(COL_CHANGE) if value != CHANGE_UNCHANGED]
+            engine.set_facet(COL_CHANGE, changes)
+        _write(engine, engine.view, args.output)
+
+    elif args.command == 'resample':
+        if csv_type != 'energy':
+            raise SystemExit("'resample' ist nur für Energie-CSVs verfügbar.")
+        sensors = args.sensor or list(engine.sensor_ids())
+        resampled = engine.energy_frame(sensors, args.period)
+        resampled.to_csv(args.output or sys.stdout, sep=',', encoding='utf-8')
+
+    elif args.command == 'totals':
+        if csv_type != 'energy':
+            raise SystemExit("'totals' ist nur für Energie-CSVs verfügbar.")
+        sensors = args.sensor or list(engine.sensor_ids())
+        start = pd.Timestamp(args.start) if args.start else None
+        end = pd.Timestamp(args.end) if args.end else None
+        if args.tariff:
+            result = engine.energy_costs(sensors, _parse_tariff(args.tariff), start, end)
+        else:
+            result = engine.energy_totals(sensors, start, end).rename('total').rename_axis('entity_id').reset_index()
+        result.to_csv(args.output or sys.stdout, sep=';', index=False, encoding='utf-8')
+
+    elif args.command == 'export':
+        df = engine.query(search=args.search, filters=_parse_where(args.where))
+        engine.export(args.output, df)
+        print(f"{len(df)} Zeilen nach '{args.output}' exportiert.")
+
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except BrokenPipeError:
+        # Ausgabe wurde z.B. an 'head' weitergeleitet und vorzeitig geschlossen
+        sys.stdout = open(os.devnull, 'w')
+        sys.exit(0)
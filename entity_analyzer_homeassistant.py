@@ -0,0 +1,482 @@
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import os
+import ssl
+import struct
+from urllib.parse import urlsplit, urlunsplit
+
+import numpy as np
+import pandas as pd
+
+from entity_analyzer_energy import EnergyStore
+from entity_analyzer_recorder import local_timezone, to_epoch
+
+##################################
+# HA_Entity_Analyzer_HomeAssistant #
+##################################
+
+# Holt die Daten direkt von einer laufenden Home-Assistant-Instanz, ohne Button-Card- oder
+# Energie-Export. Alles läuft über eine einzige, dauerhafte WebSocket-Verbindung (/api/websocket,
+# Anmeldung mit einem Long-Lived Access Token):
+#   - Entitäten: Entity-, Geräte- und Area-Registry plus get_states werden in einem Schreibvorgang
+#     gesendet und zu derselben Tabelle zusammengesetzt, die der Button-Card-Export der README erzeugt
+#   - Energie: recorder/statistics_during_period ('change' je Stunde bzw. 5 Minuten), aufgeteilt in
+#     Seiten aus Zeitfenster x Statistik-IDs, die mit asyncio parallel angefragt werden
+#     (höchstens MAX_IN_FLIGHT gleichzeitig) und direkt in einen EnergyStore geschrieben werden
+# Befehle tragen fortlaufende IDs, Antworten werden über die ID zugeordnet und dürfen in beliebiger
+# Reihenfolge kommen. Mit 'coalesce_messages' darf der Server mehrere Antworten als ein JSON-Array
+# senden. Der WebSocket (RFC 6455) ist hier minimal selbst umgesetzt, damit keine weitere
+# Abhängigkeit nötig ist; benchmarks/mock_home_assistant.py nutzt ihn auch für die Serverseite.
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+OP_CONTINUATION, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+# Spalten wie im Button-Card-Export der README (nach dem Einlesen kleingeschrieben)
+ENTITY_COLUMNS = ['entity id', 'entity name', 'device name', 'device id', 'area', 'platform', 'state', 'formatted state',
+                  'manufacturer', 'model', 'model id', 'sw version', 'hw version']
+
+# Intervall von statistics_during_period in Sekunden
+PERIODS = {'hour': 3600, '5minute': 300}
+
+# Seitengröße der Statistik-Abfragen und Anzahl gleichzeitig offener Anfragen
+PAGE_DAYS = {'hour': 31, '5minute': 2}
+IDS_PER_PAGE = 25
+MAX_IN_FLIGHT = 8
+REQUEST_TIMEOUT = 120
+
+# Ohne Beginn: so weit zurück wird gelesen (Kurzzeit-Statistiken hält Home Assistant ohnehin nur ~10 Tage)
+DEFAULT_DAYS = {'hour': 365, '5minute': 10}
+
+
+class HomeAssistantError(Exception):
+    """Fehlermeldung von Home Assistant (Anmeldung oder Befehl)."""
+
+
+def is_home_assistant_url(value):
+    return isinstance(value, str) and value.lower().startswith(('http://', 'https://', 'ws://', 'wss://'))
+
+
+def websocket_url(url):
+    """http(s)://host:8123 -> ws(s)://host:8123/api/websocket."""
+    parts = urlsplit(url.rstrip('/'))
+    scheme = {'http': 'ws', 'https': 'wss'}.get(parts.scheme, parts.scheme)
+    path = parts.path if parts.path.endswith('/api/websocket') else parts.path + '/api/websocket'
+    return urlunsplit((scheme, parts.netloc, path, '', ''))
+
+
+# --- WebSocket (RFC 6455) ---
+def apply_mask(data, mask):
+    """XOR mit dem 4-Byte-Schlüssel; als eine große Ganzzahl-Operation statt Byte für Byte."""
+    if not data:
+        return data
+    key = (mask * (len(data) // 4 + 1))[:len(data)]
+    return (int.from_bytes(data, 'big') ^ int.from_bytes(key, 'big')).to_bytes(len(data), 'big')
+
+
+def encode_frame(opcode, payload, mask):
+    """Ein einzelner, nicht fragmentierter Frame; Clients müssen maskieren, Server dürfen nicht."""
+    header = bytearray([0x80 | opcode])
+    mask_bit = 0x80 if mask else 0
+    if len(payload) < 126:
+        header.append(mask_bit | len(payload))
+    elif len(payload) < 1 << 16:
+        header.append(mask_bit | 126)
+        header += struct.pack('!H', len(payload))
+    else:
+        header.append(mask_bit | 127)
+        header += struct.pack('!Q', len(payload))
+    if mask:
+        key = os.urandom(4)
+        return bytes(header) + key + apply_mask(payload, key)
+    return bytes(header) + payload
+
+
+def accept_key(key):
+    return base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+
+
+async def read_http_head(reader):
+    """Statuszeile und Header (kleingeschrieben) einer HTTP-Nachricht bis zur Leerzeile."""
+    first = (await reader.readline()).decode('latin-1').strip()
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1').strip()
+        if not line:
+            return first, headers
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+
+class WebSocket:
+    """Textnachrichten über einen asyncio-Stream; Ping, Fragmentierung und Close werden intern behandelt."""
+
+    def __init__(self, reader, writer, client=True):
+        self.reader = reader
+        self.writer = writer
+        self.client = client
+
+    @classmethod
+    async def connect(cls, url, ssl_context=None):
+        parts = urlsplit(url)
+        secure = parts.scheme == 'wss'
+        port = parts.port or (443 if secure else 80)
+        if secure and ssl_context is None:
+            ssl_context = ssl.create_default_context()
+        reader, writer = await asyncio.open_connection(parts.hostname, port, ssl=ssl_context if secure else None)
+        key = base64.b64encode(os.urandom(16)).decode()
+        writer.write((f"GET {parts.path or '/'} HTTP/1.1\r\nHost: {parts.netloc}\r\nUpgrade: websocket\r\n"
+                      f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+        await writer.drain()
+        status, headers = await read_http_head(reader)
+        if ' 101 ' not in f"{status} " or headers.get('sec-websocket-accept') != accept_key(key):
+            writer.close()
+            raise HomeAssistantError(f"Kein WebSocket unter {url}: {status or 'keine Antwort'}")
+        return cls(reader, writer, client=True)
+
+    @classmethod
+    async def accept(cls, reader, writer):
+        """Serverseite des Handshakes (für den Mock-Server); None, wenn die Anfrage kein WebSocket ist."""
+        request, headers = await read_http_head(reader)
+        key = headers.get('sec-websocket-key')
+        if key is None or headers.get('upgrade', '').lower() != 'websocket':
+            writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+            await writer.drain()
+            writer.close()
+            return None
+        writer.write((f"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept_key(key)}\r\n\r\n").encode())
+        await writer.drain()
+        return cls(reader, writer, client=False)
+
+    async def _read_frame(self):
+        first, second = await self.reader.readexactly(2)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack('!H', await self.reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', await self.reader.readexactly(8))[0]
+        mask = await self.reader.readexactly(4) if second & 0x80 else None
+        payload = await self.reader.readexactly(length)
+        return bool(first & 0x80), first & 0x0F, apply_mask(payload, mask) if mask else payload
+
+    def write(self, text):
+        """Puffert eine Textnachricht; erst drain() schickt alle gepufferten Nachrichten ab."""
+        self.writer.write(encode_frame(OP_TEXT, text.encode('utf-8'), self.client))
+
+    async def drain(self):
+        await self.writer.drain()
+
+    async def send(self, text):
+        self.write(text)
+        await self.drain()
+
+    async def receive(self):
+        """Nächste Text- oder Binärnachricht als str; None, wenn die Gegenseite schließt."""
+        parts = []
+        while True:
+            try:
+                fin, opcode, payload = await self._read_frame()
+            except (asyncio.IncompleteReadError, ConnectionError):
+                return None
+            if opcode == OP_PING:
+                self.writer.write(encode_frame(OP_PONG, payload, self.client))
+                continue
+            if opcode == OP_PONG:
+                continue
+            if opcode == OP_CLOSE:
+                return None
+            parts.append(payload)
+            if fin:
+                return b''.join(parts).decode('utf-8')
+
+    async def close(self):
+        try:
+            self.writer.write(encode_frame(OP_CLOSE, b'', self.client))
+            await self.writer.drain()
+        except ConnectionError:
+            pass
+        self.writer.close()
+
+
+# --- Home-Assistant-Protokoll ---
+class HomeAssistantClient:
+    """Angemeldete WebSocket-Verbindung; call()/call_many() dürfen parallel aus mehreren Tasks laufen."""
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.next_id = 1
+        self.pending = {}
+        self.reader_task = asyncio.get_running_loop().create_task(self._read_loop())
+
+    @classmethod
+    async def connect(cls, url, token, ssl_context=None):
+        websocket = await WebSocket.connect(websocket_url(url), ssl_context)
+        try:
+            greeting = json.loads(await websocket.receive() or '{}')
+            if greeting.get('type') != 'auth_required':
+                raise HomeAssistantError("Unerwartete Begrüßung von Home Assistant.")
+            await websocket.send(json.dumps({'type': 'auth', 'access_token': token}))
+            answer = json.loads(await websocket.receive() or '{}')
+            if answer.get('type') != 'auth_ok':
+                raise HomeAssistantError(f"Anmeldung fehlgeschlagen: {answer.get('message', 'ungültiger Token')}")
+        except BaseException:
+            await websocket.close()
+            raise
+        client = cls(websocket)
+        client.ha_version = answer.get('ha_version')
+        try:
+            # Erlaubt dem Server, mehrere Antworten in einer Nachricht zu senden
+            await client.call('supported_features', features={'coalesce_messages': 1})
+        except HomeAssistantError:
+            pass  # ältere Versionen kennen den Befehl nicht
+        return client
+
+    async def _read_loop(self):
+        try:
+            while True:
+                text = await self.websocket.receive()
+                if text is None:
+                    break
+                messages = json.loads(text)
+                for message in messages if isinstance(messages, list) else [messages]:
+                    future = self.pending.pop(message.get('id'), None)
+                    if future is None or future.done():
+                        continue
+                    if message.get('success', True):
+                        future.set_result(message.get('result'))
+                    else:
+                        error = message.get('error') or {}
+                        future.set_exception(HomeAssistantError(f"{error.get('code', '?')}: {error.get('message', '')}"))
+        finally:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(HomeAssistantError("Verbindung zu Home Assistant getrennt."))
+            self.pending.clear()
+
+    def _queue(self, command_type, payload):
+        message_id, self.next_id = self.next_id, self.next_id + 1
+        future = asyncio.get_running_loop().create_future()
+        self.pending[message_id] = future
+        self.websocket.write(json.dumps({'id': message_id, 'type': command_type, **payload}))
+        return future
+
+    async def call(self, command_type, **payload):
+        future = self._queue(command_type, payload)
+        await self.websocket.drain()
+        return await asyncio.wait_for(future, REQUEST_TIMEOUT)
+
+    async def call_many(self, commands):
+        """Sendet alle (Typ, Daten)-Befehle in einem Schreibvorgang und gibt die Ergebnisse in derselben Reihenfolge zurück."""
+        futures = [self._queue(command_type, payload) for command_type, payload in commands]
+        await self.websocket.drain()
+        return await asyncio.wait_for(asyncio.gather(*futures), REQUEST_TIMEOUT)
+
+    async def close(self):
+        await self.websocket.close()
+        self.reader_task.cancel()
+        try:
+            await self.reader_task
+        except (asyncio.CancelledError, HomeAssistantError):
+            pass
+
+
+# --- Entitäten ---
+def clean(value):
+    """Wie clean() im Button-Card-Export: leere Werte zu '', Semikolons zu Kommas, keine Zeilenumbrüche."""
+    if value is None or value == '' or value is False:
+        return ''
+    return str(value).replace(';', ',').replace('\r\n', ' ').replace('\r', ' ').replace('\n', ' ').strip()
+
+
+def formatted_state(state):
+    """Näherung von formatEntityState: State mit Einheit (ohne Übersetzungen des Frontends)."""
+    unit = state.get('attributes', {}).get('unit_of_measurement')
+    return f"{state.get('state', '')} {unit}" if unit else state.get('state', '')
+
+
+def entity_frame(states, entities, devices, areas):
+    """Setzt States und Registries wie der Button-Card-Export zu einer String-Tabelle (ENTITY_COLUMNS) zusammen."""
+    area_names = {area['area_id']: area.get('name') or '' for area in areas}
+    entity_entries = {entry['entity_id']: entry for entry in entities}
+    device_entries = {device['id']: device for device in devices}
+    rows = []
+    for state in sorted(states, key=lambda s: s['entity_id']):
+        entity_id = state['entity_id']
+        entry = entity_entries.get(entity_id) or {}
+        device = device_entries.get(entry.get('device_id')) or {}
+        area_id = entry.get('area_id') or device.get('area_id')
+        attributes = state.get('attributes', {})
+        rows.append([
+            clean(entity_id),
+            clean(attributes.get('friendly_name') or entry.get('name') or entry.get('original_name')),
+            clean(device.get('name')),
+            clean(entry.get('device_id')),
+            clean(area_names.get(area_id, '') if area_id else ''),
+            clean(entry.get('platform') or entry.get('integration') or entity_id.split('.')[0]),
+            clean(state.get('state')),
+            clean(formatted_state(state)),
+            clean(device.get('manufacturer')),
+            clean(device.get('model')),
+            clean(device.get('model_id')),
+            clean(device.get('sw_version')),
+            clean(device.get('hw_version')),
+        ])
+    return pd.DataFrame(rows, columns=ENTITY_COLUMNS, dtype=object)
+
+
+async def _fetch_entities(url, token, progress=None):
+    client = await HomeAssistantClient.connect(url, token)
+    try:
+        if progress is not None:
+            progress(0, 1, 'recorder')
+        states, entities, devices, areas = await client.call_many([
+            ('get_states', {}),
+            ('config/entity_registry/list', {}),
+            ('config/device_registry/list', {}),
+            ('config/area_registry/list', {}),
+        ])
+    finally:
+        await client.close()
+    if progress is not None:
+        progress(1, 1, 'recorder')
+    return entity_frame(states, entities, devices, areas)
+
+
+def fetch_entities(url, token, progress=None):
+    """Entitäten-Tabelle einer laufenden Instanz, gleich aufgebaut wie die eingelesene hass_entities.csv."""
+    return asyncio.run(_fetch_entities(url, token, progress))
+
+
+# --- Statistiken ---
+def config_timezone(config):
+    """In Home Assistant eingestellte Zeitzone (IANA-Name, mit Sommerzeit) oder None, wenn unbekannt."""
+    try:
+        name = config['time_zone']
+        pd.Timestamp.now(tz=name)
+        return name
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def statistic_kind(meta):
+    if meta.get('has_sum'):
+        return 'sum'
+    if meta.get('mean_type') or meta.get('has_mean'):
+        return 'mean'
+    return ''
+
+
+def start_seconds(rows):
+    """'start' der Statistikzeilen in Sekunden: Millisekunden (ab HA 2023.3) oder ISO-Text (ältere Versionen)."""
+    if isinstance(rows[0]['start'], (int, float)):
+        return np.fromiter((row['start'] for row in rows), dtype=np.float64, count=len(rows)) / 1000.0
+    return pd.to_datetime([row['start'] for row in rows], utc=True).as_unit('ns').asi8 / 1e9
+
+
+def statistic_pages(statistic_ids, start_ts, end_ts, period):
+    """(IDs, Beginn, Ende) je Seite: Zeitfenster von PAGE_DAYS Tagen x Gruppen von IDS_PER_PAGE Statistiken."""
+    span = PAGE_DAYS[period] * 86400
+    windows = [(t, min(t + span, end_ts)) for t in np.arange(start_ts, end_ts, span).tolist()]
+    return [(statistic_ids[i:i + IDS_PER_PAGE], t0, t1)
+            for i in range(0, len(statistic_ids), IDS_PER_PAGE) for t0, t1 in windows]
+
+
+def iso_utc(seconds):
+    return pd.Timestamp(seconds, unit='s', tz='UTC').isoformat()
+
+
+async def _fetch_statistics(url, token, start=None, end=None, means=False, short_term=False, tz=None,
+                            progress=None, spill_dir=None):
+    period = '5minute' if short_term else 'hour'
+    step = PERIODS[period]
+    client = await HomeAssistantClient.connect(url, token)
+    values = spill_path = None
+    try:
+        config, listed = await client.call_many([
+            ('get_config', {}),
+            ('recorder/list_statistic_ids', {} if means else {'statistic_type': 'sum'}),
+        ])
+        if tz is None:
+            tz = config_timezone(config) or local_timezone()
+        meta = sorted((m for m in listed if statistic_kind(m) in (('sum', 'mean') if means else ('sum',))),
+                      key=lambda m: m['statistic_id'])
+
+        # Zeitraum ohne Zeitzone in derselben Zone wie das Raster, siehe to_epoch()
+        end_ts = pd.Timestamp.now(tz='UTC').ceil('h').timestamp() if end is None else to_epoch(end, tz)
+        start_ts = end_ts - DEFAULT_DAYS[period] * 86400 if start is None else to_epoch(start, tz)
+        t0 = math.floor(start_ts / step) * step
+        n_times = max(math.ceil((end_ts - t0) / step), 0)
+        values, spill_path = EnergyStore.allocate(len(meta), n_times, spill_dir)
+        row_of = {m['statistic_id']: row for row, m in enumerate(meta)}
+        kinds = {m['statistic_id']: statistic_kind(m) for m in meta}
+
+        pages = []
+        for kind, value_type in (('sum', 'change'), ('mean', 'mean')):
+            ids = [m['statistic_id'] for m in meta if kinds[m['statistic_id']] == kind]
+            pages += [(page_ids, p0, p1, value_type) for page_ids, p0, p1 in statistic_pages(ids, t0, end_ts, period)]
+        done = [0]
+        limit = asyncio.Semaphore(MAX_IN_FLIGHT)
+
+        async def fetch(page_ids, p0, p1, value_type):
+            async with limit:
+                result = await client.call('recorder/statistics_during_period', start_time=iso_utc(p0),
+                                           end_time=iso_utc(p1), statistic_ids=page_ids, period=period, types=[value_type])
+            for statistic_id, rows in (result or {}).items():
+                if statistic_id not in row_of or not rows:
+                    continue
+                starts = start_seconds(rows)
+                data = np.array([row.get(value_type) for row in rows], dtype=np.float64)  # None -> NaN
+                positions = np.rint((starts - t0) / step).astype(np.int64)
+                inside = (positions >= 0) & (positions < n_times)
+                values[row_of[statistic_id], positions[inside]] = data[inside]
+            done[0] += 1
+            if progress is not None:
+                progress(done[0], len(pages), 'recorder')
+
+        tasks = [asyncio.ensure_future(fetch(*page)) for page in pages]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # Abbruch oder Fehler einer Seite: die übrigen Seiten schreiben nicht mehr in die Matrix
+            for task in tasks:
+                task.cancel()
+            raise
+    except BaseException:
+        if values is not None:
+            EnergyStore._release(values, spill_path)
+        raise
+    finally:
+        await client.close()
+
+    # Statistiken ohne Werte im Zeitraum entfallen; Zeilen werden dafür an Ort und Stelle nachgerückt
+    keep = [row for row in range(len(meta)) if not np.isnan(values[row]).all()]
+    for new_row, old_row in enumerate(keep):
+        if new_row != old_row:
+            values[new_row] = values[old_row]
+    values = values[:len(keep)]
+    # Ohne angegebene Grenzen beginnt bzw. endet das Raster mit dem ersten bzw. letzten Wert
+    filled = np.flatnonzero(~np.isnan(values).all(axis=0)) if len(keep) else np.array([0, -1])
+    first = filled[0] if start is None else 0
+    last = filled[-1] + 1 if end is None else n_times
+    values = values[:, first:last]
+    timestamps = pd.DatetimeIndex(pd.to_datetime(t0 + step * np.arange(first, last, dtype=np.int64), unit='s', utc=True)
+                                  .tz_convert(tz), name='timestamp')
+    kept = [meta[row] for row in keep]
+    units = [m.get('statistics_unit_of_measurement') or m.get('display_unit_of_measurement') or '' for m in kept]
+    return EnergyStore([m['statistic_id'] for m in kept], [statistic_kind(m) for m in kept], units, timestamps,
+                       values, [ts.isoformat() for ts in timestamps], spill_path)
+
+
+def fetch_statistics(url, token, start=None, end=None, means=False, short_term=False, tz=None, progress=None,
+                     spill_dir=None):
+    """Statistiken im Zeitraum [start, end) als EnergyStore, wie read_energy_csv() ihn aus einer energy.csv baut.
+
+    Zähler liefern den Verbrauch je Intervall ('change'), Mittelwert-Sensoren auf Wunsch den Mittelwert.
+    Ohne 'start' werden DEFAULT_DAYS gelesen, ohne 'end' bis jetzt. Zeitstempel und ein Zeitraum ohne
+    Zeitzone gelten in 'tz', sonst in der Zeitzone aus der Konfiguration von Home Assistant, jeweils mit
+    Sommerzeit (Raster in UTC-Schritten, siehe RecorderDatabase.read_statistics()).
+    """
+    return asyncio.run(_fetch_statistics(url, token, start, end, means, short_term, tz, progress, spill_dir))
@@ -0,0 +1,239 @@
+import cProfile
+import functools
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque, namedtuple
+from contextlib import contextmanager
+
+##############################
+# HA_Entity_Analyzer_Perf    #
+##############################
+
+# Leichte Laufzeit-Messung für die Hauptoperationen (Laden, Suche, Sortierung,
+# Tabellenaufbau, Diagramme). Jede Operation wird als Span mit Dauer und
+# Speicher-Differenz in einem Ringpuffer der letzten Operationen abgelegt:
+#   - 'rss' ist die Änderung des Arbeitsspeichers des Prozesses (immer, sofern ermittelbar)
+#   - 'peak' ist die Spitze der Python-Allokationen während des Spans über dem Startwert;
+#     nur verfügbar, solange tracemalloc läuft (kostet spürbar Laufzeit, daher abschaltbar).
+#     tracemalloc kennt nur eine Spitze für den ganzen Prozess: Spans, die sich mit einem Span
+#     eines anderen Threads überschneiden, und begin()/end()-Spans erhalten daher keine Spitze
+# Zusätzlich kann ein cProfile-Profil des Hauptthreads aufgezeichnet und als .prof
+# (für pstats/snakeviz) oder ein tracemalloc-Schnappschuss als Text gespeichert werden.
+
+# Ein gemessener Vorgang; Speicherangaben in Bytes, None wenn nicht ermittelbar
+PerfRecord = namedtuple('PerfRecord', ['name', 'started', 'duration', 'rss_delta', 'peak_delta', 'thread', 'details'])
+
+
+def process_memory():
+    """Aktueller Arbeitsspeicher (RSS) des Prozesses in Bytes oder None.
+
+    Nur unter Linux und Windows ermittelbar; andere Systeme (macOS) liefern per getrusage nur die
+    Spitze seit Prozessstart, daraus ergibt sich keine sinnvolle Differenz.
+    """
+    try:
+        if sys.platform.startswith('linux'):
+            with open('/proc/self/statm', 'rb') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        if sys.platform == 'win32':
+            import ctypes
+            from ctypes import wintypes
+
+            class ProcessMemoryCounters(ctypes.Structure):
+                _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                            ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                            ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+            counters = ProcessMemoryCounters()
+            counters.cb = ctypes.sizeof(counters)
+            ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                     ctypes.byref(counters), counters.cb)
+            return counters.WorkingSetSize
+        return None
+    except (OSError, ValueError, ImportError, AttributeError):
+        return None
+
+
+class _Span:
+    __slots__ = ('name', 'details', 'started', 'start', 'rss', 'traced', 'peak', 'thread')
+
+    def __init__(self, name, details):
+        self.name = name
+        self.details = details
+        self.started = time.time()
+        self.rss = process_memory()
+        # Allokationen beim Start; None = für diesen Span wird keine Spitze gemeldet
+        self.traced = None
+        self.peak = 0
+        self.thread = threading.get_ident()
+        self.start = time.perf_counter()
+
+
+class PerfRecorder:
+    """Ringpuffer der letzten Operationen plus optionales cProfile/tracemalloc.
+
+    Spans dürfen verschachtelt sein und in mehreren Threads laufen; die tracemalloc-Spitze
+    eines inneren Spans wird an den äußeren desselben Threads weitergegeben, damit beide korrekt
+    bleiben. Überschneiden sich Spans verschiedener Threads, setzt reset_peak() die Spitze des
+    jeweils anderen zurück; diese Spans erhalten keine Spitze (nur Dauer und RSS).
+    """
+
+    def __init__(self, max_records=200):
+        self.records = deque(maxlen=max_records)
+        self.profiler = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # Offene span()-Spans aller Threads, um Überschneidungen zu erkennen
+        self._open = []
+
+    # --- Spans ---
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def begin(self, name, **details):
+        """Startet einen Span, der mit end() beendet wird (auch über Tk-Callbacks hinweg).
+
+        Solche Spans laufen neben anderen Spans und Threads her und erhalten daher keine Speicher-Spitze.
+        """
+        return _Span(name, details)
+
+    def end(self, span, **details):
+        """Beendet einen mit begin() gestarteten Span und legt ihn im Ringpuffer ab."""
+        duration = time.perf_counter() - span.start
+        rss = process_memory()
+        peak_delta = None
+        if span.traced is not None and tracemalloc.is_tracing():
+            peak_delta = max(span.peak, tracemalloc.get_traced_memory()[1]) - span.traced
+        span.details.update(details)
+        record = PerfRecord(span.name, span.started, duration,
+                            rss - span.rss if rss is not None and span.rss is not None else None,
+                            peak_delta, threading.current_thread().name, span.details)
+        with self._lock:
+            self.records.append(record)
+        return record
+
+    @contextmanager
+    def span(self, name, **details):
+        """Misst den Block als Span 'name'; 'details' erscheinen in der Performance-Ansicht."""
+        stack = self._stack()
+        current = _Span(name, details)
+        with self._lock:
+            if tracemalloc.is_tracing():
+                others = [span for span in self._open if span.thread != current.thread]
+                if others:
+                    # reset_peak() wirkt prozessweit: überschneidende Spans haben keine gültige Spitze
+                    for span in others:
+                        span.traced = None
+                else:
+                    # Die bisherige Spitze gehört dem äußeren Span, danach misst der innere ab dem aktuellen Stand
+                    if stack:
+                        stack[-1].peak = max(stack[-1].peak, tracemalloc.get_traced_memory()[1])
+                    tracemalloc.reset_peak()
+                    current.traced = tracemalloc.get_traced_memory()[0]
+            self._open.append(current)
+        stack.append(current)
+        current.start = time.perf_counter()
+        try:
+            yield current.details
+        finally:
+            stack.pop()
+            with self._lock:
+                self._open.remove(current)
+            record = self.end(current)
+            if stack and current.traced is not None and record.peak_delta is not None:
+                stack[-1].peak = max(stack[-1].peak, current.traced + record.peak_delta)
+
+    def timed(self, name=None):
+        """Dekorator: misst jeden Aufruf der Funktion als Span."""
+        def decorator(func):
+            label = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(label):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def recent(self, n=None):
+        """Die letzten 'n' Operationen, neueste zuerst."""
+        with self._lock:
+            records = list(self.records)
+        records.reverse()
+        return records if n is None else records[:n]
+
+    def clear(self):
+        with self._lock:
+            self.records.clear()
+
+    # --- tracemalloc ---
+    @staticmethod
+    def tracing_memory():
+        return tracemalloc.is_tracing()
+
+    @staticmethod
+    def start_memory_tracing(frames=10):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    @staticmethod
+    def stop_memory_tracing():
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @staticmethod
+    def dump_memory_snapshot(path, limit=50):
+        """Schreibt die größten Allokationen (nach Zeile gruppiert) als Text."""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc ist nicht aktiv.")
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"Aktuell: {current / 1e6:.1f} MB, Spitze: {peak / 1e6:.1f} MB\n\n")
+            for stat in snapshot.statistics('lineno')[:limit]:
+                f.write(f"{stat}\n")
+        return path
+
+    # --- cProfile ---
+    def profiling(self):
+        return self.profiler is not None
+
+    def start_profile(self):
+        """Startet cProfile (erfasst nur den aufrufenden Thread, in der GUI den Tk-Hauptthread)."""
+        if self.profiler is None:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def stop_profile(self):
+        """Beendet cProfile und gibt das Profil zurück (oder None)."""
+        profiler, self.profiler = self.profiler, None
+        if profiler is not None:
+            profiler.disable()
+        return profiler
+
+    @staticmethod
+    def dump_profile(profiler, path, limit=40):
+        """Speichert das Profil als .prof; bei Endung .txt als Tabelle nach kumulierter Zeit."""
+        if path.lower().endswith('.txt'):
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(limit)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text.getvalue())
+        else:
+            profiler.dump_stats(path)
+        return path
+
+
+# Gemeinsamer Recorder für Engine, Diagramme und Oberfläche
+PERF = PerfRecorder()
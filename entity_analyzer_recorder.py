@@ -0,0 +1,271 @@
+import json
+import math
+import os
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from dateutil import tz as dateutil_tz
+
+from entity_analyzer_energy import EnergyStore
+
+##############################
+# HA_Entity_Analyzer_Recorder #
+##############################
+
+# Liest eine Kopie der Recorder-Datenbank von Home Assistant (home-assistant_v2.db)
+# direkt, ohne CSV-Export. Die Datei wird nur lesend geöffnet (mode=ro, query_only).
+#   - Energie: Langzeit-Statistiken (statistics/statistics_meta, stündlich) oder die
+#     Kurzzeit-Statistiken (statistics_short_term, 5 Minuten). Zähler mit 'sum' werden
+#     wie im Energie-Export als Verbrauch je Intervall geliefert (Differenz der Summen),
+#     Sensoren mit 'mean' auf Wunsch als Mittelwert. Das Ergebnis ist ein EnergyStore.
+#   - Entitäten: letzter State je Entität aus states_meta/states samt Anzeigename und
+#     Einheit aus state_attributes. Areas, Geräte und Hersteller stehen nicht in der
+#     Datenbank, dafür bleibt der Button-Card-Export der README nötig.
+# Alle Abfragen laufen über die Indizes des Recorders ((metadata_id, start_ts) bzw.
+# (metadata_id, last_updated_ts)), sind auf den gewählten Zeitraum begrenzt und werden
+# blockweise mit fetchmany() gelesen; es liegt nie das Ergebnis einer ganzen Tabelle im Speicher.
+# Unterstützt wird das Schema ab Home Assistant 2023.4 (states_meta, *_ts-Spalten).
+# Zeitangaben ohne Zeitzone (Zeitraum) gelten in derselben Zeitzone wie die gelieferten
+# Zeitstempel: 'tz', sonst die des Rechners, jeweils mit Sommerzeit.
+
+SQLITE_HEADER = b'SQLite format 3\x00'
+
+# Intervall der Statistik-Tabellen in Sekunden
+STATISTICS_TABLES = {'statistics': 3600, 'statistics_short_term': 300}
+
+# Spalten der Entitäten-Tabelle, benannt wie die (kleingeschriebenen) Spalten des Button-Card-Exports
+ENTITY_COLUMNS = ['entity id', 'entity name', 'state', 'unit', 'device class', 'last updated']
+
+# Zeilen je fetchmany()
+FETCH_ROWS = 20000
+
+
+def is_recorder_database(filepath):
+    """True, wenn die Datei eine SQLite-Datenbank ist (z.B. home-assistant_v2.db)."""
+    try:
+        with open(filepath, 'rb') as f:
+            return f.read(len(SQLITE_HEADER)) == SQLITE_HEADER
+    except OSError:
+        return False
+
+
+def local_timezone():
+    """Zeitzone des Rechners mit Sommerzeit.
+
+    Bevorzugt der IANA-Name (Umgebungsvariable TZ bzw. /etc/localtime), weil pandas damit schnell
+    umrechnet; sonst (z.B. unter Windows) dateutils tzlocal(), das die Regeln des Systems nutzt.
+    """
+    name = os.environ.get('TZ', '').lstrip(':')
+    if not name:
+        target = os.path.realpath('/etc/localtime')
+        if '/zoneinfo/' in target:
+            name = target.split('/zoneinfo/', 1)[1]
+    if name:
+        try:
+            pd.Timestamp.now(tz=name)
+            return name
+        except (KeyError, ValueError):
+            pass
+    return dateutil_tz.tzlocal()
+
+
+def to_epoch(value, tz=None):
+    """Zeitpunkt (Text, datetime oder Timestamp) als Unix-Sekunden.
+
+    Ohne Zeitzone gilt der Wert als Wandzeit in 'tz' (Standard: Rechner), mit der dort zu diesem
+    Datum gültigen Verschiebung. Die im Herbst doppelt vorkommende Stunde zählt als Sommerzeit,
+    eine im Frühjahr übersprungene Wandzeit wird auf den nächsten gültigen Zeitpunkt geschoben.
+    """
+    if value is None:
+        return None
+    ts = pd.Timestamp(value)
+    if ts.tz is None:
+        ts = ts.tz_localize(local_timezone() if tz is None else tz, ambiguous=True, nonexistent='shift_forward')
+    return ts.timestamp()
+
+
+class RecorderDatabase:
+    """Nur-Lese-Zugriff auf eine Kopie der Recorder-Datenbank."""
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        uri = Path(filepath).resolve().as_uri() + '?mode=ro'
+        self.connection = sqlite3.connect(uri, uri=True)
+        self.connection.execute('PRAGMA query_only = ON')
+        self.tables = {row[0] for row in self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if 'states_meta' not in self.tables or 'statistics_meta' not in self.tables:
+            self.close()
+            raise ValueError("Keine Recorder-Datenbank ab Home Assistant 2023.4 (states_meta/statistics_meta fehlen).")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def columns_of(self, table):
+        return {row[1] for row in self.connection.execute(f'PRAGMA table_info({table})')}
+
+    def schema_version(self):
+        if 'schema_changes' not in self.tables:
+            return None
+        row = self.connection.execute('SELECT schema_version FROM schema_changes ORDER BY change_id DESC LIMIT 1').fetchone()
+        return row[0] if row else None
+
+    # --- Statistiken ---
+    def statistics_meta(self, statistic_ids=None, means=False):
+        """DataFrame (id, statistic_id, unit, kind) der Statistiken; kind ist 'sum' oder 'mean'."""
+        columns = self.columns_of('statistics_meta')
+        # Neuere Schemata ersetzen has_mean durch mean_type (0 = kein Mittelwert)
+        mean_expr = 'mean_type > 0' if 'mean_type' in columns else 'has_mean'
+        rows = self.connection.execute(
+            f'SELECT id, statistic_id, unit_of_measurement, has_sum, {mean_expr} FROM statistics_meta ORDER BY statistic_id'
+        ).fetchall()
+        meta = pd.DataFrame(rows, columns=['id', 'statistic_id', 'unit', 'has_sum', 'has_mean'])
+        meta['kind'] = np.where(meta['has_sum'].fillna(0).astype(bool), 'sum',
+                                np.where(meta['has_mean'].fillna(0).astype(bool), 'mean', ''))
+        keep = meta['kind'] == 'sum'
+        if means:
+            keep |= meta['kind'] == 'mean'
+        if statistic_ids is not None:
+            keep &= meta['statistic_id'].isin(list(statistic_ids))
+        meta = meta[keep].reset_index(drop=True)
+        meta['unit'] = meta['unit'].fillna('')
+        return meta[['id', 'statistic_id', 'unit', 'kind']]
+
+    def statistics_range(self, table='statistics'):
+        """(erster, letzter) start_ts der Tabelle oder (None, None); nutzt den Index auf start_ts."""
+        return self.connection.execute(f'SELECT MIN(start_ts), MAX(start_ts) FROM {table}').fetchone()
+
+    def _previous_sum(self, table, metadata_id, start_ts):
+        # Letzte Summe vor dem Zeitraum, damit auch das erste Intervall einen Verbrauch hat
+        row = self.connection.execute(
+            f'SELECT sum FROM {table} WHERE metadata_id = ? AND start_ts < ? ORDER BY start_ts DESC LIMIT 1',
+            (metadata_id, start_ts)).fetchone()
+        return row[0] if row and row[0] is not None else np.nan
+
+    def read_statistics(self, start=None, end=None, statistic_ids=None, means=False, short_term=False, tz=None,
+                        progress=None, spill_dir=None):
+        """Liest die Statistiken im Zeitraum [start, end) als EnergyStore (Sensor x Intervall, float32).
+
+        'progress(erledigt, gesamt, 'recorder')' wird je Statistik aufgerufen und darf abbrechen,
+        indem es eine Ausnahme wirft. Statistiken ohne Werte im Zeitraum entfallen.
+        Zeitstempel und Zeitraum ohne Zeitzone gelten in 'tz' (Standard: Rechner). Das Raster läuft in
+        festen UTC-Schritten; mit Sommerzeit fehlt daher im Frühjahr eine Wandzeit-Stunde und im Herbst
+        kommt eine doppelt vor, wie in den Energie-Exporten von Home Assistant.
+        """
+        table = 'statistics_short_term' if short_term else 'statistics'
+        step = STATISTICS_TABLES[table]
+        tz = local_timezone() if tz is None else tz
+        meta = self.statistics_meta(statistic_ids, means)
+
+        first, last = self.statistics_range(table)
+        start_ts, end_ts = to_epoch(start, tz), to_epoch(end, tz)
+        start_ts = first if start_ts is None else start_ts
+        end_ts = (last + step if last is not None else None) if end_ts is None else end_ts
+        if meta.empty or start_ts is None or end_ts is None or end_ts <= start_ts:
+            return EnergyStore([], [], [], pd.DatetimeIndex([], name='timestamp'), np.empty((0, 0), dtype=EnergyStore.DTYPE))
+
+        # Raster auf volle Intervalle; die Werte eines Intervalls stehen bei dessen Beginn
+        t0 = math.floor(start_ts / step) * step
+        n_times = math.ceil((end_ts - t0) / step)
+        values, spill_path = EnergyStore.allocate(len(meta), n_times, spill_dir)
+        entity_ids, types, units = [], [], []
+        row = 0
+        try:
+            for i, stat in enumerate(meta.itertuples(index=False)):
+                if progress is not None:
+                    progress(i, len(meta), 'recorder')
+                if self._fill_statistic(values[row], table, stat, t0, step, start_ts, end_ts):
+                    entity_ids.append(stat.statistic_id)
+                    types.append(stat.kind)
+                    units.append(stat.unit)
+                    row += 1
+        except BaseException:
+            EnergyStore._release(values, spill_path)
+            raise
+
+        timestamps = pd.DatetimeIndex(pd.to_datetime(t0 + step * np.arange(n_times, dtype=np.int64), unit='s', utc=True)
+                                      .tz_convert(tz), name='timestamp')
+        time_labels = [ts.isoformat() for ts in timestamps]
+        return EnergyStore(entity_ids, types, units, timestamps, values[:row], time_labels, spill_path)
+
+    def _fill_statistic(self, target, table, stat, t0, step, start_ts, end_ts):
+        """Schreibt die Werte einer Statistik in die Matrixzeile 'target'; False, wenn es keine gibt."""
+        column = 'sum' if stat.kind == 'sum' else 'mean'
+        cursor = self.connection.execute(
+            f'SELECT start_ts, {column} FROM {table} WHERE metadata_id = ? AND start_ts >= ? AND start_ts < ? ORDER BY start_ts',
+            (stat.id, start_ts, end_ts))
+        previous = self._previous_sum(table, stat.id, start_ts) if stat.kind == 'sum' else None
+        found = False
+        while True:
+            rows = cursor.fetchmany(FETCH_ROWS)
+            if not rows:
+                break
+            block = np.array(rows, dtype=np.float64)
+            positions = np.rint((block[:, 0] - t0) / step).astype(np.int64)
+            block_values = block[:, 1]
+            if previous is not None:
+                # Verbrauch je Intervall = Änderung der fortlaufenden Summe; Lücken landen im nächsten Intervall
+                sums = block_values
+                block_values = np.diff(sums, prepend=previous)
+                previous = sums[-1]
+            inside = (positions >= 0) & (positions < len(target))
+            target[positions[inside]] = block_values[inside]
+            found = True
+        return found
+
+    # --- Entitäten ---
+    def read_entities(self, end=None, tz=None, progress=None):
+        """Letzter State je Entität (vor 'end', falls angegeben) als String-DataFrame mit ENTITY_COLUMNS."""
+        tz = local_timezone() if tz is None else tz
+        end_ts = to_epoch(end, tz)
+        bound = '' if end_ts is None else 'AND last_updated_ts < ?'
+        # Die korrelierte Unterabfrage nutzt je Entität den Index (metadata_id, last_updated_ts)
+        query = f"""
+            SELECT m.entity_id, s.state, s.last_updated_ts, a.shared_attrs
+            FROM states_meta AS m
+            JOIN states AS s ON s.state_id = (
+                SELECT state_id FROM states
+                WHERE metadata_id = m.metadata_id {bound}
+                ORDER BY last_updated_ts DESC LIMIT 1)
+            LEFT JOIN state_attributes AS a ON a.attributes_id = s.attributes_id
+            ORDER BY m.entity_id"""
+        total = self.connection.execute('SELECT COUNT(*) FROM states_meta').fetchone()[0]
+        cursor = self.connection.execute(query, () if end_ts is None else (end_ts,))
+        records = []
+        while True:
+            if progress is not None:
+                progress(len(records), total, 'recorder')
+            rows = cursor.fetchmany(FETCH_ROWS)
+            if not rows:
+                break
+            for entity_id, state, updated, shared_attrs in rows:
+                attributes = parse_attributes(shared_attrs)
+                records.append((entity_id, str(attributes.get('friendly_name', '')), state or '',
+                                str(attributes.get('unit_of_measurement', '')), str(attributes.get('device_class', '')),
+                                updated))
+
+        df = pd.DataFrame(records, columns=ENTITY_COLUMNS, dtype=object)
+        updated = pd.to_datetime(df['last updated'].astype(float), unit='s', utc=True).dt.tz_convert(tz)
+        df['last updated'] = updated.dt.strftime('%Y-%m-%d %H:%M:%S').fillna('')
+        return df
+
+
+def parse_attributes(shared_attrs):
+    """Attribute eines States (JSON-Text aus state_attributes) als Dict; fehlerhafte Einträge ergeben {}."""
+    if not shared_attrs:
+        return {}
+    try:
+        attributes = json.loads(shared_attrs)
+    except ValueError:
+        return {}
+    return attributes if isinstance(attributes, dict) else {}
+
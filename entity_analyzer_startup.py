@@ -0,0 +1,164 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+##############################
+# HA_Entity_Analyzer_Startup #
+##############################
+
+# Kaltstart des Tools: Fenster und Menüs erscheinen sofort, die schweren Bibliotheken
+# kommen danach. pandas/numpy (mit Engine und Cache) importiert ein Hintergrund-Thread,
+# sobald das Fenster steht; matplotlib wird erst für die erste Energie-Ansicht geladen.
+# Die Zeitpunkte werden als Marken festgehalten. Mit --measure-startup startet sich das
+# Tool mehrfach selbst und misst, wann Interpreter, Fenster und Bibliotheken bereit sind:
+#
+#   python entity_analyzer_tool.py --measure-startup --runs 5 -o startup_neu.json --compare startup_alt.json
+
+# Wanduhrzeit beim Import dieses Moduls (das Tool importiert es als erstes eigenes Modul).
+# Wanduhr statt perf_counter, damit sich die Marken mit der Startzeit des Elternprozesses vergleichen lassen.
+STARTED = time.time()
+
+# Name -> Zeitpunkt (time.time()) des ersten Erreichens
+MARKS = {}
+
+# Schwere Module, die beim Anzeigen des Fensters schon geladen waren (nur im Probe-Lauf gefüllt)
+PROBE_MODULES = []
+
+# Reihenfolge der Marken in Ausgabe und Vergleich
+MARK_ORDER = ('interpreter', 'window', 'pandas', 'charts')
+
+# Module, die beim Anzeigen des Fensters noch nicht geladen sein dürfen
+DEFERRED_MODULES = ('pandas', 'numpy', 'matplotlib')
+
+
+def mark(name):
+    """Hält den ersten Zeitpunkt von 'name' fest."""
+    MARKS.setdefault(name, time.time())
+
+
+class BackgroundImport:
+    """Führt 'loader' einmal in einem Daemon-Thread aus; wait() liefert sein Ergebnis oder wirft seinen Fehler."""
+
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self.result = None
+        self.error = None
+        self.thread = None
+        self._done = threading.Event()
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name=f'import-{self.name}', daemon=True)
+            self.thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self.result = self.loader()
+            mark(self.name)
+        except BaseException as e:
+            self.error = e
+        finally:
+            self._done.set()
+
+    def ready(self):
+        return self._done.is_set()
+
+    def wait(self):
+        """Wartet auf den Import (startet ihn bei Bedarf) und gibt das Ergebnis des Loaders zurück."""
+        self.start()._done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def close_splash():
+    """Schließt den Splash des PyInstaller-Builds (--splash); ohne Build passiert nichts."""
+    try:
+        import pyi_splash
+    except ImportError:
+        return
+    pyi_splash.close()
+
+
+def write_probe(path):
+    """Schreibt die Marken eines Probe-Laufs (siehe measure_startup) als JSON."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'started': STARTED, 'marks': MARKS, 'loaded_at_window': PROBE_MODULES}, f)
+
+
+def record_window_modules():
+    """Merkt sich, welche der DEFERRED_MODULES beim Anzeigen des Fensters schon geladen sind."""
+    PROBE_MODULES[:] = [name for name in DEFERRED_MODULES if name in sys.modules]
+
+
+def own_command():
+    """Befehl, mit dem sich das Tool selbst startet (Skript oder PyInstaller-Build)."""
+    if getattr(sys, 'frozen', False):
+        return [sys.executable]
+    return [sys.executable, os.path.abspath(sys.modules['__main__'].__file__)]
+
+
+def measure_startup(runs=5, output=None, baseline=None, timeout=120):
+    """Startet das Tool 'runs'-mal als Probe und gibt Median/Minimum je Marke (Sekunden ab Prozessstart) aus."""
+    samples = {name: [] for name in MARK_ORDER}
+    preloaded = set()
+    with tempfile.TemporaryDirectory(prefix='ha_entity_startup_') as tmp:
+        for run in range(runs):
+            probe = os.path.join(tmp, f'probe_{run}.json')
+            launched = time.time()
+            subprocess.run(own_command() + ['--startup-probe', probe], check=True, timeout=timeout)
+            with open(probe, encoding='utf-8') as f:
+                result = json.load(f)
+            samples['interpreter'].append(result['started'] - launched)
+            for name, stamp in result['marks'].items():
+                samples.setdefault(name, []).append(stamp - launched)
+            preloaded.update(result['loaded_at_window'])
+
+    results = [{'mark': name, 'median_s': statistics.median(values), 'min_s': min(values), 'runs': len(values)}
+               for name, values in samples.items() if values]
+    lines = [f"{r['mark']:<12} {r['median_s'] * 1000:10.1f} ms  (min {r['min_s'] * 1000:.1f} ms)" for r in results]
+    if preloaded:
+        lines.append(f"WARNUNG: vor dem Fenster geladen: {', '.join(sorted(preloaded))}")
+    if baseline:
+        lines.extend(compare_startup(results, baseline))
+    report = {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'frozen': bool(getattr(sys, 'frozen', False)),
+            'loaded_at_window': sorted(preloaded),
+        },
+        'results': results,
+    }
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        lines.append(f"Ergebnisse nach '{output}' geschrieben.")
+    # Der --windowed-Build hat kein stdout
+    if sys.stdout is not None:
+        print("\n".join(lines))
+    return report
+
+
+def compare_startup(results, baseline_path):
+    """Verhältnis je Marke zu einem früheren Ergebnis (> 1 = langsamer)."""
+    with open(baseline_path, encoding='utf-8') as f:
+        old = {r['mark']: r['median_s'] for r in json.load(f)['results']}
+    lines = [f"Vergleich mit {os.path.basename(baseline_path)}:"]
+    for r in results:
+        before = old.get(r['mark'])
+        if not before:
+            continue
+        ratio = r['median_s'] / before
+        marker = '  langsamer' if ratio > 1.10 else ('  schneller' if ratio < 0.90 else '')
+        lines.append(f"{r['mark']:<12} {before * 1000:10.1f} -> {r['median_s'] * 1000:10.1f} ms  x{ratio:.2f}{marker}")
+    return lines
@@ -1,12 +1,44 @@
+import entity_analyzer_startup as startup  # als erstes, hält den Startzeitpunkt fest
+import argparse
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, simpledialog
-import pandas as pd
 import os
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
-from tkinter.font import Font
-import numpy as np
-import random
+import base64
+import multiprocessing
+import queue
+import threading
+import time
+
+from entity_analyzer_perf import PERF
+
+# pandas, numpy und matplotlib werden hier bewusst nicht importiert (siehe entity_analyzer_startup):
+# load_data_modules() lädt pandas samt Engine im Hintergrund, sobald das Fenster steht,
+# load_chart_modules() matplotlib samt Diagrammen erst für die erste Energie-Ansicht.
+# Bis dahin sind die folgenden Namen None.
+pd = engine_module = AnalysisEngine = LoadCancelled = ParseCache = parse_tariff = None
+ChartView = plain_datetimes = render_chart_png = None
+
+
+def load_data_modules():
+    """Importiert pandas und die Engine und gibt die Engine der App zurück (läuft im Hintergrund-Thread)."""
+    global pd, engine_module, AnalysisEngine, LoadCancelled, ParseCache, parse_tariff
+    with PERF.span('startup.import_pandas'):
+        import pandas as pd
+        import entity_analyzer_engine as engine_module
+        from entity_analyzer_engine import AnalysisEngine, LoadCancelled
+        from entity_analyzer_cache import ParseCache
+        from entity_analyzer_energy import parse_tariff
+    return AnalysisEngine(cache=ParseCache())
+
+
+def load_chart_modules():
+    """Importiert matplotlib und die Diagramme beim ersten Bedarf; danach ohne Wirkung."""
+    global ChartView, plain_datetimes, render_chart_png
+    if ChartView is not None:
+        return
+    with PERF.span('startup.import_matplotlib'):
+        from entity_analyzer_charts import ChartView, plain_datetimes, render_chart_png
+    startup.mark('charts')
 
 ###########################
 # HA_Entity_Analyzer_Tool #
@@ -19,21 +51,6 @@ import random
 # area, platform & manufacturer filter
 # entities statistic
 
-class CustomNavigationToolbar(NavigationToolbar2Tk):
-    def __init__(self, canvas, window):
-        super().__init__(canvas, window)
-        self.label_font = Font(family="Helvetica", size=12, weight="bold")
-        for child in self.winfo_children():
-            if isinstance(child, tk.Label):
-                child.config(font=self.label_font, foreground='dark red')
-
-    def set_message(self, msg):
-        if msg:
-            super().set_message(msg)
-            for child in self.winfo_children():
-                if isinstance(child, tk.Label):
-                    child.config(font=self.label_font, foreground='dark red')
-
 class CheckboxList(tk.Frame):
     def __init__(self, master=None, **kwargs):
         super().__init__(master, **kwargs)
@@ -95,6 +112,149 @@ class CheckboxList(tk.Frame):
         for var in self.checkboxes.values():
             var.set(False)
 
+class VirtualTable:
+    """Virtuelles Scrollen für ein Treeview: nur die sichtbaren Zeilen der Ansicht werden eingefügt.
+
+    Die Ansicht (RowView der Engine) bleibt die einzige Datenquelle. Das Treeview enthält immer nur so viele
+    Items wie sichtbar sind; beim Scrollen werden deren Werte neu gesetzt, statt Items
+    zu löschen und neu anzulegen.
+    """
+    HEADING_HEIGHT = 25
+
+    def __init__(self, tree, vsb):
+        self.tree = tree
+        self.vsb = vsb
+        self.view = None
+        self.first_row = 0
+        self.visible_rows = 1
+        self.selected_row = None
+        self.item_ids = []
+
+        self.vsb.config(command=self.yview)
+        self.tree.bind('<Configure>', self._on_configure)
+        self.tree.bind('<MouseWheel>', self._on_mousewheel)
+        self.tree.bind('<Button-4>', lambda e: self._scroll_and_break(-3))
+        self.tree.bind('<Button-5>', lambda e: self._scroll_and_break(3))
+        self.tree.bind('<Prior>', lambda e: self._scroll_and_break(-self.visible_rows))
+        self.tree.bind('<Next>', lambda e: self._scroll_and_break(self.visible_rows))
+        self.tree.bind('<Home>', lambda e: self._scroll_to_and_break(0))
+        self.tree.bind('<End>', lambda e: self._scroll_to_and_break(self.row_count))
+        self.tree.bind('<Up>', lambda e: self._on_arrow(-1))
+        self.tree.bind('<Down>', lambda e: self._on_arrow(1))
+        self.tree.bind('<<TreeviewSelect>>', self._on_select)
+
+    @property
+    def row_count(self):
+        return 0 if self.view is None else len(self.view)
+
+    def set_data(self, view):
+        """Setzt die anzuzeigende Ansicht (RowView) und springt an den Anfang."""
+        self.view = view
+        self.first_row = 0
+        self.selected_row = None
+        self.refresh()
+
+    def row_for_item(self, iid):
+        """Gibt die absolute Zeilenposition in der Ansicht für ein sichtbares Item zurück."""
+        if iid not in self.item_ids:
+            return None
+        return self.first_row + self.item_ids.index(iid)
+
+    def _compute_visible_rows(self):
+        rowheight = int(ttk.Style().lookup('Treeview', 'rowheight') or 25)
+        height = self.tree.winfo_height()
+        if height <= 1:
+            # Widget ist noch nicht gezeichnet, eine sinnvolle Startgröße annehmen
+            return 30
+        return max(1, (height - self.HEADING_HEIGHT) // rowheight)
+
+    def refresh(self):
+        """Füllt die sichtbaren Items mit den Zeilen ab 'first_row'."""
+        self.visible_rows = self._compute_visible_rows()
+        total = self.row_count
+        self.first_row = max(0, min(self.first_row, total - self.visible_rows))
+
+        rows = [] if self.view is None else self.view.rows_as_lists(self.first_row, self.first_row + self.visible_rows)
+
+        # Item-Pool an die benötigte Anzahl anpassen
+        while len(self.item_ids) < len(rows):
+            self.item_ids.append(self.tree.insert('', tk.END, values=()))
+        while len(self.item_ids) > len(rows):
+            self.tree.delete(self.item_ids.pop())
+
+        for offset, (iid, row) in enumerate(zip(self.item_ids, rows)):
+            tag = 'evenrow' if (self.first_row + offset) % 2 == 0 else 'oddrow'
+            self.tree.item(iid, values=row, tags=(tag,))
+
+        # Auswahl der absoluten Zeile folgt dem Scrollen
+        if self.selected_row is not None and self.first_row <= self.selected_row < self.first_row + len(rows):
+            iid = self.item_ids[self.selected_row - self.first_row]
+            if self.tree.selection() != (iid,):
+                self.tree.selection_set(iid)
+            self.tree.focus(iid)
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        total = self.row_count
+        if total == 0:
+            self.vsb.set(0.0, 1.0)
+            return
+        self.vsb.set(self.first_row / total, min(1.0, (self.first_row + self.visible_rows) / total))
+
+    def scroll_to(self, row):
+        new_first = max(0, min(int(row), self.row_count - self.visible_rows))
+        if new_first != self.first_row:
+            self.first_row = new_first
+            self.refresh()
+
+    def yview(self, *args):
+        """Scrollbar-Kommando ('moveto' bzw. 'scroll')."""
+        if not args:
+            return
+        if args[0] == 'moveto':
+            self.scroll_to(float(args[1]) * self.row_count)
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            if args[2] == 'pages':
+                amount *= self.visible_rows
+            self.scroll_to(self.first_row + amount)
+
+    def _scroll_and_break(self, amount):
+        self.scroll_to(self.first_row + amount)
+        return "break"
+
+    def _scroll_to_and_break(self, row):
+        self.scroll_to(row)
+        return "break"
+
+    def _on_mousewheel(self, event):
+        return self._scroll_and_break(int(-1 * (event.delta / 120)) * 3)
+
+    def _on_arrow(self, step):
+        if self.selected_row is None:
+            return None
+        target = max(0, min(self.selected_row + step, self.row_count - 1))
+        self.selected_row = target
+        if not self.first_row <= target < self.first_row + self.visible_rows:
+            self.first_row = target if step < 0 else target - self.visible_rows + 1
+        self.refresh()
+        return "break"
+
+    def _on_select(self, event=None):
+        selection = self.tree.selection()
+        if selection:
+            row = self.row_for_item(selection[0])
+            if row is not None:
+                self.selected_row = row
+
+    def _on_configure(self, event=None):
+        if self._compute_visible_rows() != self.visible_rows:
+            self.refresh()
+
+
 class Tooltip:
     """Erstellt ein Tooltip für ein gegebenes Widget."""
     def __init__(self, widget, text):
@@ -124,12 +284,9 @@ class Tooltip:
         self.tooltip_window = None
 
 class EntityAnalyzerApp:
-    # --- Konstanten ---
-    COL_ENTITY_ID = 'entity id'
-    COL_AREA = 'area'
-    COL_PLATFORM = 'platform'
-    COL_MANUFACTURER = 'manufacturer'
-    
+    # Anzahl der Operationen im Performance-Fenster
+    PERF_WINDOW_ROWS = 100
+
     # --- Globale App-Konfiguration ---
     THEME_COLORS = {
         'light': {
@@ -160,13 +317,35 @@ class EntityAnalyzerApp:
             print(f"Warnung: Konnte Icon 'E_A_T-logo.ico' nicht laden. Fehler: {e}")
             pass
  
-        self.df_data = None
-        self.df_original = None
+        # Die gesamte Datenhaltung und Analyse liegt in der Engine, die GUI zeigt nur an.
+        # Sie entsteht mit dem Import von pandas erst nach dem Anzeigen des Fensters (siehe 'engine').
+        self.data_import = startup.BackgroundImport('pandas', load_data_modules)
         self.is_dark_mode = False
         self.is_always_on_top = False
-        self.current_csv_type = None
         self.chart_type = 'line'  # Standard-Chart-Typ
+        self.chart_views = {}  # entity_id -> ChartView der Einzelansicht
+        self.chart_slots = {}  # entity_id -> Platzhalter-Frame fester Höhe im scrollbaren Bereich
+        self.chart_states = {}  # entity_id -> (Periode, Typ) des zuletzt gerenderten Diagramms
+        self.chart_update_job = None
+        self.chart_generation = 0
+        self.use_raster_charts = False  # Einzeldiagramme parallel in Worker-Prozessen als Bilder rendern
+        self.chart_pool = None
+        self.raster_futures = {}  # entity_id -> (Future, (Periode, Typ))
+        self.raster_poll_job = None
+        self.combined_view = None
+        self.entity_colors = {}
+        self.combined_range = (None, None)  # (Beginn, Ende) der kombinierten Ansicht, Ende exklusiv
+        self.tariff = [('00:00', '24:00', 0.30)]  # Tarifzonen (von, bis, Preis je Einheit)
         self.search_job = None
+        self.load_job = None
+        self.load_queue = None
+        self.load_cancel_event = None
+        self.load_request = ('read', {})  # (Engine-Methode, Optionen) des laufenden Ladevorgangs
+        self.source_request = ('read', {})  # ... der angezeigten Datei, zum Zurückkehren nach einem Vergleich
+        self.home_assistant_url = "http://homeassistant.local:8123"
+        self.home_assistant_token = None
+        self.load_span = None  # Performance-Span des laufenden Ladevorgangs (Start bis Anzeige)
+        self.perf_window = None
 
         self.style = ttk.Style()
         self.style.theme_use('clam')
@@ -176,7 +355,31 @@ class EntityAnalyzerApp:
         self._create_widgets()
          
         self.apply_theme('light')
- 
+        self.root.after_idle(self._on_window_shown)
+
+    @property
+    def engine(self):
+        # None, solange pandas im Hintergrund lädt oder der Import fehlgeschlagen ist; im Tk-Thread
+        # wird nie gewartet, das tut nur der Lade-Worker mit data_import.wait()
+        return self.data_import.result if self.data_ready else None
+
+    @property
+    def data_ready(self):
+        return self.data_import.ready() and self.data_import.error is None
+
+    @property
+    def df_original(self):
+        return self.engine.df_original if self.data_ready else None
+
+    @property
+    def df_data(self):
+        # Aktuelle Ansicht als RowView über 'df_original', keine Kopie der Zeilen
+        return self.engine.view if self.data_ready else None
+
+    @property
+    def current_csv_type(self):
+        return self.engine.csv_type if self.data_ready else None
+
     def _create_menu(self):
         self.menu_bar = tk.Menu(self.root)
         self.root.config(menu=self.menu_bar)
@@ -185,6 +388,13 @@ class EntityAnalyzerApp:
         self.menu_bar.add_cascade(label="Datei", menu=self.datei_menu)
         self.datei_menu.add_command(label="📂 CSV Import", command=self.load_csv_data)
         self.datei_menu.add_command(label="💾 CSV Export", command=self.export_current_view_to_csv)
+        self.datei_menu.add_command(label="🗄️ Recorder-Datenbank öffnen", command=self.open_recorder_database)
+        self.datei_menu.add_command(label="🏠 Mit Home Assistant verbinden", command=self.connect_home_assistant)
+        self.datei_menu.add_separator()
+        self.datei_menu.add_command(label="🔀 Mit älterem Export vergleichen", command=self.compare_with_csv)
+        self.datei_menu.add_command(label="↩️ Vergleich beenden", command=self.end_comparison)
+        self.datei_menu.add_separator()
+        self.datei_menu.add_command(label="🧹 Cache leeren", command=self.clear_parse_cache)
         self.datei_menu.add_separator()
         self.datei_menu.add_command(label="Exit", command=self.root.destroy)
  
@@ -193,8 +403,10 @@ class EntityAnalyzerApp:
         self.filter_menu.add_command(label="📍 Filter Area", command=lambda: self.filter_data('area'))
         self.filter_menu.add_command(label="🔌 Filter Plattform", command=lambda: self.filter_data('platform'))
         self.filter_menu.add_command(label="🏭 Filter Manufacturer", command=lambda: self.filter_data('manufacturer'))
+        self.filter_menu.add_command(label="🧩 Facettenfilter", command=self.show_facet_filter_gui)
         self.filter_menu.add_separator()
         self.filter_menu.add_command(label="📊 Typ-Statistik anzeigen", command=self.show_domain_stats_gui)
+        self.filter_menu.add_command(label="📊 Kreuztabellen", command=self.show_cross_tab_gui)
         self.filter_menu.add_separator()
         self.filter_menu.add_command(label="🔄 Filter & Suche reset", command=self.reset_filter)
  
@@ -203,6 +415,9 @@ class EntityAnalyzerApp:
         self.optionen_menu.add_command(label="⬜ Hell/Dunkel Modus", command=self.toggle_dark_mode)
         self.optionen_menu.add_separator()
         self.optionen_menu.add_command(label="⬜ App im Vordergrund halten", command=self.toggle_always_on_top)
+        self.optionen_menu.add_command(label="⬜ Diagramme parallel rendern", command=self.toggle_raster_charts)
+        self.optionen_menu.add_separator()
+        self.optionen_menu.add_command(label="⏱️ Performance", command=self.show_performance_window)
         self.optionen_menu.add_separator()
         self.optionen_menu.add_command(label="ℹ️ Info", command=self.show_about_window)
 
@@ -227,6 +442,9 @@ class EntityAnalyzerApp:
         self.progress_label.place(relx=0.5, rely=0.5, anchor='center')
         progress_container.pack_forget()
 
+        self.cancel_button = ttk.Button(footer_frame, text="✖ Abbrechen", command=self.cancel_loading)
+        Tooltip(self.cancel_button, "Bricht das Laden der Datei ab.")
+
         self.version_label = ttk.Label(footer_frame, text=self.VERSION, anchor=tk.E)
         self.version_label.pack(side=tk.RIGHT)
 
@@ -258,11 +476,12 @@ class EntityAnalyzerApp:
         self.vsb = ttk.Scrollbar(table_frame, orient="vertical")
         self.hsb = ttk.Scrollbar(table_frame, orient="horizontal")
 
-        self.tree = ttk.Treeview(table_frame, columns=[], show='headings',
-                                 yscrollcommand=self.vsb.set, xscrollcommand=self.hsb.set)
+        # Vertikales Scrollen übernimmt die VirtualTable, das Treeview enthält nur die sichtbaren Zeilen
+        self.tree = ttk.Treeview(table_frame, columns=[], show='headings', xscrollcommand=self.hsb.set)
         self.tree.bind('<Double-1>', self.show_entity_details)
-        self.vsb.config(command=self.tree.yview)
         self.hsb.config(command=self.tree.xview)
+        self.virtual_table = VirtualTable(self.tree, self.vsb)
+        self.table_columns = None
 
         self.vsb.pack(side=tk.RIGHT, fill=tk.Y)
         self.hsb.pack(side=tk.BOTTOM, fill=tk.X)
@@ -316,8 +535,20 @@ class EntityAnalyzerApp:
 
         self.optionen_menu.entryconfig(0, label=f"{'✅' if self.is_dark_mode else '⬜'} Hell/Dunkel Modus")
         self.optionen_menu.entryconfig(2, label=f"{'✅' if self.is_always_on_top else '⬜'} App im Vordergrund halten")
-
-        if self.df_data is not None and self.current_csv_type == 'entity':
+        self.optionen_menu.entryconfig(3, label=f"{'✅' if self.use_raster_charts else '⬜'} Diagramme parallel rendern")
+
+        # Vorhandene Diagramme nur umfärben, nicht neu aufbauen
+        if getattr(self, 'chart_canvas', None) is not None and self.chart_canvas.winfo_exists():
+            self.chart_canvas.config(bg=colors['bg'])
+        for view in self.live_chart_views():
+            view.apply_colors(colors)
+        for entity in [e for e in self.chart_states if e not in self.chart_views]:
+            # Gerasterte Bilder lassen sich nicht umfärben, sie werden neu gerendert
+            self.evict_chart(entity)
+        self.schedule_visible_charts_update()
+
+        # Die Zeilen-Tags wurden oben umkonfiguriert; eine bereits gefüllte Tabelle braucht keinen Neuaufbau
+        if self.df_data is not None and self.current_csv_type == 'entity' and getattr(self, 'table_columns', None) is None:
              self.setup_treeview(self.df_data)
 
     def show_entity_details(self, event):
@@ -365,6 +596,102 @@ class EntityAnalyzerApp:
         ttk.Label(about_frame, text="Drecksfresse, Nicknol and MarzyHA", font=("Helvetica", 8)).pack()
         ttk.Button(about_window, text="Schließen", command=about_window.destroy).pack(pady=10)
  
+    def show_performance_window(self):
+        """Zeigt die letzten gemessenen Operationen; cProfile und tracemalloc lassen sich hier ein- und ausschalten."""
+        if self.perf_window is not None and self.perf_window.winfo_exists():
+            self.perf_window.lift()
+            return
+        perf_window = self.perf_window = tk.Toplevel(self.root)
+        perf_window.title("⏱️ Performance")
+        try:
+            perf_window.iconbitmap('E_A_T-logo.ico')
+        except tk.TclError:
+            pass
+        perf_window.geometry("900x500")
+        colors = self.THEME_COLORS['dark' if self.is_dark_mode else 'light']
+        perf_window.config(bg=colors['bg'])
+
+        columns = ['Zeit', 'Operation', 'Dauer (ms)', 'Δ RSS (MB)', 'Spitze (MB)', 'Thread', 'Details']
+        tree_frame = ttk.Frame(perf_window)
+        tree_frame.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
+        perf_tree = ttk.Treeview(tree_frame, columns=columns, show='headings')
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=perf_tree.yview)
+        perf_tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        perf_tree.pack(fill=tk.BOTH, expand=True)
+        for col, width in zip(columns, (70, 170, 80, 80, 80, 90, 300)):
+            perf_tree.heading(col, text=col)
+            perf_tree.column(col, width=width, anchor=tk.E if '(' in col else tk.W)
+        perf_tree.tag_configure('oddrow', background=colors['tree_odd'], foreground=colors['fg'])
+        perf_tree.tag_configure('evenrow', background=colors['tree_even'], foreground=colors['fg'])
+
+        def megabytes(value):
+            return f"{value / (1024 * 1024):.1f}" if value is not None else "–"
+
+        shown = [None]
+
+        def refresh():
+            if not perf_window.winfo_exists():
+                return
+            records = PERF.recent(self.PERF_WINDOW_ROWS)
+            if records and records[0] is not shown[0]:
+                shown[0] = records[0]
+                perf_tree.delete(*perf_tree.get_children())
+                for i, record in enumerate(records):
+                    details = ", ".join(f"{key}={value}" for key, value in record.details.items())
+                    perf_tree.insert('', tk.END, values=(time.strftime('%H:%M:%S', time.localtime(record.started)), record.name,
+                                                         f"{record.duration * 1000:.1f}", megabytes(record.rss_delta),
+                                                         megabytes(record.peak_delta), record.thread, details),
+                                     tags=('evenrow' if i % 2 == 0 else 'oddrow',))
+            perf_window.after(1000, refresh)
+
+        tracemalloc_var = tk.BooleanVar(value=PERF.tracing_memory())
+        profile_var = tk.BooleanVar(value=PERF.profiling())
+
+        def toggle_tracemalloc():
+            if tracemalloc_var.get():
+                PERF.start_memory_tracing()
+            else:
+                PERF.stop_memory_tracing()
+
+        def toggle_profile():
+            if profile_var.get():
+                PERF.start_profile()
+            elif PERF.profiling():
+                save_profile(PERF.stop_profile())
+
+        def save_profile(profiler):
+            filepath = filedialog.asksaveasfilename(parent=perf_window, title="cProfile speichern", defaultextension=".prof",
+                                                    filetypes=[("cProfile", "*.prof"), ("Text", "*.txt")])
+            if filepath:
+                PERF.dump_profile(profiler, filepath)
+                self.status_label.config(text=f"✅ Profil nach '{os.path.basename(filepath)}' gespeichert.", foreground="green")
+
+        def save_snapshot():
+            if not PERF.tracing_memory():
+                messagebox.showinfo("Info", "Bitte zuerst die Speicher-Messung (tracemalloc) einschalten.", parent=perf_window)
+                return
+            filepath = filedialog.asksaveasfilename(parent=perf_window, title="Speicher-Schnappschuss speichern",
+                                                    defaultextension=".txt", filetypes=[("Text", "*.txt")])
+            if filepath:
+                PERF.dump_memory_snapshot(filepath)
+                self.status_label.config(text=f"✅ Schnappschuss nach '{os.path.basename(filepath)}' gespeichert.", foreground="green")
+
+        def clear():
+            PERF.clear()
+            shown[0] = None
+            perf_tree.delete(*perf_tree.get_children())
+
+        control_frame = ttk.Frame(perf_window)
+        control_frame.pack(pady=(0, 10))
+        ttk.Checkbutton(control_frame, text="Speicher-Spitzen messen (tracemalloc, langsamer)", variable=tracemalloc_var,
+                        command=toggle_tracemalloc).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(control_frame, text="cProfile aufzeichnen (beim Ausschalten speichern)", variable=profile_var,
+                        command=toggle_profile).pack(side=tk.LEFT, padx=5)
+        ttk.Button(control_frame, text="Speicher-Schnappschuss …", command=save_snapshot).pack(side=tk.LEFT, padx=5)
+        ttk.Button(control_frame, text="Leeren", command=clear).pack(side=tk.LEFT, padx=5)
+        refresh()
+
     def toggle_dark_mode(self):
         self.apply_theme('light' if self.is_dark_mode else 'dark')
  
@@ -372,43 +699,274 @@ class EntityAnalyzerApp:
         self.is_always_on_top = not self.is_always_on_top
         self.root.wm_attributes('-topmost', self.is_always_on_top)
         self.optionen_menu.entryconfig(2, label=f"{'✅' if self.is_always_on_top else '⬜'} App im Vordergrund halten")
- 
-    def detect_csv_type(self, filepath):
-        """Analysiert die Kopfzeile, um den CSV-Typ und das Trennzeichen zu bestimmen."""
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                header = f.readline().strip()
-                # Heuristik für Energy-CSV: Zeitstempel-Format im Header
-                if ',' in header and any(c.isdigit() for c in header):
-                    if header.count(',') > header.count(';'):
-                        return 'energy', ','
-                # Standard-Annahme: Entity-CSV mit Semikolon
-                return 'entity', ';'
-        except Exception:
-            # Fallback
-            return 'entity', ';'
+
+    def toggle_raster_charts(self):
+        self.use_raster_charts = not self.use_raster_charts
+        self.optionen_menu.entryconfig(3, label=f"{'✅' if self.use_raster_charts else '⬜'} Diagramme parallel rendern")
+        # Bereits gezeigte Einzeldiagramme im jeweils anderen Modus neu aufbauen
+        for entity in list(self.chart_states):
+            self.evict_chart(entity)
+        self.schedule_visible_charts_update()
+
+    def _on_window_shown(self):
+        """Erster Leerlauf nach dem Anzeigen: Splash schließen und pandas im Hintergrund laden."""
+        startup.mark('window')
+        startup.record_window_modules()
+        startup.close_splash()
+        self.data_import.start()
+        self.status_label.config(text="⏳ Lade Bibliotheken ...", foreground="blue")
+        self.root.after(50, self._poll_data_import)
+
+    def _poll_data_import(self):
+        if not self.data_import.ready():
+            self.root.after(50, self._poll_data_import)
+            return
+        if self.data_import.error is not None:
+            e = self.data_import.error
+            self.status_label.config(text=f"❌ Fehler: {e}", foreground="red")
+            messagebox.showerror("Startfehler", f"Die Bibliotheken konnten nicht geladen werden:\n{e}")
+        elif self.load_job is None:
+            self.status_label.config(text="Bereit, lade eine CSV-Datei.", foreground="black")
+
+    def shutdown_chart_pool(self):
+        if self.chart_pool is not None:
+            self.chart_pool.shutdown(wait=False, cancel_futures=True)
+            self.chart_pool = None
 
     def load_csv_data(self):
+        if self.load_job is not None:
+            messagebox.showinfo("Info", "Es wird bereits eine Datei geladen.")
+            return
+
         filepath = filedialog.askopenfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
         if not filepath: return
+        self.start_loading(filepath, 'read')
 
-        self.current_csv_type, separator = self.detect_csv_type(filepath)
-        
+    def open_recorder_database(self):
+        """Liest eine Kopie von home-assistant_v2.db direkt: Statistiken als Energiedaten oder Entitäten."""
+        if self.load_job is not None:
+            messagebox.showinfo("Info", "Es wird bereits eine Datei geladen.")
+            return
+        filepath = filedialog.askopenfilename(title="Kopie von home-assistant_v2.db wählen",
+                                              filetypes=[("Recorder-Datenbank", "*.db"), ("Alle Dateien", "*.*")])
+        if not filepath: return
+        self._show_recorder_dialog("🗄️ Recorder-Datenbank", os.path.basename(filepath),
+                                   lambda options: self.start_loading(filepath, 'read_recorder', **options))
+
+    def connect_home_assistant(self):
+        """Holt Entitäten (mit Registries) oder Statistiken über die WebSocket-API einer laufenden Instanz."""
+        if self.load_job is not None:
+            messagebox.showinfo("Info", "Es wird bereits eine Datei geladen.")
+            return
+
+        def load(options):
+            url, token = options.pop('url'), options.pop('token')
+            # URL und Token bleiben nur für diese Sitzung im Speicher
+            self.home_assistant_url, self.home_assistant_token = url, token
+            self.start_loading(url, 'read_home_assistant', token=token, **options)
+
+        self._show_recorder_dialog("🏠 Home Assistant", "Mit Home Assistant verbinden", load, connection=True)
+
+    def _show_recorder_dialog(self, title, heading, on_load, connection=False):
+        """Dialog für Recorder-Daten: Quelle, Mittelwerte und Zeitraum, bei 'connection' zusätzlich URL und Token.
+
+        'on_load(options)' bekommt die Optionen für read_recorder() bzw. read_home_assistant().
+        """
+        recorder_window = tk.Toplevel(self.root)
+        recorder_window.title(title)
+        try:
+            recorder_window.iconbitmap('E_A_T-logo.ico')
+        except tk.TclError:
+            pass
+        recorder_window.transient(self.root)
+        colors = self.THEME_COLORS['dark' if self.is_dark_mode else 'light']
+        recorder_window.config(bg=colors['bg'])
+
+        ttk.Label(recorder_window, text=heading, font=("Helvetica", 10, "bold")).pack(padx=10, pady=(10, 5))
+        url_var = tk.StringVar(value=self.home_assistant_url)
+        token_var = tk.StringVar(value=self.home_assistant_token or os.environ.get('HA_TOKEN', ''))
+        if connection:
+            connection_frame = ttk.Frame(recorder_window)
+            connection_frame.pack(padx=10, pady=(0, 5), fill=tk.X)
+            ttk.Label(connection_frame, text="URL").grid(row=0, column=0, sticky=tk.W, padx=2, pady=2)
+            ttk.Entry(connection_frame, textvariable=url_var, width=40).grid(row=0, column=1, sticky=tk.EW, padx=2, pady=2)
+            ttk.Label(connection_frame, text="Token").grid(row=1, column=0, sticky=tk.W, padx=2, pady=2)
+            ttk.Entry(connection_frame, textvariable=token_var, width=40, show="*").grid(row=1, column=1, sticky=tk.EW, padx=2, pady=2)
+            ttk.Label(recorder_window, text="Long-Lived Access Token aus dem Benutzerprofil von Home Assistant").pack(padx=10)
+
+        source_var = tk.StringVar(value='states' if connection else 'statistics')
+        for text, value in (("Energie: Langzeit-Statistiken (stündlich)", 'statistics'),
+                            ("Energie: Kurzzeit-Statistiken (5 Minuten, letzte Tage)", 'short_term'),
+                            ("Entitäten: mit Geräten und Areas aus den Registries" if connection
+                             else "Entitäten: letzter State je Entität", 'states')):
+            ttk.Radiobutton(recorder_window, text=text, variable=source_var, value=value).pack(anchor=tk.W, padx=10)
+        means_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(recorder_window, text="Auch Mittelwert-Sensoren (z.B. Temperaturen)", variable=means_var).pack(anchor=tk.W, padx=10, pady=(5, 0))
+
+        range_frame = ttk.Frame(recorder_window)
+        range_frame.pack(padx=10, pady=10)
+        start_var, end_var = tk.StringVar(), tk.StringVar()
+        ttk.Label(range_frame, text="Von").pack(side=tk.LEFT, padx=2)
+        ttk.Entry(range_frame, textvariable=start_var, width=12).pack(side=tk.LEFT, padx=2)
+        ttk.Label(range_frame, text="Bis (exklusive)").pack(side=tk.LEFT, padx=2)
+        ttk.Entry(range_frame, textvariable=end_var, width=12).pack(side=tk.LEFT, padx=2)
+        ttk.Label(recorder_window, text="JJJJ-MM-TT, leer = letztes Jahr bzw. letzte 10 Tage bis jetzt" if connection
+                  else "JJJJ-MM-TT, leer = gesamter Zeitraum").pack()
+
+        def load():
+            options = {'source': source_var.get(), 'means': means_var.get(),
+                       'start': start_var.get().strip() or None, 'end': end_var.get().strip() or None}
+            if connection:
+                options['url'], options['token'] = url_var.get().strip(), token_var.get().strip()
+                if not options['url'] or not options['token']:
+                    messagebox.showwarning("Fehlende Angaben", "Bitte URL und Token eingeben.", parent=recorder_window)
+                    return
+            recorder_window.destroy()
+            on_load(options)
+
+        button_frame = ttk.Frame(recorder_window)
+        button_frame.pack(pady=10)
+        ttk.Button(button_frame, text="Verbinden" if connection else "Laden", command=load).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Abbrechen", command=recorder_window.destroy).pack(side=tk.LEFT, padx=5)
+
+    def compare_with_csv(self):
+        """Lädt einen älteren Entitäten-Export und zeigt die Unterschiede zur geladenen Datei in der Tabelle."""
+        if self.load_job is not None:
+            messagebox.showinfo("Info", "Es wird bereits eine Datei geladen.")
+            return
+        if self.df_original is None or self.current_csv_type != 'entity':
+            messagebox.showwarning("Keine Daten", "Bitte zuerst eine Entitäten-CSV laden.")
+            return
+        if self.engine.reference is not None:
+            messagebox.showinfo("Info", "Bitte zuerst den laufenden Vergleich beenden.")
+            return
+        filepath = filedialog.askopenfilename(title="Älteren Export zum Vergleich wählen", defaultextension=".csv",
+                                              filetypes=[("CSV files", "*.csv")])
+        if not filepath: return
+        self.start_loading(filepath, 'read_comparison')
+
+    def end_comparison(self):
+        """Kehrt zur geladenen Datei zurück (aus dem Parse-Cache)."""
+        if not self.data_ready or self.engine.reference is None or self.load_job is not None:
+            return
+        reader, options = self.source_request
+        self.start_loading(self.engine.filepath, reader, **options)
+
+    def start_loading(self, filepath, reader, **options):
+        """Startet die Engine-Methode 'reader' (z.B. 'read') mit (filepath, progress, cancel_event, **options) im Worker-Thread."""
+        # Parsen und Aufbereiten laufen im Worker-Thread, die Oberfläche fragt den Fortschritt per after() ab
+        self.load_queue = queue.Queue()
+        self.load_cancel_event = threading.Event()
+        self.progress_bar.config(maximum=100, value=0)
+        self.progress_label.config(text="0%")
+        self.progress_bar.master.pack(side=tk.LEFT, fill=tk.X, expand=False, padx=10)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+        self.status_label.config(text=f"⏳ Lade {os.path.basename(filepath)} ...", foreground="blue")
+        self.load_span = PERF.begin('load_csv_data', datei=os.path.basename(filepath))
+        self.load_request = (reader, options)
+
+        worker = threading.Thread(target=self._load_worker, args=(reader, filepath, self.load_queue, self.load_cancel_event, options),
+                                  daemon=True)
+        worker.start()
+        self.load_job = self.root.after(50, self._poll_load_queue)
+
+    def _load_worker(self, reader, filepath, load_queue, cancel_event, options):
+        """Läuft im Hintergrund-Thread und meldet Fortschritt und Ergebnis über die Queue."""
+        def report(done, total, phase):
+            load_queue.put(('progress', done, total, phase))
+        try:
+            # Wartet ggf. auf den Hintergrund-Import von pandas, ohne die Oberfläche zu blockieren
+            engine = self.data_import.wait()
+        except Exception as e:
+            load_queue.put(('error', e))
+            return
         try:
-            new_df = pd.read_csv(filepath, sep=separator, dtype=str, skipinitialspace=True)
-            new_df.columns = new_df.columns.str.lower().str.strip()
-            cols_to_drop = [col for col in new_df.columns if col.startswith('unnamed:')]
-            new_df.drop(columns=cols_to_drop, inplace=True, errors='ignore')
+            result = getattr(engine, reader)(filepath, progress=report, cancel_event=cancel_event, **options)
+            if result.csv_type == 'energy':
+                # matplotlib erst für die erste Energie-Ansicht, hier im Worker statt im Tk-Thread
+                load_chart_modules()
+            load_queue.put(('done', result))
+        except LoadCancelled:
+            load_queue.put(('cancelled',))
+        except Exception as e:
+            load_queue.put(('error', e))
+
+    def _poll_load_queue(self):
+        last_progress = None
+        finished = None
+        try:
+            while True:
+                message = self.load_queue.get_nowait()
+                if message[0] == 'progress':
+                    last_progress = message
+                else:
+                    finished = message
+        except queue.Empty:
+            pass
+
+        if last_progress is not None:
+            _, done, total, phase = last_progress
+            if phase == 'index':
+                self.status_label.config(text="⏳ Erstelle Suchindex ...", foreground="blue")
+            elif phase == 'aggregate':
+                self.status_label.config(text="⏳ Berechne Periodensummen ...", foreground="blue")
+            elif phase == 'recorder':
+                percent = (done / total * 100) if total else 100
+                self.progress_bar['value'] = percent
+                self.progress_label.config(text=f"{percent:.0f}%")
+                self.status_label.config(text=f"⏳ Lese Recorder-Daten ... {done} / {total}", foreground="blue")
+            else:
+                percent = (done / total * 100) if total else 100
+                self.progress_bar['value'] = percent
+                self.progress_label.config(text=f"{percent:.0f}%")
+                self.status_label.config(text=f"⏳ Lade ... {done / (1024 * 1024):.1f} / {total / (1024 * 1024):.1f} MB", foreground="blue")
+
+        if finished is None:
+            self.load_job = self.root.after(50, self._poll_load_queue)
+            return
+
+        self.load_job = None
+        self.progress_bar.master.pack_forget()
+        self.cancel_button.pack_forget()
+
+        if finished[0] == 'cancelled':
+            self.status_label.config(text="Laden abgebrochen.", foreground="black")
+        elif finished[0] == 'error':
+            e = finished[1]
+            self.status_label.config(text=f"❌ Fehler: {e}", foreground="red")
+            messagebox.showerror("Ladefehler", f"Fehler beim Laden der CSV-Datei:\n{e}")
+        else:
+            self._on_csv_loaded(finished[1])
+        # Gemessen wird vom Start bis zur fertigen Anzeige, inklusive Worker-Thread und Wartezeit der Abfrage
+        PERF.end(self.load_span, ergebnis=finished[0], zeilen=len(self.df_data) if self.df_data is not None else 0)
+        self.load_span = None
+
+    def cancel_loading(self):
+        if self.load_cancel_event is not None:
+            self.load_cancel_event.set()
+            self.status_label.config(text="⏳ Breche Laden ab ...", foreground="blue")
+
+    def _on_csv_loaded(self, result):
+        """Übernimmt das Ergebnis des Worker-Threads und zeigt die passende Ansicht an."""
+        try:
+            self.engine.apply(result)
+            if result.reference is None:
+                self.source_request = self.load_request
+
+            filename = os.path.basename(result.filepath)
+            if self.engine.loaded_from_cache:
+                filename += " (aus Cache)"
 
-            self.df_original = new_df.fillna('')
-            self.df_data = self.df_original.copy()
-            
-            filename = os.path.basename(filepath)
-            
             if self.current_csv_type == 'energy':
                 self.status_label.config(text=f"✅ Energie-CSV geladen: {filename}", foreground="green")
                 # Direkter Aufruf des Chart-Fensters
                 self.show_energy_chart_view()
+            elif result.reference is not None:
+                counts = self.engine.value_counts(engine_module.COL_CHANGE)
+                changes = ", ".join(f"{count} {label}" for label, count in counts.items() if label != engine_module.CHANGE_UNCHANGED)
+                self.status_label.config(text=f"🔀 Vergleich mit {os.path.basename(result.reference)}: {changes or 'keine Änderungen'}", foreground="green")
+                self._show_table_view()
+                self.setup_treeview(self.df_data)
             else: # entity
                 self.status_label.config(text=f"✅ Entitäten-CSV geladen: {filename} ({len(self.df_data)} Entitäten)", foreground="green")
                 # Stellt sicher, dass die Tabellenansicht angezeigt wird
@@ -419,6 +977,22 @@ class EntityAnalyzerApp:
             self.status_label.config(text=f"❌ Fehler: {e}", foreground="red")
             messagebox.showerror("Ladefehler", f"Fehler beim Laden der CSV-Datei:\n{e}")
 
+    def clear_parse_cache(self):
+        # Der Lade-Thread liest und schreibt den Cache; währenddessen nicht leeren
+        if not self.data_ready or self.load_job is not None:
+            return
+        cache = self.engine.cache
+        if cache is None: return
+        try:
+            removed, freed = cache.clear()
+            text = f"🧹 Cache geleert: {removed} Datei(en), {freed / (1024 * 1024):.1f} MB freigegeben."
+            kept_mb = cache.total_bytes() / (1024 * 1024)
+            if kept_mb:
+                text += f" {kept_mb:.1f} MB noch in Benutzung."
+            self.status_label.config(text=text, foreground="green")
+        except OSError as e:
+            self.status_label.config(text=f"❌ Cache konnte nicht geleert werden: {e}", foreground="red")
+
     def export_current_view_to_csv(self):
         if self.df_data is None or self.df_data.empty:
             self.status_label.config(text="❌ Keine Daten zum Exportieren.", foreground="red")
@@ -428,8 +1002,7 @@ class EntityAnalyzerApp:
         if not filepath: return
 
         try:
-            sep = ',' if self.current_csv_type == 'energy' else ';'
-            self.df_data.to_csv(filepath, sep=sep, index=False, encoding='utf-8')
+            self.engine.export(filepath)
             filename = os.path.basename(filepath)
             self.status_label.config(text=f"✅ Daten nach '{filename}' exportiert.", foreground="green")
             messagebox.showinfo("Export erfolgreich", f"Daten wurden nach:\n{filepath} exportiert.")
@@ -437,36 +1010,35 @@ class EntityAnalyzerApp:
             self.status_label.config(text=f"❌ Exportfehler: {e}", foreground="red")
             messagebox.showerror("Exportfehler", f"Fehler beim Speichern:\n{e}")
  
+    @PERF.timed('setup_treeview')
     def setup_treeview(self, df_to_display):
-        if not hasattr(self, 'tree'): return
+        if not hasattr(self, 'tree') or not self.tree.winfo_exists(): return
 
-        self.tree.delete(*self.tree.get_children())
         new_columns = df_to_display.columns.tolist()
-        self.tree['columns'] = new_columns
-
-        self.tree.heading("#0", text="", anchor=tk.W)
-        self.tree.column("#0", width=0, stretch=tk.NO)
-
-        for col in new_columns:
-            max_len = df_to_display[col].astype(str).str.len().max() if not df_to_display.empty else 10
-            width = max(100, min(300, int(max_len * 7.5))) # Angepasste Berechnung
-            self.tree.heading(col, text=col.upper(), command=lambda c=col: self.sort_column(c, False))
-            self.tree.column(col, width=width, anchor=tk.W)
-
-        data_to_insert = df_to_display.values.tolist()
-        for i, row in enumerate(data_to_insert):
-            tag = 'evenrow' if i % 2 == 0 else 'oddrow'
-            self.tree.insert('', tk.END, values=row, tags=(tag,))
+        # Spalten und Breiten nur neu aufbauen, wenn sich die Spalten geändert haben (z.B. neue Datei)
+        if new_columns != self.table_columns:
+            self.table_columns = new_columns
+            self.tree['columns'] = new_columns
+
+            self.tree.heading("#0", text="", anchor=tk.W)
+            self.tree.column("#0", width=0, stretch=tk.NO)
+
+            for col in new_columns:
+                # Breite aus dem Gesamtdatensatz, unabhängig von der aktuellen Ansicht
+                max_len = self.df_original[col].astype(str).str.len().max() if not self.df_original.empty else 10
+                width = max(100, min(300, int(max_len * 7.5))) # Angepasste Berechnung
+                self.tree.heading(col, text=col.upper(), command=lambda c=col: self.sort_column(c, False))
+                self.tree.column(col, width=width, anchor=tk.W)
+
+        # Nur die sichtbaren Zeilen werden eingefügt
+        self.virtual_table.set_data(df_to_display)
  
+    @PERF.timed('sort_column')
     def sort_column(self, col, reverse):
         if self.df_data is None: return
 
         try:
-            # Versuch, numerisch zu sortieren, wenn möglich
-            df_sorted = self.df_data.copy()
-            df_sorted[col] = pd.to_numeric(df_sorted[col], errors='ignore')
-            df_sorted.sort_values(by=col, ascending=not reverse, inplace=True, key=lambda x: x.astype(str).str.lower() if pd.api.types.is_string_dtype(x) else x)
-            self.df_data = df_sorted
+            self.engine.sort(col, ascending=not reverse)
             self.setup_treeview(self.df_data)
             self.tree.heading(col, command=lambda c=col: self.sort_column(c, not reverse))
             self.status_label.config(text=f"Sortiert nach '{col.upper()}'", foreground="blue")
@@ -478,23 +1050,23 @@ class EntityAnalyzerApp:
             self.root.after_cancel(self.search_job)
         self.search_job = self.root.after(300, self._perform_search)
 
+    @PERF.timed('_perform_search')
     def _perform_search(self):
         if self.df_original is None: return
 
         search_term = self.search_entry.get().strip().lower()
-        if not search_term:
-            self.reset_filter()
-            return
+        # Suche, Filter und Sortierung werden in der Engine kombiniert; ein leerer Begriff hebt nur die Suche auf
+        self.engine.search(search_term)
 
-        mask = self.df_original.apply(lambda row: row.astype(str).str.lower().str.contains(search_term).any(), axis=1)
-        self.df_data = self.df_original[mask]
-        
         self.setup_treeview(self.df_data)
-        self.status_label.config(text=f"{len(self.df_data)} Einträge für '{search_term}' gefunden.", foreground="green")
+        if search_term:
+            self.status_label.config(text=f"{len(self.df_data)} Einträge für '{search_term}' gefunden.", foreground="green")
+        else:
+            self.status_label.config(text=f"Suche aufgehoben ({len(self.df_data)} Einträge).", foreground="black")
  
     def reset_filter(self):
         if self.df_original is None: return
-        self.df_data = self.df_original.copy()
+        self.engine.reset()
         if hasattr(self, 'search_entry'):
             self.search_entry.delete(0, tk.END)
         self.setup_treeview(self.df_data)
@@ -508,7 +1080,7 @@ class EntityAnalyzerApp:
              messagebox.showinfo("Info", "Filter sind nur für Entitäten-CSVs verfügbar.")
              return
 
-        col_map = {'area': self.COL_AREA, 'platform': self.COL_PLATFORM, 'manufacturer': self.COL_MANUFACTURER}
+        col_map = {'area': engine_module.COL_AREA, 'platform': engine_module.COL_PLATFORM, 'manufacturer': engine_module.COL_MANUFACTURER}
         filter_col = col_map.get(column_key)
 
         if filter_col not in self.df_original.columns:
@@ -516,6 +1088,15 @@ class EntityAnalyzerApp:
             return
         FilterUtility.show_filter_window(self, filter_col)
 
+    def show_facet_filter_gui(self):
+        if self.df_original is None:
+            messagebox.showwarning("Keine Daten", "Bitte eine CSV-Datei laden.")
+            return
+        if self.current_csv_type != 'entity' or self.engine.facets is None:
+             messagebox.showinfo("Info", "Filter sind nur für Entitäten-CSVs verfügbar.")
+             return
+        FilterUtility.show_facet_window(self)
+
     def show_domain_stats_gui(self):
         if self.df_original is None:
             messagebox.showwarning("Keine Daten", "Bitte eine CSV-Datei laden.")
@@ -524,24 +1105,35 @@ class EntityAnalyzerApp:
              messagebox.showinfo("Info", "Statistiken sind nur für Entitäten-CSVs verfügbar.")
              return
              
-        if self.COL_ENTITY_ID not in self.df_original.columns:
-            messagebox.showerror("Fehler", f"Spalte '{self.COL_ENTITY_ID}' fehlt.")
+        if engine_module.COL_ENTITY_ID not in self.df_original.columns:
+            messagebox.showerror("Fehler", f"Spalte '{engine_module.COL_ENTITY_ID}' fehlt.")
             return
         FilterUtility.show_stats_window(self)
 
+    def show_cross_tab_gui(self):
+        if self.df_original is None:
+            messagebox.showwarning("Keine Daten", "Bitte eine CSV-Datei laden.")
+            return
+        if self.current_csv_type != 'entity' or not self.engine.stats or not self.engine.stats.tables:
+             messagebox.showinfo("Info", "Statistiken sind nur für Entitäten-CSVs verfügbar.")
+             return
+        FilterUtility.show_cross_tab_window(self)
+
     # --- Energie-Chart-spezifische Methoden ---
     def show_energy_chart_view(self):
         """Bereitet die Daten vor und zeigt die Sensorauswahl an."""
+        load_chart_modules()  # normalerweise schon beim Laden im Worker geschehen
         for widget in self.main_frame.winfo_children():
             widget.destroy()
-        # HINWEIS: Die zeitaufwändige 'melt'-Operation wird hier entfernt
-        # und erst nach der Sensorauswahl auf die gefilterten Daten angewendet.
+        # HINWEIS: Die Umformung in die Sensor x Zeit-Matrix erfolgt bereits beim Laden (EnergyStore),
+        # Diagramme greifen danach nur noch zeilenweise darauf zu.
         self.show_sensor_selection()
 
     def show_sensor_selection(self):
         """Zeigt eine Liste der verfügbaren Sensoren zur Auswahl an."""
         for widget in self.main_frame.winfo_children():
             widget.destroy()
+        self.chart_slots = {}
 
         selection_frame = ttk.Frame(self.main_frame, padding="10")
         selection_frame.pack(fill=tk.BOTH, expand=True)
@@ -563,7 +1155,7 @@ class EntityAnalyzerApp:
         self.sensor_checklist = CheckboxList(selection_frame, bg=colors['bg'])
         self.sensor_checklist.pack(fill="both", expand=True)
         
-        sensors = self.df_data['entity_id'].unique()
+        sensors = self.engine.sensor_ids()
         self.sensor_name_mapping = {s.replace('sensor.', ''): s for s in sensors}
         display_sensors = sorted(list(self.sensor_name_mapping.keys()))
         self.sensor_checklist.populate(display_sensors, colors)
@@ -583,25 +1175,14 @@ class EntityAnalyzerApp:
         else:
             self.sensor_checklist.deselect_all()
 
-    def _perform_melt_on_selection(self, selected_sensors):
-        """Führt die Transformation nur für die ausgewählten Sensoren durch."""
-        df_filtered = self.df_data[self.df_data['entity_id'].isin(selected_sensors)]
-        
-        df_melted = df_filtered.melt(id_vars=['entity_id', 'type', 'unit'], var_name='timestamp', value_name='value')
-        df_melted['timestamp'] = pd.to_datetime(df_melted['timestamp'], errors='coerce')
-        df_melted.dropna(subset=['timestamp'], inplace=True)
-        df_melted['value'] = pd.to_numeric(df_melted['value'], errors='coerce').fillna(0)
-        
-        return df_melted
-
     def plot_selected_individual(self):
         selected_short_names = self.sensor_checklist.get_selected()
         if not selected_short_names:
             messagebox.showwarning("Auswahl fehlt", "Bitte mindestens einen Sensor auswählen.")
             return
         
-        selected_sensors = [self.sensor_name_mapping[s] for s in selected_short_names]
-        self.selected_df = self._perform_melt_on_selection(selected_sensors)
+        # Die Energiedaten liegen bereits als Matrix vor, die Auswahl ist nur eine Liste von Zeilen
+        self.selected_sensors = sorted(self.sensor_name_mapping[s] for s in selected_short_names)
         self.show_chart_plots()
 
     def plot_selected_combined(self):
@@ -610,14 +1191,15 @@ class EntityAnalyzerApp:
             messagebox.showwarning("Auswahl fehlt", "Bitte mindestens einen Sensor auswählen.")
             return
 
-        selected_sensors = [self.sensor_name_mapping[s] for s in selected_short_names]
-        df_plot = self._perform_melt_on_selection(selected_sensors)
-        
-        self.show_combined_chart_view(df_plot)
+        selected_sensors = sorted(self.sensor_name_mapping[s] for s in selected_short_names)
+        self.show_combined_chart_view(selected_sensors)
 
     def show_chart_plots(self):
         for widget in self.main_frame.winfo_children():
             widget.destroy()
+        self.chart_views = {}
+        self.combined_view = None
+        self.chart_slots = {}
 
         chart_container = ttk.Frame(self.main_frame)
         chart_container.pack(fill=tk.BOTH, expand=True)
@@ -645,7 +1227,11 @@ class EntityAnalyzerApp:
 
         scrollbar = ttk.Scrollbar(chart_container, orient="vertical", command=self.chart_canvas.yview)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.chart_canvas.configure(yscrollcommand=scrollbar.set)
+
+        def on_scroll(first, last):
+            scrollbar.set(first, last)
+            self.schedule_visible_charts_update()
+        self.chart_canvas.configure(yscrollcommand=on_scroll)
 
         self.scrollable_frame = ttk.Frame(self.chart_canvas)
         self.scrollable_frame_id = self.chart_canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
@@ -654,14 +1240,24 @@ class EntityAnalyzerApp:
         self.chart_canvas.bind("<Configure>", self.on_canvas_configure)
         self.chart_canvas.bind_all("<MouseWheel>", self._on_mousewheel)
 
+        # Ein Platzhalter in Endgröße je Sensor; gerendert wird erst, wenn er in die Nähe des sichtbaren Bereichs kommt
+        self.chart_slots = {}
+        self.chart_states = {}
+        for entity in self.selected_sensors:
+            slot = ttk.Frame(self.scrollable_frame, padding=10, height=self.CHART_SLOT_HEIGHT)
+            slot.pack(fill=tk.X, expand=True, pady=10)
+            slot.pack_propagate(False)
+            self.chart_slots[entity] = slot
+
         self.redraw_charts()
 
-    def show_combined_chart_view(self, df_plot):
+    def show_combined_chart_view(self, sensors):
         """Zeigt ein einzelnes Diagramm mit mehreren Sensoren und allen Steuerelementen an."""
         for widget in self.main_frame.winfo_children():
             widget.destroy()
 
-        self.combined_df = df_plot  # Speichern für die Neuzeichnung
+        self.combined_sensors = sensors  # Speichern für die Neuzeichnung
+        self.chart_slots = {}
 
         chart_container = ttk.Frame(self.main_frame)
         chart_container.pack(fill=tk.BOTH, expand=True)
@@ -677,37 +1273,51 @@ class EntityAnalyzerApp:
             btn = ttk.Button(aggregation_frame, text=text, command=lambda p=period: self.redraw_combined_chart(p))
             btn.pack(side=tk.LEFT, padx=2)
 
+        # Zeitraum-Auswahl; Summen kommen aus den kumulierten Summen und kosten keinen Durchlauf über die Daten
+        self.combined_range = (None, None)
+        first, last = self.engine.energy_time_range()
+        range_frame = ttk.Frame(top_bar)
+        range_frame.pack(side=tk.LEFT, padx=10)
+        self.range_start_var = tk.StringVar(value=first.strftime('%Y-%m-%d') if first is not None else '')
+        self.range_end_var = tk.StringVar(value=last.strftime('%Y-%m-%d') if last is not None else '')
+        ttk.Label(range_frame, text="Von").pack(side=tk.LEFT, padx=2)
+        ttk.Entry(range_frame, textvariable=self.range_start_var, width=11).pack(side=tk.LEFT, padx=2)
+        ttk.Label(range_frame, text="Bis").pack(side=tk.LEFT, padx=2)
+        ttk.Entry(range_frame, textvariable=self.range_end_var, width=11).pack(side=tk.LEFT, padx=2)
+        ttk.Button(range_frame, text="Zeitraum anwenden", command=self.apply_combined_range).pack(side=tk.LEFT, padx=2)
+
+        ttk.Button(top_bar, text="💶 Kosten", command=self.show_cost_window).pack(side=tk.RIGHT, padx=10)
+
         self.chart_type_button_combined = ttk.Button(top_bar, text="Zu Balkendiagramm wechseln", command=self.toggle_combined_chart_type)
         self.chart_type_button_combined.pack(side=tk.RIGHT, padx=10)
 
         ttk.Button(top_bar, text="Zurück zur Sensorauswahl", command=self.show_sensor_selection).pack(side=tk.RIGHT, padx=10)
 
-        # Frame für das Diagramm selbst
+        # Frame für das Diagramm selbst; Figure und Canvas bleiben für alle Perioden/Typen bestehen
         self.combined_chart_frame = ttk.Frame(chart_container)
         self.combined_chart_frame.pack(fill=tk.BOTH, expand=True)
+        self.chart_views = {}
+        self.combined_view = ChartView(self.combined_chart_frame, self.THEME_COLORS['dark' if self.is_dark_mode else 'light'], figsize=(12, 6))
 
         self.redraw_combined_chart()
         
+    @PERF.timed('redraw_combined_chart')
     def redraw_combined_chart(self, period='original'):
-        """Zeichnet das kombinierte Diagramm neu, basierend auf Aggregation und Typ."""
-        for widget in self.combined_chart_frame.winfo_children():
-            widget.destroy()
-        
+        """Aktualisiert das kombinierte Diagramm passend zu Aggregation und Typ (ohne neue Figure)."""
         self.current_period_combined = period
-        df_to_plot = self.combined_df.copy()
-        
-        total_sum = df_to_plot['value'].sum()
-        unit = df_to_plot['unit'].iloc[0] if not df_to_plot.empty and 'unit' in df_to_plot.columns else ''
+        start, end = self.combined_range
+        totals = self.engine.energy_totals(self.combined_sensors, start, end)
 
-        fig, ax = plt.subplots(figsize=(12, 6))
-        colors = self.THEME_COLORS['dark' if self.is_dark_mode else 'light']
+        total_sum = totals.sum()
+        unit = self.engine.energy.unit_of(self.combined_sensors[0]) if self.combined_sensors else ''
 
         if period != 'original':
             # Prüfen, ob die Datenmenge für ein Balkendiagramm geeignet ist
             try:
-                first_entity = df_to_plot['entity_id'].unique()[0]
-                resampled_data = df_to_plot[df_to_plot['entity_id'] == first_entity].set_index('timestamp')['value'].resample(period).sum()
-                if len(resampled_data) > 50:
+                # Anzahl der Balken aus den vorberechneten Periodensummen, ohne erneutes Resampling
+                if not self.combined_sensors:
+                    raise IndexError
+                if self.engine.bucket_count(period) > 50:
                     self.chart_type_button_combined.config(state=tk.DISABLED)
                     self.chart_type = 'line'
                 else:
@@ -718,55 +1328,118 @@ class EntityAnalyzerApp:
              self.chart_type_button_combined.config(state=tk.DISABLED)
              self.chart_type = 'line'
 
-        # Zeichnen
+        title = f"Sensorvergleich\nGesamtsumme aller Sensoren: {total_sum:.2f} {unit}"
+        if start is not None:
+            title += f"  ({self.range_start_var.get()} bis {self.range_end_var.get()})"
         if self.chart_type == 'bar' and period != 'original':
-            df_resampled = df_to_plot.groupby('entity_id').apply(lambda x: x.set_index('timestamp')['value'].resample(period).sum()).T
-            df_resampled.plot(kind='bar', ax=ax, width=0.8)
-            
-            period_sums = df_resampled.sum(axis=1)
-            max_heights = df_resampled.max(axis=1)
-            for i, p_sum in enumerate(period_sums):
-                if pd.notna(p_sum) and p_sum != 0:
-                    y_pos = max_heights.iloc[i] if pd.notna(max_heights.iloc[i]) else 0
-                    ax.text(i, y_pos, f'{p_sum:.2f}', ha='center', va='bottom', color=colors['fg'], fontsize=9, weight='bold')
-            df_resampled.index = df_resampled.index.strftime('%Y-%m-%d %H:%M')
-
+            df_resampled = self.engine.clip_range(self.engine.energy_frame(self.combined_sensors, period), start, end)
+            self.combined_view.plot_bars(
+                df_resampled.index.strftime('%Y-%m-%d %H:%M'),
+                [(entity, df_resampled[entity].to_numpy(), self.chart_color(entity)) for entity in df_resampled.columns],
+                title, value_labels='sum', legend=True)
         else: # Liniendiagramm
-            for entity, group in df_to_plot.groupby('entity_id'):
-                sensor_sum = group['value'].sum()
-                df_plot_resampled = group.set_index('timestamp')
-                
-                if period != 'original':
-                    df_plot_resampled = df_plot_resampled['value'].resample(period).sum()
-                else:
-                    df_plot_resampled = df_plot_resampled['value']
-                
-                if not df_plot_resampled.empty:
+            series_list = []
+            entity_of_label = {}
+            for entity in self.combined_sensors:
+                sensor_sum = totals[entity]
+                series = self.engine.clip_range(self.engine.energy_series(entity, period), start, end)
+                if not series.empty:
                     label = f"{entity} ({sensor_sum:.2f} {unit})"
-                    df_plot_resampled.plot(ax=ax, label=label, marker='.', linestyle='-')
-
-        # Styling
-        fig.patch.set_facecolor(colors['bg'])
-        ax.set_facecolor(colors['tree_odd'])
-        ax.tick_params(axis='x', colors=colors['fg'], labelrotation=45)
-        ax.tick_params(axis='y', colors=colors['fg'])
-        for spine in ax.spines.values():
-            spine.set_color(colors['fg'])
-        ax.title.set_color(colors['fg'])
-        ax.xaxis.label.set_color(colors['fg'])
-        ax.yaxis.label.set_color(colors['fg'])
-        ax.legend(facecolor=colors['bg'], labelcolor=colors['fg'])
-        ax.set_title(f"Sensorvergleich\nGesamtsumme aller Sensoren: {total_sum:.2f} {unit}")
-        plt.tight_layout()
-
-        canvas = FigureCanvasTkAgg(fig, master=self.combined_chart_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
-
-        toolbar = CustomNavigationToolbar(canvas, self.combined_chart_frame)
-        toolbar.update()
-        canvas.get_tk_widget().pack(fill=tk.X)
-        plt.close(fig)
+                    entity_of_label[label] = entity
+                    series_list.append((label, plain_datetimes(series.index), series.to_numpy(), self.chart_color(entity)))
+            self.combined_view.set_zoom_source(self.zoom_source(entity_of_label.get, self.combined_range))
+            self.combined_view.plot_lines(series_list, title, legend=True)
+
+    def apply_combined_range(self):
+        """Übernimmt den Zeitraum (Von/Bis, jeweils inklusive) für Diagramm, Summen und Kosten."""
+        try:
+            start = pd.Timestamp(self.range_start_var.get().strip())
+            end = pd.Timestamp(self.range_end_var.get().strip()) + pd.Timedelta(days=1)
+        except ValueError:
+            messagebox.showerror("Ungültiger Zeitraum", "Bitte Datumsangaben im Format JJJJ-MM-TT eingeben.")
+            return
+        if end <= start:
+            messagebox.showerror("Ungültiger Zeitraum", "Das Ende muss nach dem Beginn liegen.")
+            return
+        self.combined_range = (start, end)
+        self.redraw_combined_chart(getattr(self, 'current_period_combined', 'original'))
+
+    def show_cost_window(self):
+        """Kostenrechner: Verbrauch je Tarifzone und Sensor im gewählten Zeitraum mal Preis."""
+        cost_window = tk.Toplevel(self.root)
+        cost_window.title("💶 Kostenrechner")
+        try:
+            cost_window.iconbitmap('E_A_T-logo.ico')
+        except tk.TclError:
+            pass
+        cost_window.geometry("620x600")
+        colors = self.THEME_COLORS['dark' if self.is_dark_mode else 'light']
+        cost_window.config(bg=colors['bg'])
+        unit = self.engine.energy.unit_of(self.combined_sensors[0]) if self.combined_sensors else ''
+
+        ttk.Label(cost_window, text=f"Tarifzonen (Preis je {unit or 'Einheit'})", font=("Helvetica", 10, "bold")).pack(pady=(10, 2))
+        tariff_tree = ttk.Treeview(cost_window, columns=['Von', 'Bis', 'Preis'], show='headings', height=5)
+        tariff_tree.pack(padx=10, fill=tk.X)
+        for col in ['Von', 'Bis', 'Preis']:
+            tariff_tree.heading(col, text=col)
+            tariff_tree.column(col, width=120, anchor=tk.W)
+
+        def fill_tariff():
+            tariff_tree.delete(*tariff_tree.get_children())
+            for i, zone in enumerate(self.tariff):
+                tariff_tree.insert('', tk.END, iid=str(i), values=zone, tags=('evenrow' if i % 2 == 0 else 'oddrow',))
+
+        edit_frame = ttk.Frame(cost_window)
+        edit_frame.pack(pady=5)
+        zone_vars = [tk.StringVar(value=v) for v in ('22:00', '06:00', '0.25')]
+        for text, var in zip(("Von", "Bis", "Preis"), zone_vars):
+            ttk.Label(edit_frame, text=text).pack(side=tk.LEFT, padx=2)
+            ttk.Entry(edit_frame, textvariable=var, width=8).pack(side=tk.LEFT, padx=2)
+
+        def add_zone():
+            try:
+                zone = (zone_vars[0].get().strip(), zone_vars[1].get().strip(), float(zone_vars[2].get().replace(',', '.')))
+                parse_tariff([zone])  # prüft die Uhrzeiten
+            except ValueError as e:
+                messagebox.showerror("Ungültige Tarifzone", f"Bitte Uhrzeiten als HH:MM und einen Preis angeben.\n{e}", parent=cost_window)
+                return
+            self.tariff.append(zone)
+            fill_tariff()
+
+        def remove_zone():
+            for item in sorted(tariff_tree.selection(), key=int, reverse=True):
+                del self.tariff[int(item)]
+            fill_tariff()
+
+        ttk.Button(edit_frame, text="Hinzufügen", command=add_zone).pack(side=tk.LEFT, padx=5)
+        ttk.Button(edit_frame, text="Entfernen", command=remove_zone).pack(side=tk.LEFT, padx=2)
+
+        result_columns = ['Sensor', 'Zone', 'Verbrauch', 'Preis', 'Kosten']
+        result_tree = ttk.Treeview(cost_window, columns=result_columns, show='headings')
+        for col in result_columns:
+            result_tree.heading(col, text=col)
+            result_tree.column(col, width=110 if col != 'Sensor' else 200, anchor=tk.W)
+        total_label = ttk.Label(cost_window, text="")
+
+        def calculate():
+            start, end = self.combined_range
+            costs = self.engine.energy_costs(self.combined_sensors, self.tariff, start, end)
+            result_tree.delete(*result_tree.get_children())
+            for i, row in enumerate(costs.itertuples(index=False)):
+                result_tree.insert('', tk.END, values=(row.entity_id, row.zone, f"{row.consumption:.2f} {unit}",
+                                                        f"{row.price:.4f}", f"{row.cost:.2f}"),
+                                   tags=('evenrow' if i % 2 == 0 else 'oddrow',))
+            period_text = f"{self.range_start_var.get()} bis {self.range_end_var.get()}" if start is not None else "gesamter Zeitraum"
+            total_label.config(text=f"Verbrauch: {costs['consumption'].sum():.2f} {unit}   Kosten: {costs['cost'].sum():.2f}   ({period_text})")
+
+        ttk.Button(cost_window, text="Berechnen", command=calculate).pack(pady=5)
+        result_tree.pack(padx=10, pady=5, fill=tk.BOTH, expand=True)
+        total_label.pack(pady=5)
+        for tree in (tariff_tree, result_tree):
+            tree.tag_configure('oddrow', background=colors['tree_odd'], foreground=colors['fg'])
+            tree.tag_configure('evenrow', background=colors['tree_even'], foreground=colors['fg'])
+        fill_tariff()
+        calculate()
 
     def toggle_combined_chart_type(self):
         """Schaltet den Chart-Typ für die kombinierte Ansicht um."""
@@ -804,19 +1477,19 @@ class EntityAnalyzerApp:
     def on_canvas_configure(self, event):
         if hasattr(self, 'scrollable_frame_id'):
             self.chart_canvas.itemconfig(self.scrollable_frame_id, width=event.width)
+        self.schedule_visible_charts_update()
 
+    @PERF.timed('redraw_charts')
     def redraw_charts(self, period='original'):
         """Zeichnet alle individuellen Charts basierend auf der gewählten Aggregationsperiode neu."""
-        if not hasattr(self, 'scrollable_frame') or not hasattr(self, 'selected_df'):
+        if not hasattr(self, 'scrollable_frame') or not hasattr(self, 'selected_sensors'):
             return
         
         self.current_period = period
 
         # Prüfung der Datenmenge für Balkendiagramm-Option
         if period != 'original':
-            first_entity_data = self.selected_df.groupby('entity_id').get_group(list(self.selected_df['entity_id'].unique())[0])
-            resampled_data = first_entity_data.set_index('timestamp')['value'].resample(period).sum()
-            if len(resampled_data) > 100:
+            if self.engine.bucket_count(period) > 100:
                 self.chart_type_button.config(state=tk.DISABLED)
                 if self.chart_type == 'bar': self.chart_type = 'line'
             else:
@@ -831,29 +1504,166 @@ class EntityAnalyzerApp:
         else:
             self.chart_type_button.config(text="Zu Balkendiagramm wechseln")
 
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
+        # Vorhandene Diagramme bleiben bestehen; neu gerendert wird nur, was im oder nahe am sichtbaren Bereich liegt
+        self.update_visible_charts()
+
+    def schedule_visible_charts_update(self):
+        """Bündelt Scroll- und Größenänderungen zu einer Aktualisierung der sichtbaren Diagramme."""
+        if self.chart_update_job is None and self.chart_slots:
+            self.chart_update_job = self.root.after(50, self.update_visible_charts)
+
+    def update_visible_charts(self):
+        """Rendert Diagramme im sichtbaren Bereich (plus Vorlauf) und gibt weit entfernte wieder frei."""
+        self.chart_update_job = None
+        if not self.chart_slots or not self.chart_canvas.winfo_exists():
+            return
+        self.chart_canvas.update_idletasks()
+        view_top = self.chart_canvas.canvasy(0)
+        view_height = max(self.chart_canvas.winfo_height(), self.CHART_SLOT_HEIGHT)
+        view_bottom = view_top + view_height
+        preload = view_height * self.CHART_PRELOAD_VIEWPORTS
+        evict = view_height * self.CHART_EVICT_VIEWPORTS
+        state = (getattr(self, 'current_period', 'original'), self.chart_type)
+
+        pending = []
+        for entity, slot in self.chart_slots.items():
+            top = slot.winfo_y()
+            bottom = top + self.CHART_SLOT_HEIGHT
+            if bottom >= view_top - preload and top <= view_bottom + preload:
+                if self.chart_states.get(entity) != state:
+                    pending.append(entity)
+            elif bottom < view_top - evict or top > view_bottom + evict:
+                self.evict_chart(entity)
+
+        if self.use_raster_charts:
+            self.submit_raster_charts(pending, state)
+            return
 
-        total_charts = len(self.selected_df['entity_id'].unique())
-        self.progress_bar.config(maximum=total_charts, value=0)
+        # Eine laufende Abarbeitung wird durch die neue ersetzt
+        self.chart_generation += 1
+        if not pending:
+            self.progress_bar.master.pack_forget()
+            return
+        self.progress_bar.config(maximum=len(pending), value=0)
         self.progress_label.config(text="0%")
         self.progress_bar.master.pack(side=tk.LEFT, fill=tk.X, expand=False, padx=10)
-        
-        chart_generator = self._chart_drawing_generator(period)
-        self.root.after(100, self._process_chart_generator, chart_generator)
 
-    def _chart_drawing_generator(self, period):
+        chart_generator = self._chart_drawing_generator(pending, state, self.chart_generation)
+        self.root.after(10, self._process_chart_generator, chart_generator)
+
+    def submit_raster_charts(self, entities, state):
+        """Gibt die Diagramme an den Prozess-Pool; der Tk-Thread setzt später nur noch die fertigen Bilder ein."""
+        for entity, (future, future_state) in list(self.raster_futures.items()):
+            if future_state != state:
+                future.cancel()
+                del self.raster_futures[entity]
+        entities = [e for e in entities if e not in self.raster_futures]
+        if not entities:
+            return
+        if self.chart_pool is None:
+            # Erst hier importiert: multiprocessing wird für den Start nicht gebraucht
+            from concurrent.futures import ProcessPoolExecutor
+            self.chart_pool = ProcessPoolExecutor()
+
+        colors = self.THEME_COLORS['dark' if self.is_dark_mode else 'light']
+        period, _ = state
+        width = max(self.chart_canvas.winfo_width() - 20, 400)
+        size = (width, self.CHART_SLOT_HEIGHT - 20)
+        for entity in entities:
+            series = self.engine.energy_series(entity, period)
+            if series.empty or series.isnull().all():
+                self.create_chart_for_entity(entity, series, self.engine.energy.unit_of(entity))
+                self.chart_states[entity] = state
+                continue
+            kind, plot_args = self.chart_plot_args(entity, series, self.engine.energy.unit_of(entity))
+            future = self.chart_pool.submit(render_chart_png, colors, size, kind, plot_args)
+            self.raster_futures[entity] = (future, state)
+
+        self.progress_bar.config(maximum=len(self.raster_futures), value=0)
+        self.progress_label.config(text="0%")
+        self.progress_bar.master.pack(side=tk.LEFT, fill=tk.X, expand=False, padx=10)
+        if self.raster_poll_job is None:
+            self.raster_poll_job = self.root.after(50, self._poll_raster_charts)
+
+    def _poll_raster_charts(self):
+        """Setzt fertig gerenderte Bilder in ihre Platzhalter ein."""
+        self.raster_poll_job = None
+        for entity, (future, state) in list(self.raster_futures.items()):
+            if not future.done():
+                continue
+            del self.raster_futures[entity]
+            slot = self.chart_slots.get(entity)
+            if future.cancelled() or slot is None or not slot.winfo_exists():
+                continue
+            if state != (getattr(self, 'current_period', 'original'), self.chart_type):
+                continue
+            try:
+                png = future.result()
+            except Exception as e:
+                self.status_label.config(text=f"Diagramm für {entity} konnte nicht gerendert werden: {e}")
+                continue
+            self.place_chart_image(entity, png)
+            self.chart_states[entity] = state
+            self.progress_bar['value'] += 1
+            percent = (self.progress_bar['value'] / self.progress_bar['maximum']) * 100
+            self.progress_label.config(text=f"{percent:.0f}%")
+
+        if self.raster_futures:
+            self.raster_poll_job = self.root.after(50, self._poll_raster_charts)
+        else:
+            self.progress_bar.master.pack_forget()
+
+    def place_chart_image(self, entity_id, png):
+        """Zeigt ein gerastertes Diagramm; ein Klick ersetzt es durch ein interaktives."""
+        view = self.chart_views.pop(entity_id, None)
+        if view is not None:
+            view.destroy()
+        slot = self.chart_slots[entity_id]
+        for widget in slot.winfo_children():
+            widget.destroy()
+        image = tk.PhotoImage(data=base64.b64encode(png).decode('ascii'))
+        label = ttk.Label(slot, image=image, cursor='hand2')
+        label.image = image  # Referenz halten, sonst räumt Tk das Bild ab
+        label.pack(fill=tk.BOTH, expand=True)
+        label.bind("<Button-1>", lambda e, entity=entity_id: self.make_chart_interactive(entity))
+
+    def make_chart_interactive(self, entity_id):
+        """Ersetzt das Bild eines Sensors durch eine ChartView mit Toolbar (Zoom, Pan, Speichern)."""
+        slot = self.chart_slots.get(entity_id)
+        if slot is None or not slot.winfo_exists():
+            return
+        for widget in slot.winfo_children():
+            widget.destroy()
+        period = getattr(self, 'current_period', 'original')
+        series = self.engine.energy_series(entity_id, period)
+        self.create_chart_for_entity(entity_id, series, self.engine.energy.unit_of(entity_id))
+        self.chart_states[entity_id] = (period, self.chart_type)
+
+    def evict_chart(self, entity_id):
+        """Ersetzt ein gerendertes Diagramm wieder durch seinen (gleich hohen) Platzhalter."""
+        if entity_id not in self.chart_states:
+            return
+        del self.chart_states[entity_id]
+        view = self.chart_views.pop(entity_id, None)
+        if view is not None:
+            view.destroy()
+        slot = self.chart_slots.get(entity_id)
+        if slot is not None and slot.winfo_exists():
+            for widget in slot.winfo_children():
+                widget.destroy()
+
+    def _chart_drawing_generator(self, entities, state, generation):
         """Generator, der jedes Diagramm einzeln erstellt und 'yield'ed."""
-        for entity, group in self.selected_df.groupby('entity_id'):
-            df_plot = group.set_index('timestamp')
-            
-            if period != 'original':
-                df_plot = df_plot['value'].resample(period).sum().reset_index()
-                df_plot['unit'] = group['unit'].iloc[0] if not group.empty else ''
-            else:
-                df_plot = df_plot.reset_index()
-            
-            self.create_chart_for_entity(entity, df_plot)
+        period, _ = state
+        for entity in entities:
+            if generation != self.chart_generation:
+                return
+            slot = self.chart_slots.get(entity)
+            if slot is None or not slot.winfo_exists():
+                continue
+            series = self.engine.energy_series(entity, period)
+            self.create_chart_for_entity(entity, series, self.engine.energy.unit_of(entity))
+            self.chart_states[entity] = state
             yield
 
     def _process_chart_generator(self, generator):
@@ -867,71 +1677,72 @@ class EntityAnalyzerApp:
         except StopIteration:
             self.progress_bar.master.pack_forget()
 
-    def create_chart_for_entity(self, entity_id, df_group):
-        """Erstellt ein Matplotlib-Chart für eine einzelne Entität und fügt es dem scrollbaren Frame hinzu."""
-        fig_frame = ttk.Frame(self.scrollable_frame, padding=10)
-        fig_frame.pack(fill=tk.X, expand=True, pady=10)
-
-        df_plot = df_group.copy()
-        df_plot['timestamp'] = pd.to_datetime(df_plot['timestamp'])
-        df_plot.set_index('timestamp', inplace=True)
-
-        if df_plot.empty or df_plot['value'].isnull().all():
-            ttk.Label(fig_frame, text=f"{entity_id}: Keine plotbaren Daten.").pack()
+    CHART_SLOT_HEIGHT = 470  # Höhe eines Einzeldiagramms samt Toolbar und Innenabstand in Pixeln
+    CHART_PRELOAD_VIEWPORTS = 1  # so viele Bildschirmhöhen ober-/unterhalb werden vorab gerendert
+    CHART_EVICT_VIEWPORTS = 3  # weiter entfernte Diagramme werden wieder zu Platzhaltern
+    CHART_COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
+
+    def chart_color(self, entity_id):
+        """Feste Farbe je Sensor, damit Periodenwechsel die Diagramme nicht umfärben."""
+        if entity_id not in self.entity_colors:
+            self.entity_colors[entity_id] = self.CHART_COLORS[len(self.entity_colors) % len(self.CHART_COLORS)]
+        return self.entity_colors[entity_id]
+
+    def live_chart_views(self):
+        """Alle noch angezeigten ChartViews (Einzel- und kombinierte Ansicht)."""
+        views = list(self.chart_views.values())
+        if self.combined_view is not None:
+            views.append(self.combined_view)
+        return [view for view in views if view is not None and view.exists()]
+
+    @PERF.timed('create_chart_for_entity')
+    def create_chart_for_entity(self, entity_id, series, unit):
+        """Zeigt das Diagramm einer Entität; ein bereits vorhandenes Diagramm wird nur aktualisiert."""
+        colors = self.THEME_COLORS['dark' if self.is_dark_mode else 'light']
+        slot = self.chart_slots[entity_id]
+        if series.empty or series.isnull().all():
+            if not slot.winfo_children():
+                ttk.Label(slot, text=f"{entity_id}: Keine plotbaren Daten.").pack()
             return
 
-        total_sum = df_plot['value'].sum()
-        unit = df_plot['unit'].iloc[0] if not df_plot.empty and 'unit' in df_plot.columns else ''
-        
-        fig, ax = plt.subplots(figsize=(10, 4))
-        colors = self.THEME_COLORS['dark' if self.is_dark_mode else 'light']
-        color_choices = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
-        random_color = random.choice(color_choices)
+        view = self.chart_views.get(entity_id)
+        if view is None:
+            view = self.chart_views[entity_id] = ChartView(slot, colors, figsize=(10, 4))
+            view.set_zoom_source(self.zoom_source(lambda label: label))
 
-        if self.chart_type == 'line':
-            df_plot['value'].plot(kind='line', ax=ax, marker='.', linestyle='-', color=random_color)
-            if len(df_plot) < 50:  # Nur Werte bei wenigen Datenpunkten anzeigen
-                for index, value in df_plot['value'].items():
-                    ax.text(index, value, f' {value:.2f}', color=colors['fg'], va='bottom', ha='center', fontsize=8)
+        kind, plot_args = self.chart_plot_args(entity_id, series, unit)
+        if kind == 'line':
+            view.plot_lines(**plot_args)
         else:
-            # Für Balkendiagramme Zeitstempel in Strings umwandeln
-            df_plot.index = df_plot.index.strftime('%Y-%m-%d %H:%M')
-            bars = df_plot['value'].plot(kind='bar', ax=ax, color=random_color, width=0.8)
-            for bar in bars.patches:
-                yval = bar.get_height()
-                ax.text(bar.get_x() + bar.get_width()/2.0, yval, f'{yval:.2f}', ha='center', va='bottom', color=colors['fg'], fontsize=8)
-
-        # Styling
-        fig.patch.set_facecolor(colors['bg'])
-        ax.set_facecolor(colors['tree_odd'])
-        ax.tick_params(axis='x', colors=colors['fg'], labelrotation=45)
-        ax.tick_params(axis='y', colors=colors['fg'])
-        for spine in ax.spines.values():
-            spine.set_color(colors['fg'])
-        ax.title.set_color(colors['fg'])
-        ax.xaxis.label.set_color(colors['fg'])
-        ax.yaxis.label.set_color(colors['fg'])
-
-        ax.set_title(f"Verlauf für: {entity_id}\nGesamtsumme: {total_sum:.2f} {unit}")
-        ax.set_ylabel(unit)
-        ax.set_xlabel("Zeitstempel")
-        plt.tight_layout()
-
-        canvas = FigureCanvasTkAgg(fig, master=fig_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
-
-        toolbar = CustomNavigationToolbar(canvas, fig_frame)
-        toolbar.update()
-        canvas.get_tk_widget().pack(fill=tk.X)
-        
-        plt.close(fig)
+            view.plot_bars(**plot_args)
+
+    def zoom_source(self, entity_of_label, limits=(None, None)):
+        """Datenquelle für Zoom/Pan: holt das sichtbare Fenster in einer zur Breite passenden Auflösung."""
+        def source(label, start, end, max_points):
+            _, series = self.engine.energy_window(entity_of_label(label), start, end, max_points)
+            series = self.engine.clip_range(series, *limits)
+            return plain_datetimes(series.index), series.to_numpy()
+        return source
+
+    def chart_plot_args(self, entity_id, series, unit):
+        """(Typ, Argumente) für ChartView.plot_lines/plot_bars; gleich für interaktive und gerasterte Diagramme."""
+        total_sum = self.engine.energy_totals([entity_id])[entity_id]
+        title = f"Verlauf für: {entity_id}\nGesamtsumme: {total_sum:.2f} {unit}"
+        color = self.chart_color(entity_id)
+        if self.chart_type == 'line':
+            # Nur Werte bei wenigen Datenpunkten anzeigen
+            return 'line', dict(series_list=[(entity_id, plain_datetimes(series.index), series.to_numpy(), color)], title=title,
+                                xlabel="Zeitstempel", ylabel=unit, value_labels=len(series) < 50)
+        # Für Balkendiagramme Zeitstempel als Kategorien
+        return 'bar', dict(categories=list(series.index.strftime('%Y-%m-%d %H:%M')),
+                           series_list=[(entity_id, series.to_numpy(), color)], title=title,
+                           xlabel="Zeitstempel", ylabel=unit, value_labels='each')
 
 
 class FilterUtility:
     @staticmethod
     def show_filter_window(app, filter_col):
-        unique_values = sorted(app.df_original[filter_col].unique().tolist(), key=str.lower)
+        unique_values = app.engine.unique_values(filter_col)
         filter_window = tk.Toplevel(app.root)
         filter_window.title(f"Filtern nach {filter_col.replace('_', ' ').title()}")
         try:
@@ -945,7 +1756,7 @@ class FilterUtility:
         listbox = tk.Listbox(filter_window, selectmode=tk.SINGLE, width=40, bg=colors['tree_even'], fg=colors['fg'], selectbackground=colors['tree_odd'], selectforeground=colors['fg'])
         listbox.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
 
-        if '' in app.df_original[filter_col].unique():
+        if '' in unique_values:
             listbox.insert(tk.END, "— KEIN WERT —")
         
         for val in unique_values:
@@ -955,7 +1766,7 @@ class FilterUtility:
             try:
                 selected_value = listbox.get(listbox.curselection()[0])
                 filter_value = '' if selected_value == "— KEIN WERT —" else selected_value
-                app.df_data = app.df_original[app.df_original[filter_col] == filter_value].copy()
+                app.engine.filter(filter_col, filter_value)
                 app.status_label.config(text=f"Gefiltert nach '{selected_value}' ({len(app.df_data)} Entitäten)", foreground="green")
                 app.setup_treeview(app.df_data)
                 filter_window.destroy()
@@ -964,11 +1775,148 @@ class FilterUtility:
 
         ttk.Button(filter_window, text="Filter anwenden", command=apply_filter).pack(pady=10)
 
+    @staticmethod
+    def show_facet_window(app):
+        """Mehrfachauswahl je Facette (ODER), UND zwischen den Facetten; Trefferzahlen aktualisieren sich live."""
+        facet_window = tk.Toplevel(app.root)
+        facet_window.title("🧩 Facettenfilter")
+        try:
+            facet_window.iconbitmap('E_A_T-logo.ico')
+        except tk.TclError:
+            pass
+        facet_window.geometry("1100x500")
+        colors = app.THEME_COLORS['dark' if app.is_dark_mode else 'light']
+        facet_window.config(bg=colors['bg'])
+
+        columns = app.engine.facets.columns
+        lists_frame = ttk.Frame(facet_window)
+        lists_frame.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
+        listboxes, values = {}, {}
+        for col in columns:
+            frame = ttk.LabelFrame(lists_frame, text=col.replace('_', ' ').title())
+            frame.pack(side=tk.LEFT, padx=4, fill=tk.BOTH, expand=True)
+            listbox = tk.Listbox(frame, selectmode=tk.MULTIPLE, exportselection=False, bg=colors['tree_even'], fg=colors['fg'],
+                                 selectbackground=colors['tree_odd'], selectforeground=colors['fg'])
+            scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=listbox.yview)
+            listbox.configure(yscrollcommand=scrollbar.set)
+            scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+            listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+            listboxes[col] = listbox
+            values[col] = app.engine.unique_values(col)
+
+        count_label = ttk.Label(facet_window, text="")
+        count_label.pack(pady=2)
+
+        def refresh():
+            counts = app.engine.facet_counts()
+            for col, listbox in listboxes.items():
+                selected = set(app.engine.filters.get(col, ()))
+                top = listbox.yview()[0]
+                listbox.delete(0, tk.END)
+                for i, val in enumerate(values[col]):
+                    listbox.insert(tk.END, f"{val or '— KEIN WERT —'} ({counts[col].get(val, 0)})")
+                    if val in selected:
+                        listbox.selection_set(i)
+                listbox.yview_moveto(top)
+            count_label.config(text=f"{len(app.df_data)} Entitäten")
+
+        def on_select(col):
+            app.engine.set_facet(col, [values[col][i] for i in listboxes[col].curselection()])
+            app.setup_treeview(app.df_data)
+            app.status_label.config(text=f"Facettenfilter: {len(app.df_data)} Entitäten", foreground="green")
+            refresh()
+
+        def clear_facets():
+            app.engine.clear_filters(columns)
+            app.setup_treeview(app.df_data)
+            app.status_label.config(text="Facettenfilter zurückgesetzt.", foreground="black")
+            refresh()
+
+        for col, listbox in listboxes.items():
+            listbox.bind('<<ListboxSelect>>', lambda event, c=col: on_select(c))
+        # Suchbegriff oder Einzelfilter können sich im Hauptfenster geändert haben
+        facet_window.bind('<FocusIn>', lambda event: refresh() if event.widget is facet_window else None)
+
+        button_frame = ttk.Frame(facet_window)
+        button_frame.pack(pady=10)
+        ttk.Button(button_frame, text="Facetten zurücksetzen", command=clear_facets).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Schließen", command=facet_window.destroy).pack(side=tk.LEFT, padx=5)
+        refresh()
+
+    # Ab so vielen Spalten wird eine Kreuztabelle als Liste statt als Matrix angezeigt
+    CROSS_TAB_MAX_COLUMNS = 40
+
+    @staticmethod
+    def show_cross_tab_window(app):
+        """Vorberechnete Kreuztabellen; zählt wahlweise nur die Zeilen der aktuellen Ansicht (Suche und Filter)."""
+        cross_window = tk.Toplevel(app.root)
+        cross_window.title("📊 Kreuztabellen")
+        try:
+            cross_window.iconbitmap('E_A_T-logo.ico')
+        except tk.TclError:
+            pass
+        cross_window.geometry("900x550")
+        colors = app.THEME_COLORS['dark' if app.is_dark_mode else 'light']
+        cross_window.config(bg=colors['bg'])
+
+        titles = app.engine.stats.titles()
+        keys = list(titles)
+        top_frame = ttk.Frame(cross_window)
+        top_frame.pack(padx=10, pady=10, fill=tk.X)
+        table_var = tk.StringVar(value=titles[keys[0]])
+        view_only_var = tk.BooleanVar(value=True)
+        layout_var = tk.StringVar(value='matrix')
+        ttk.Combobox(top_frame, textvariable=table_var, values=[titles[k] for k in keys], state='readonly', width=30).pack(side=tk.LEFT)
+        view_check = ttk.Checkbutton(top_frame, variable=view_only_var)
+        view_check.pack(side=tk.LEFT, padx=10)
+        ttk.Radiobutton(top_frame, text="Matrix", variable=layout_var, value='matrix').pack(side=tk.LEFT, padx=2)
+        ttk.Radiobutton(top_frame, text="Liste", variable=layout_var, value='list').pack(side=tk.LEFT, padx=2)
+
+        tree_frame = ttk.Frame(cross_window)
+        tree_frame.pack(padx=10, pady=5, fill=tk.BOTH, expand=True)
+        stats_tree = ttk.Treeview(tree_frame, show='headings')
+        y_scroll = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=stats_tree.yview)
+        x_scroll = ttk.Scrollbar(tree_frame, orient=tk.HORIZONTAL, command=stats_tree.xview)
+        stats_tree.configure(yscrollcommand=y_scroll.set, xscrollcommand=x_scroll.set)
+        y_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        x_scroll.pack(side=tk.BOTTOM, fill=tk.X)
+        stats_tree.pack(fill=tk.BOTH, expand=True)
+        stats_tree.tag_configure('oddrow', background=colors['tree_odd'], foreground=colors['fg'])
+        stats_tree.tag_configure('evenrow', background=colors['tree_even'], foreground=colors['fg'])
+        info_label = ttk.Label(cross_window, text="")
+        info_label.pack(pady=5)
+
+        def refresh(*_):
+            key = keys[[titles[k] for k in keys].index(table_var.get())]
+            view_check.config(text=f"Nur aktuelle Ansicht ({len(app.df_data)} Entitäten)")
+            result = app.engine.cross_tab(key, view_only=view_only_var.get(), pivot=layout_var.get() == 'matrix')
+            note = ""
+            if layout_var.get() == 'matrix' and len(result.columns) > FilterUtility.CROSS_TAB_MAX_COLUMNS:
+                result = app.engine.cross_tab(key, view_only=view_only_var.get(), pivot=False)
+                note = " (zu viele Spalten für die Matrix, als Liste angezeigt)"
+            if layout_var.get() == 'matrix' and not note:
+                result = result.reset_index(names=titles[key])
+            columns = [str(col) or "— KEIN WERT —" for col in result.columns]
+            stats_tree.delete(*stats_tree.get_children())
+            stats_tree.configure(columns=columns)
+            for i, col in enumerate(columns):
+                stats_tree.heading(col, text=col)
+                stats_tree.column(col, width=180 if i == 0 else 100, anchor=tk.W if i == 0 else tk.E, stretch=False)
+            for i, row in enumerate(result.itertuples(index=False)):
+                values = [value if value != '' else "— KEIN WERT —" for value in row]
+                stats_tree.insert('', tk.END, values=values, tags=('evenrow' if i % 2 == 0 else 'oddrow',))
+            info_label.config(text=f"{len(result)} Zeilen{note}")
+
+        table_var.trace_add('write', refresh)
+        view_only_var.trace_add('write', refresh)
+        layout_var.trace_add('write', refresh)
+        # Suche und Filter können sich im Hauptfenster geändert haben
+        cross_window.bind('<FocusIn>', lambda event: refresh() if event.widget is cross_window else None)
+        refresh()
+
     @staticmethod
     def show_stats_window(app):
-        domain_counts = app.df_original[app.COL_ENTITY_ID].str.split('.', n=1).str[0].value_counts()
-        stats_df = domain_counts.reset_index()
-        stats_df.columns = ['Entitätstyp (Domain)', 'Anzahl']
+        stats_df = app.engine.domain_stats()
         stats_window = tk.Toplevel(app.root)
         stats_window.title("📊 Entitäts-Statistik")
         try:
@@ -987,10 +1935,50 @@ class FilterUtility:
         for i, row in stats_df.iterrows():
             tag = 'evenrow' if i % 2 == 0 else 'oddrow'
             stats_tree.insert('', tk.END, values=row.tolist(), tags=(tag,))
-        ttk.Label(stats_window, text=f"Gesamtanzahl eindeutiger Typen: {len(domain_counts)}").pack(pady=5)
+        ttk.Label(stats_window, text=f"Gesamtanzahl eindeutiger Typen: {len(stats_df)}").pack(pady=5)
 
-if __name__ == "__main__":
+def run_startup_probe(path):
+    """Ein Probe-Lauf für --measure-startup: Fenster öffnen, pandas und matplotlib laden, Marken schreiben."""
     root = tk.Tk()
     app = EntityAnalyzerApp(root)
+
+    def finish():
+        if 'window' not in startup.MARKS or not app.data_import.ready():
+            root.after(20, finish)
+            return
+        app.data_import.wait()
+        load_chart_modules()  # entspricht der ersten Energie-Ansicht
+        startup.write_probe(path)
+        root.destroy()
+
+    root.after(20, finish)
     root.mainloop()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='entity_analyzer_tool', description='Home Assistant Entity Analyzer Tool')
+    parser.add_argument('--measure-startup', action='store_true',
+                        help='Startzeit messen (startet das Tool mehrfach) statt die Oberfläche zu öffnen')
+    parser.add_argument('--runs', type=int, default=5, help='Anzahl der Starts für --measure-startup')
+    parser.add_argument('-o', '--output', help='JSON-Ergebnisdatei für --measure-startup')
+    parser.add_argument('--compare', metavar='BASELINE', help='Früheres Ergebnis (JSON) von --measure-startup zum Vergleich')
+    parser.add_argument('--startup-probe', metavar='JSON', help=argparse.SUPPRESS)
+    return parser
+
+
+if __name__ == "__main__":
+    # Im PyInstaller-Build startet ein Pool-Worker (spawn unter Windows/macOS) die exe erneut;
+    # freeze_support() macht ihn dort zum Worker, statt ein weiteres Fenster zu öffnen
+    multiprocessing.freeze_support()
+    # parse_known_args: macOS übergibt beim Start aus dem Finder teils eigene Argumente
+    args, _ = build_parser().parse_known_args()
+    if args.measure_startup:
+        startup.measure_startup(args.runs, args.output, args.compare)
+    elif args.startup_probe:
+        run_startup_probe(args.startup_probe)
+    else:
+        root = tk.Tk()
+        app = EntityAnalyzerApp(root)
+        root.mainloop()
+        app.shutdown_chart_pool()
  
\ No newline at end of file
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.generate_data import write_energy, write_entities
+
+# Kleine Testdaten aus dem Generator der Benchmarks; gleicher 'seed' ergibt dieselben Dateien
+ENTITY_ROWS = 500
+ENERGY_SENSORS = 4
+ENERGY_HOURS = 24 * 70
+
+
+@pytest.fixture(scope='session')
+def entities_csv(tmp_path_factory):
+    return write_entities(str(tmp_path_factory.mktemp('entities') / 'hass_entities.csv'), ENTITY_ROWS, seed=1)
+
+
+@pytest.fixture(scope='session')
+def energy_csv(tmp_path_factory):
+    return write_energy(str(tmp_path_factory.mktemp('energy') / 'energy.csv'), ENERGY_SENSORS, ENERGY_HOURS, seed=1)
@@ -0,0 +1,77 @@
+import os
+import shutil
+
+import pandas as pd
+
+from entity_analyzer_cache import ParseCache
+from entity_analyzer_engine import AnalysisEngine
+
+
+def load(path, cache_dir):
+    engine = AnalysisEngine(cache=ParseCache(str(cache_dir)))
+    engine.load(str(path))
+    return engine
+
+
+def test_round_trip_returns_same_frame(entities_csv, tmp_path):
+    first = load(entities_csv, tmp_path / 'cache')
+    second = load(entities_csv, tmp_path / 'cache')
+    assert not first.loaded_from_cache
+    assert second.loaded_from_cache
+    pd.testing.assert_frame_equal(first.df_original.astype(str), second.df_original.astype(str))
+
+
+def test_energy_round_trip(energy_csv, tmp_path):
+    first = load(energy_csv, tmp_path / 'cache')
+    second = load(energy_csv, tmp_path / 'cache')
+    assert second.loaded_from_cache
+    pd.testing.assert_frame_equal(first.energy.frame(first.sensor_ids()), second.energy.frame(second.sensor_ids()))
+
+
+def test_changed_file_is_parsed_again(entities_csv, tmp_path):
+    path = tmp_path / 'hass_entities.csv'
+    shutil.copy(entities_csv, path)
+    load(path, tmp_path / 'cache')
+
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write("light.neu;Neues Licht;;;;hue;on;on;;;;;\n")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    engine = load(path, tmp_path / 'cache')
+    assert not engine.loaded_from_cache
+    assert 'light.neu' in set(engine.df_original['entity id'])
+
+
+def test_touched_file_keeps_cache(entities_csv, tmp_path):
+    # Nur die mtime ändert sich: der Inhalts-Hash ist gleich, der Cache bleibt gültig
+    path = tmp_path / 'hass_entities.csv'
+    shutil.copy(entities_csv, path)
+    load(path, tmp_path / 'cache')
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert load(path, tmp_path / 'cache').loaded_from_cache
+
+
+def test_clear_keeps_files_that_cannot_be_removed(energy_csv, tmp_path, monkeypatch):
+    # Unter Windows lassen sich per Memory-Map geöffnete .npy nicht löschen
+    cache = ParseCache(str(tmp_path / 'cache'))
+    load(energy_csv, tmp_path / 'cache')
+    remove = os.remove
+
+    def locked(path):
+        if path.endswith('.npy'):
+            raise PermissionError(path)
+        remove(path)
+
+    monkeypatch.setattr(os, 'remove', locked)
+    total = cache.total_bytes()
+    removed, freed = cache.clear()
+    kept = [name for name in os.listdir(tmp_path / 'cache') if name.endswith('.npy')]
+    assert removed == 0 and kept
+    assert cache.total_bytes() == sum(os.path.getsize(tmp_path / 'cache' / name) for name in kept)
+    assert freed == total - cache.total_bytes()
+
+    monkeypatch.setattr(os, 'remove', remove)
+    assert cache.clear()[0] == 1
+    assert cache.total_bytes() == 0
+    assert not [name for name in os.listdir(tmp_path / 'cache') if name.endswith('.npy')]
@@ -0,0 +1,49 @@
+import pytest
+
+from benchmarks.generate_data import generate_entities
+from entity_analyzer_engine import (CHANGE_ADDED, CHANGE_OTHER, CHANGE_REMOVED, CHANGE_UNCHANGED, COL_CHANGE,
+                                    COL_CHANGE_DETAILS, clean_frame, diff_entities)
+
+
+@pytest.fixture
+def reference():
+    return clean_frame(generate_entities(20, seed=3))
+
+
+def labels(diff):
+    return dict(zip(diff['entity id'], diff[COL_CHANGE]))
+
+
+def test_identical_exports_are_unchanged(reference):
+    diff = diff_entities(reference.copy(), reference)
+    assert set(diff[COL_CHANGE]) == {CHANGE_UNCHANGED}
+
+
+def test_rename_is_labelled_renamed(reference):
+    current = reference.copy()
+    entity_id = current.loc[0, 'entity id']
+    current.loc[0, 'entity name'] = 'Neuer Name'
+    diff = diff_entities(current, reference)
+    assert labels(diff)[entity_id] == 'umbenannt'
+    assert diff.loc[diff['entity id'] == entity_id, COL_CHANGE_DETAILS].item().endswith('→ Neuer Name')
+
+
+def test_labels_per_column(reference):
+    current = reference.copy()
+    ids = list(current['entity id'])
+    current.loc[1, 'area'] = 'Irgendwo'
+    current.loc[2, 'state'] = 'kaputt'
+    current.loc[3, 'sw version'] = '9.9.9'
+    current.loc[4, 'entity name'] = 'Anders'
+    current.loc[4, 'state'] = 'kaputt'
+    current = current.drop(index=5)
+    current.loc[len(reference)] = reference.iloc[6].copy()
+    current.loc[len(reference), 'entity id'] = 'light.neu'
+
+    found = labels(diff_entities(current, reference))
+    assert found[ids[1]] == 'Area geändert'
+    assert found[ids[2]] == 'State geändert'
+    assert found[ids[3]] == CHANGE_OTHER
+    assert found[ids[4]] == 'umbenannt, State geändert'
+    assert found[ids[5]] == CHANGE_REMOVED
+    assert found['light.neu'] == CHANGE_ADDED
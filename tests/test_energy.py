@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from entity_analyzer_engine import AGGREGATION_RULES, AnalysisEngine
+
+
+@pytest.fixture(scope='module')
+def engine(energy_csv):
+    engine = AnalysisEngine()
+    assert engine.load(energy_csv) == 'energy'
+    return engine
+
+
+@pytest.fixture(scope='module')
+def raw(engine):
+    """Rohwerte (Zeitstempel x Sensor) als float64, wie sie ohne Vorberechnung summiert würden."""
+    return engine.energy.frame(engine.sensor_ids()).astype(np.float64)
+
+
+@pytest.mark.parametrize('period', sorted(AGGREGATION_RULES))
+def test_pyramid_matches_resample(engine, raw, period):
+    expected = raw.resample(AGGREGATION_RULES[period]).sum()
+    result = engine.energy_frame(engine.sensor_ids(), period)
+    assert engine._pyramid_for(period) is not None
+    np.testing.assert_allclose(result.to_numpy(dtype=np.float64), expected.to_numpy(), rtol=1e-5)
+    assert list(result.index) == list(expected.index)
+
+
+@pytest.mark.parametrize('start, end', [
+    (None, None),
+    ('2024-01-03 05:00', '2024-02-10 17:00'),
+    ('2024-01-31 23:00', '2024-02-01 01:00'),
+    ('2024-03-01', None),
+])
+def test_range_totals_match_slice_sum(engine, raw, start, end):
+    wall = raw.index.tz_localize(None)
+    inside = np.ones(len(raw), dtype=bool)
+    if start is not None:
+        start = pd.Timestamp(start)
+        inside &= wall >= start
+    if end is not None:
+        end = pd.Timestamp(end)
+        inside &= wall < end
+    expected = raw[inside].sum()
+    totals = engine.energy_totals(engine.sensor_ids(), start, end)
+    np.testing.assert_allclose(totals.to_numpy(), expected.to_numpy(), rtol=1e-6)
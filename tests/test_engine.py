@@ -0,0 +1,70 @@
+import pandas as pd
+import pytest
+
+from benchmarks.generate_data import generate_entities
+from entity_analyzer_engine import COL_AREA, AnalysisEngine
+
+
+@pytest.fixture
+def engine(entities_csv):
+    engine = AnalysisEngine()
+    assert engine.load(entities_csv) == 'entity'
+    return engine
+
+
+@pytest.fixture(scope='module')
+def reference(entities_csv):
+    """Die Datei, wie pandas sie ohne Engine liest (Spalten kleingeschrieben, leere Felder als '')."""
+    df = pd.read_csv(entities_csv, sep=';', dtype=str, keep_default_na=False)
+    df.columns = [col.lower() for col in df.columns]
+    return df
+
+
+def view_frame(engine):
+    return engine.view.to_frame().astype(str).reset_index(drop=True)
+
+
+def test_load_matches_pandas(engine, reference):
+    loaded = engine.df_original.astype(str)
+    assert list(loaded.columns) == list(reference.columns)
+    pd.testing.assert_frame_equal(loaded.reset_index(drop=True), reference)
+
+
+def test_search_matches_substring_over_all_columns(engine, reference):
+    engine.search('Licht')
+    hits = reference.apply(lambda col: col.str.lower().str.contains('licht', regex=False)).any(axis=1)
+    assert len(engine.view) > 0
+    pd.testing.assert_frame_equal(view_frame(engine), reference[hits].reset_index(drop=True))
+
+
+def test_filter_matches_equality(engine, reference):
+    area = next(value for value in reference[COL_AREA] if value)
+    engine.filter(COL_AREA, area)
+    pd.testing.assert_frame_equal(view_frame(engine), reference[reference[COL_AREA] == area].reset_index(drop=True))
+
+
+def test_sort_text_ignores_case(engine, reference):
+    engine.sort('entity name', ascending=True)
+    assert list(view_frame(engine)['entity name']) == sorted(reference['entity name'], key=str.casefold)
+
+
+def test_sort_numeric_column(tmp_path):
+    # Sind alle nicht leeren Werte Zahlen, wird numerisch sortiert (leere Werte ans Ende)
+    df = generate_entities(6, seed=2)
+    df['STATE'] = ['10', '9', '', '100', '-1.5', '2']
+    path = tmp_path / 'numeric.csv'
+    df.to_csv(path, sep=';', index=False)
+    engine = AnalysisEngine()
+    engine.load(str(path))
+    engine.sort('state', ascending=True)
+    assert list(view_frame(engine)['state']) == ['-1.5', '2', '9', '10', '100', '']
+
+
+def test_search_filter_and_sort_combine(engine, reference):
+    area = next(value for value in reference[COL_AREA] if value)
+    engine.search('sensor')
+    engine.filter(COL_AREA, area)
+    engine.sort('entity id', ascending=False)
+    hits = reference.apply(lambda col: col.str.lower().str.contains('sensor', regex=False)).any(axis=1)
+    expected = reference[hits & (reference[COL_AREA] == area)]
+    assert list(view_frame(engine)['entity id']) == sorted(expected['entity id'], key=str.casefold, reverse=True)
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.generate_data import generate_energy, generate_entities
+from benchmarks.mock_home_assistant import MockHomeAssistant
+from entity_analyzer_engine import AnalysisEngine
+from entity_analyzer_homeassistant import HomeAssistantError, fetch_entities
+
+ROWS = 200
+SENSORS = 3
+HOURS = 24 * 45
+TOKEN = 'test-token'
+
+
+def serve(mock):
+    url = mock.start(port=0)
+    yield url
+    mock.stop()
+
+
+@pytest.fixture(scope='module')
+def url():
+    # Feste Daten ab 2024-01-01 (Wandzeit +01:00) wie generate_energy()
+    yield from serve(MockHomeAssistant(ROWS, SENSORS, HOURS, means=1, token=TOKEN, start='2024-01-01'))
+
+
+@pytest.fixture(scope='module')
+def recent_url():
+    yield from serve(MockHomeAssistant(50, SENSORS, 24 * 7, means=0, token=TOKEN))
+
+
+@pytest.fixture(scope='module')
+def consumption():
+    """Verbrauch je Stunde (Wandzeit +01:00) x Sensor, mit NaN für fehlende Stunden."""
+    energy = generate_energy(SENSORS, HOURS)
+    values = energy.iloc[:, 3:].replace('', np.nan).to_numpy(dtype=float).T
+    index = pd.DatetimeIndex(pd.to_datetime(energy.columns[3:])).tz_localize(None)
+    return pd.DataFrame(values, index=index, columns=list(energy['entity_id']))
+
+
+def load(url, **options):
+    engine = AnalysisEngine()
+    engine.recorder_options = dict(token=TOKEN, **options)
+    engine.load(url)
+    return engine
+
+
+def test_states_match_export(url):
+    engine = load(url, source='states')
+    frame = generate_entities(ROWS).sort_values('ENTITY ID')
+    df = engine.df_original
+    assert list(df['entity id']) == list(frame['ENTITY ID'])
+    assert list(df['entity name']) == list(frame['ENTITY NAME'])
+    assert list(df['state']) == list(frame['STATE'])
+
+
+def test_statistics_match_export(url, consumption):
+    engine = load(url, start='2024-01-01', end='2024-01-08')
+    assert list(engine.sensor_ids()) == list(consumption.columns)
+    hourly = engine.energy_frame(engine.sensor_ids())
+    assert len(hourly) == 7 * 24
+    expected = consumption.loc['2024-01-01':'2024-01-07 23:00']
+    np.testing.assert_allclose(hourly.to_numpy(dtype=float), expected.to_numpy(), rtol=1e-5)
+
+
+def test_naive_month_in_instance_timezone(url, consumption):
+    # Ohne Zeitzone gilt die der Instanz (+01:00), unabhängig vom Rechner: genau ein Monat inklusive erster Stunde
+    engine = load(url, start='2024-01-01', end='2024-02-01')
+    monthly = engine.energy_frame(engine.sensor_ids(), 'M')
+    assert len(monthly) == 1
+    expected = consumption.loc['2024-01-01':'2024-01-31 23:00'].sum()
+    np.testing.assert_allclose(monthly.iloc[0][expected.index].to_numpy(dtype=float), expected.to_numpy(), rtol=1e-5)
+
+
+def test_default_range_finds_recent_data(recent_url):
+    engine = load(recent_url)
+    assert len(engine.sensor_ids()) == SENSORS
+
+
+def test_invalid_token(url):
+    with pytest.raises(HomeAssistantError):
+        fetch_entities(url, 'falsch')
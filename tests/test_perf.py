@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+from entity_analyzer_perf import PerfRecorder
+
+
+@pytest.fixture
+def recorder():
+    recorder = PerfRecorder()
+    recorder.start_memory_tracing()
+    yield recorder
+    recorder.stop_memory_tracing()
+
+
+def test_single_thread_spans_report_peak(recorder):
+    with recorder.span('außen'):
+        with recorder.span('innen'):
+            block = bytearray(4 * 1024 * 1024)
+        del block
+    inner, outer = recorder.recent()[1], recorder.recent()[0]
+    assert (inner.name, outer.name) == ('innen', 'außen')
+    assert inner.peak_delta >= 4 * 1024 * 1024
+    assert outer.peak_delta >= inner.peak_delta
+
+
+def test_overlapping_spans_of_two_threads_have_no_peak(recorder):
+    started, release = threading.Event(), threading.Event()
+
+    def worker():
+        with recorder.span('worker'):
+            started.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    started.wait(5)
+    with recorder.span('haupt'):
+        bytearray(1024 * 1024)
+    release.set()
+    thread.join()
+    records = {record.name: record for record in recorder.recent()}
+    assert records['haupt'].peak_delta is None
+    assert records['worker'].peak_delta is None
+    assert records['haupt'].duration >= 0
+
+
+def test_begin_end_spans_have_no_peak(recorder):
+    span = recorder.begin('laden')
+    record = recorder.end(span)
+    assert record.peak_delta is None
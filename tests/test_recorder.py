@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.generate_data import generate_energy, generate_entities, write_recorder
+from entity_analyzer_engine import AnalysisEngine
+from entity_analyzer_recorder import RecorderDatabase, to_epoch
+
+SENSORS = 3
+HOURS = 24 * 45
+# Zeitzone der Testdaten (feste +01:00 wie in generate_energy)
+DATA_TZ = 'Etc/GMT-1'
+
+
+@pytest.fixture(scope='module')
+def database(tmp_path_factory):
+    return write_recorder(str(tmp_path_factory.mktemp('recorder') / 'home-assistant_v2.db'), SENSORS, HOURS,
+                          entities=50, means=2, short_term_hours=24)
+
+
+@pytest.fixture(scope='module')
+def consumption():
+    """Verbrauch je Stunde (Wandzeit +01:00) x Sensor, wie ihn der Generator in die Summen schreibt."""
+    energy = generate_energy(SENSORS, HOURS, missing=0)
+    values = energy.iloc[:, 3:].to_numpy(dtype=float).T
+    index = pd.DatetimeIndex(pd.to_datetime(energy.columns[3:])).tz_localize(None)
+    return pd.DataFrame(values, index=index, columns=list(energy['entity_id']))
+
+
+def test_window_follows_timezone(database, consumption):
+    with RecorderDatabase(database) as db:
+        store = db.read_statistics('2024-01-02', '2024-01-09', tz=DATA_TZ)
+    assert str(store.timestamps[0]) == '2024-01-02 00:00:00+01:00'
+    assert len(store.timestamps) == 7 * 24
+    expected = consumption.loc['2024-01-02':'2024-01-08 23:00']
+    np.testing.assert_allclose(store.frame(list(expected.columns)).to_numpy(dtype=float), expected.to_numpy(), rtol=1e-5)
+
+
+def test_month_without_extra_bucket(database, consumption):
+    engine = AnalysisEngine()
+    engine.recorder_options = {'source': 'statistics', 'start': '2024-01-01', 'end': '2024-02-01', 'tz': DATA_TZ}
+    engine.load(database)
+    monthly = engine.energy_frame(engine.sensor_ids(), 'M')
+    assert len(monthly) == 1
+    # Vor der ersten Stunde gibt es keine Summe, ihr Verbrauch bleibt leer
+    expected = consumption.loc['2024-01-01 01:00':'2024-01-31 23:00'].sum()
+    np.testing.assert_allclose(monthly.iloc[0][expected.index].to_numpy(dtype=float), expected.to_numpy(), rtol=1e-5)
+
+
+def test_means_and_short_term(database):
+    with RecorderDatabase(database) as db:
+        store = db.read_statistics(means=True, tz=DATA_TZ)
+        short = db.read_statistics(short_term=True, tz=DATA_TZ)
+    assert sorted(store.types) == ['mean', 'mean'] + ['sum'] * SENSORS
+    assert len(short.timestamps) == 24 * 12
+    assert len(short.entity_ids) == SENSORS
+
+
+def test_entities_with_last_state(database):
+    with RecorderDatabase(database) as db:
+        df = db.read_entities(tz=DATA_TZ)
+    frame = generate_entities(50).sort_values('ENTITY ID')
+    assert list(df['entity id']) == list(frame['ENTITY ID'])
+    assert list(df['state']) == list(frame['STATE'])
+    assert list(df['entity name']) == list(frame['ENTITY NAME'])
+
+
+def test_naive_bounds_use_daylight_saving_time():
+    assert to_epoch('2024-01-15', 'Europe/Berlin') == pd.Timestamp('2024-01-14T23:00Z').timestamp()
+    assert to_epoch('2024-07-15', 'Europe/Berlin') == pd.Timestamp('2024-07-14T22:00Z').timestamp()
+    # Doppelte Stunde im Herbst: Sommerzeit; übersprungene Stunde im Frühjahr: nächster gültiger Zeitpunkt
+    assert to_epoch('2024-10-27 02:30', 'Europe/Berlin') == pd.Timestamp('2024-10-27T00:30Z').timestamp()
+    assert to_epoch('2024-03-31 02:30', 'Europe/Berlin') == pd.Timestamp('2024-03-31T01:00Z').timestamp()
+    assert to_epoch('2024-01-15T00:00+01:00', 'UTC') == pd.Timestamp('2024-01-14T23:00Z').timestamp()